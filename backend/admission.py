@@ -0,0 +1,320 @@
+"""
+Admission control for the LLM-backed endpoints.
+
+Every request to a classified path is admitted here before its handler runs,
+so load is shed before any Gemini call has been paid for:
+
+- Each client (a recognised API key, otherwise its IP) has a token bucket refilled at
+  ADMISSION_RATE tokens per second up to ADMISSION_BURST. A request costs
+  its class's tokens; an empty bucket gets 429 with Retry-After set to when
+  the bucket will hold enough again.
+- At most ADMISSION_MAX_ACTIVE requests run handlers at once. Beyond that
+  they queue by priority class (interactive /recommend ahead of scholarship
+  and single-file OCR, both ahead of bulk OCR), and within a class by
+  start-time fair queuing across clients: each request is tagged with its
+  client's virtual finish time, so a client with fifty queued uploads waits
+  behind everyone else's first one instead of in front of it.
+- A class whose queue is full, or a request that waited ADMISSION_QUEUE_TIMEOUT
+  without a slot, also gets 429 with Retry-After.
+
+A slot is held until the response has been sent, streams included.
+
+Only keys listed in ADMISSION_API_KEYS get a bucket of their own; any other
+key is ignored, so sending random keys cannot mint fresh buckets. Likewise
+X-Forwarded-For is only read when ADMISSION_TRUST_FORWARDED is on, and then
+only the hops appended by ADMISSION_TRUSTED_PROXIES are believed.
+"""
+import os
+import math
+import time
+import heapq
+import asyncio
+import hashlib
+import itertools
+from collections import OrderedDict
+from starlette.responses import JSONResponse
+import metrics
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "1") == "1"
+ADMISSION_MAX_ACTIVE = int(os.getenv("ADMISSION_MAX_ACTIVE", "16"))
+ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", "1"))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", "20"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "5"))
+ADMISSION_TRUST_FORWARDED = os.getenv("ADMISSION_TRUST_FORWARDED", "0") == "1"
+# Peers whose X-Forwarded-For additions are believed, e.g. the platform's edge
+ADMISSION_TRUSTED_PROXIES = frozenset(
+    p.strip() for p in os.getenv("ADMISSION_TRUSTED_PROXIES", "").split(",") if p.strip()
+)
+# API keys that get a bucket of their own, comma-separated
+ADMISSION_API_KEYS = frozenset(
+    k.strip().encode() for k in os.getenv("ADMISSION_API_KEYS", "").split(",") if k.strip()
+)
+
+# Dispatch order, most urgent first
+PRIORITY_CLASSES = ("interactive", "standard", "bulk")
+# Bucket tokens a request costs, roughly in proportion to the Gemini work behind it
+CLASS_COST = {"interactive": 1, "standard": 2, "bulk": 4}
+# Share of ADMISSION_MAX_QUEUE each class may have waiting; bulk is shed first
+CLASS_QUEUE_SHARE = {"interactive": 1.0, "standard": 0.5, "bulk": 0.25}
+
+# Clients tracked individually; past this, new clients share one overflow bucket
+MAX_CLIENTS = 10_000
+
+QUEUE_WAIT = metrics.Histogram(
+    "edbridge_admission_queue_wait_seconds", "Time requests waited for an admission slot", ("priority",)
+)
+ADMITTED = metrics.Counter("edbridge_admission_admitted_total", "Requests admitted", ("priority",))
+REJECTED = metrics.Counter(
+    "edbridge_admission_rejected_total", "Requests turned away with 429", ("priority", "reason")
+)
+
+
+class Rejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Request rejected ({reason}), retry in {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Client:
+    __slots__ = ("tokens", "updated", "finish")
+
+    def __init__(self, tokens, now):
+        self.tokens = tokens
+        self.updated = now
+        self.finish = 0.0
+
+
+class Admission:
+    def __init__(
+        self,
+        max_active=ADMISSION_MAX_ACTIVE,
+        rate=ADMISSION_RATE,
+        burst=ADMISSION_BURST,
+        max_queue=ADMISSION_MAX_QUEUE,
+        max_clients=MAX_CLIENTS,
+        queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+        retry_after=ADMISSION_RETRY_AFTER,
+        enabled=ADMISSION_CONTROL,
+    ):
+        self.max_active = max_active
+        self.rate = rate
+        self.burst = burst
+        self.queue_limits = {name: max(1, int(max_queue * share)) for name, share in CLASS_QUEUE_SHARE.items()}
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.enabled = enabled
+        self.active = 0
+        self.max_clients = max_clients
+        # Least recently seen first
+        self._clients = OrderedDict()
+        self._overflow = None
+        # (priority, start tag, sequence, future); abandoned futures are cancelled and skipped
+        self._queue = []
+        self._queued = dict.fromkeys(PRIORITY_CLASSES, 0)
+        self._virtual = 0.0
+        self._sequence = itertools.count()
+        self.admitted = dict.fromkeys(PRIORITY_CLASSES, 0)
+        self.rejected = {}
+
+    def _client(self, key, now):
+        client = self._clients.get(key)
+        if client is not None:
+            self._clients.move_to_end(key)
+            return client
+        if len(self._clients) >= self.max_clients and not self._evict_oldest(now):
+            # Every tracked client is busy; newcomers share one bucket
+            if self._overflow is None:
+                self._overflow = _Client(self.burst, now)
+            return self._overflow
+        client = self._clients[key] = _Client(self.burst, now)
+        return client
+
+    def _evict_oldest(self, now):
+        """
+        Forget the least recently seen client if its bucket has refilled and
+        it has nothing queued
+        """
+        key, client = next(iter(self._clients.items()))
+        full = self.burst / self.rate if self.rate > 0 else math.inf
+        if now - client.updated < full or client.finish > self._virtual:
+            return False
+        del self._clients[key]
+        return True
+
+    def _take(self, client, cost, now):
+        """
+        Charge the client's bucket; seconds until it could pay, or 0 if it did
+        """
+        client.tokens = min(self.burst, client.tokens + (now - client.updated) * self.rate)
+        client.updated = now
+        if client.tokens >= cost:
+            client.tokens -= cost
+            return 0.0
+        if self.rate <= 0:
+            return float(self.retry_after)
+        return (cost - client.tokens) / self.rate
+
+    def _reject(self, priority_class, reason, retry_after):
+        retry_after = max(1, math.ceil(retry_after))
+        REJECTED.inc(priority=priority_class, reason=reason)
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        return Rejected(reason, retry_after)
+
+    def _admit(self, priority_class, waited):
+        QUEUE_WAIT.observe(waited, priority=priority_class)
+        ADMITTED.inc(priority=priority_class)
+        self.admitted[priority_class] += 1
+
+    async def acquire(self, client_key, priority_class):
+        """
+        Wait for a slot. Raises Rejected when the client is over its rate, the
+        class queue is full or the wait runs past queue_timeout.
+        """
+        cost = CLASS_COST[priority_class]
+        now = time.monotonic()
+        client = self._client(client_key, now)
+        shortfall = self._take(client, cost, now)
+        if shortfall:
+            raise self._reject(priority_class, "rate_limited", shortfall)
+
+        start = max(self._virtual, client.finish)
+        client.finish = start + cost
+
+        if self.active < self.max_active and not any(self._queued.values()):
+            self._virtual = start
+            self.active += 1
+            self._admit(priority_class, 0.0)
+            return
+
+        if self._queued[priority_class] >= self.queue_limits[priority_class]:
+            client.finish -= cost
+            raise self._reject(priority_class, "queue_full", self.retry_after)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._queue, (PRIORITY_CLASSES.index(priority_class), start, next(self._sequence), future)
+        )
+        self._queued[priority_class] += 1
+        try:
+            await asyncio.wait((future,), timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # The client went away while queued
+            if future.done():
+                self.release()
+            else:
+                self._abandon(future, priority_class, client, cost)
+            raise
+        if not future.done():
+            self._abandon(future, priority_class, client, cost)
+            raise self._reject(priority_class, "queue_timeout", self.retry_after)
+        self._admit(priority_class, time.monotonic() - now)
+
+    def _abandon(self, future, priority_class, client, cost):
+        """
+        Take a request that never ran out of the queue, and give back the
+        virtual time it reserved so its client is not pushed back for it
+        """
+        future.cancel()
+        self._queued[priority_class] -= 1
+        client.finish -= cost
+
+    def release(self):
+        self.active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.active < self.max_active and self._queue:
+            priority, start, _, future = heapq.heappop(self._queue)
+            if future.done():
+                continue
+            self._queued[PRIORITY_CLASSES[priority]] -= 1
+            self._virtual = max(self._virtual, start)
+            self.active += 1
+            future.set_result(None)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "active": self.active,
+            "max_active": self.max_active,
+            "queued": dict(self._queued),
+            "queue_limits": dict(self.queue_limits),
+            "clients": len(self._clients),
+            "overflow": self._overflow is not None,
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected),
+        }
+
+
+def client_ip(scope, trust_forwarded=None, trusted_proxies=None):
+    """
+    The caller's IP: the socket peer, or, when forwarded headers are trusted
+    and the peer is a trusted proxy, the right-most X-Forwarded-For hop not
+    added by a trusted proxy
+    """
+    trust_forwarded = ADMISSION_TRUST_FORWARDED if trust_forwarded is None else trust_forwarded
+    trusted_proxies = ADMISSION_TRUSTED_PROXIES if trusted_proxies is None else trusted_proxies
+    client = scope.get("client")
+    peer = client[0] if client else "unknown"
+    if not trust_forwarded or peer not in trusted_proxies:
+        return peer
+
+    forwarded = b",".join(value for name, value in scope.get("headers") or () if name == b"x-forwarded-for")
+    for hop in reversed(forwarded.decode("latin-1").split(",")):
+        hop = hop.strip()
+        if hop and hop not in trusted_proxies:
+            return hop
+    return peer
+
+
+def client_key(scope, api_keys=None):
+    """
+    Who a request is from: a hash of its API key if that key is one of
+    `api_keys`, otherwise its IP address
+    """
+    api_keys = ADMISSION_API_KEYS if api_keys is None else api_keys
+    headers = dict(scope.get("headers") or ())
+    api_key = headers.get(b"x-api-key")
+    authorization = headers.get(b"authorization", b"")
+    if not api_key and authorization[:7].lower() == b"bearer ":
+        api_key = authorization[7:].strip()
+    if api_key and api_key in api_keys:
+        return "key:" + hashlib.sha256(api_key).hexdigest()[:16]
+    return "ip:" + client_ip(scope)
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware admitting requests to the paths in `classes` (path ->
+    priority class) through `controller`; other paths pass straight through
+    """
+
+    def __init__(self, app, controller, classes):
+        self.app = app
+        self.controller = controller
+        self.classes = classes
+
+    async def __call__(self, scope, receive, send):
+        priority_class = self.classes.get(scope.get("path")) if scope["type"] == "http" else None
+        if priority_class is None or not self.controller.enabled or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.controller.acquire(client_key(scope), priority_class)
+        except Rejected as e:
+            response = JSONResponse(
+                {"detail": "Too many requests, please retry shortly"},
+                status_code=429,
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
@@ -0,0 +1,298 @@
+"""
+Bulk loan ranking for /recommend/batch.
+
+A cohort file (CSV with a header row, or NDJSON) is read row by row and
+scored in chunks. Each chunk runs the loan_scoring rubric as NumPy column
+operations over a (students x banks) matrix, and its rankings are written out
+before the next chunk is read. Memory stays constant however long the file
+is, and no model is called.
+
+The rubric itself stays in loan_scoring: academic and LTI points come from
+its band tables, and the suitability and risk points are looked up from
+tables filled in by calling its scalar functions once per case. The ranked
+banks are the same ones /recommend would return.
+"""
+import io
+import csv
+import json
+import time
+import math
+import itertools
+import numpy as np
+import loan_scoring
+
+CHUNK_ROWS = 1024
+# Rupee amounts above this are treated as data errors; it also keeps every
+# amount well inside int64
+MAX_AMOUNT = 10 ** 12
+
+# Accepted spellings of the columns we read
+COLUMNS = {
+    "cgpa": ("cgpa",),
+    "loanAmount": ("loanAmount", "loan_amount", "loanamount"),
+    "familyIncome": ("familyIncome", "family_income", "familyincome"),
+    "name": ("name",),
+    "id": ("id", "student_id", "studentId"),
+}
+
+
+class BatchFormatError(ValueError):
+    pass
+
+
+def _bands(values, bands, default, at_least):
+    """
+    Band points for a column, matching loan_scoring's top-down scan
+    """
+    points = np.full(values.shape, default, dtype=np.int64)
+    # Applied from the last band up, so the first matching band wins
+    for bound, score in reversed(bands):
+        hit = values >= bound if at_least else values <= bound
+        points = np.where(hit, score, points)
+    return points
+
+
+def _suitability_table():
+    """
+    suitability_score by (cgpa class, low income, is_public), where the cgpa
+    class is 0 below WEAK_CGPA, 1 up to STRONG_CGPA and 2 above
+    """
+    cgpas = (loan_scoring.WEAK_CGPA - 1, loan_scoring.WEAK_CGPA, loan_scoring.STRONG_CGPA)
+    incomes = (loan_scoring.MODEST_INCOME, loan_scoring.MODEST_INCOME - 1)
+    table = np.zeros((3, 2, 2), dtype=np.int64)
+    for (c, cgpa), (i, income), is_public in itertools.product(enumerate(cgpas), enumerate(incomes), (0, 1)):
+        table[c, i, is_public] = loan_scoring.suitability_score(cgpa, income, bool(is_public))
+    return table
+
+
+def _risk_table():
+    """
+    risk_adjustment by (risky cgpa, lti class, over collateral limit, low
+    income, is_public), where the lti class is 0 up to HIGH_LTI, 1 up to
+    EXTREME_LTI and 2 above
+    """
+    cgpas = (loan_scoring.RISKY_CGPA, loan_scoring.RISKY_CGPA - 1)
+    ltis = (loan_scoring.HIGH_LTI, loan_scoring.EXTREME_LTI, loan_scoring.EXTREME_LTI + 1)
+    amounts = (loan_scoring.COLLATERAL_LIMIT, loan_scoring.COLLATERAL_LIMIT + 1)
+    incomes = (loan_scoring.LOW_INCOME, loan_scoring.LOW_INCOME - 1)
+    table = np.zeros((2, 3, 2, 2, 2), dtype=np.int64)
+    for index in itertools.product(range(2), range(3), range(2), range(2), range(2)):
+        c, l, a, i, is_public = index
+        table[index] = loan_scoring.risk_adjustment(cgpas[c], ltis[l], amounts[a], incomes[i], bool(is_public))
+    return table
+
+
+SUITABILITY = _suitability_table()
+RISK = _risk_table()
+
+
+class BatchRanker:
+    """
+    Catalog columns prepared once, for ranking many profiles against them
+    """
+
+    def __init__(self, records):
+        # Pre-sorted by starting rate, then catalog order, so a stable sort
+        # on score alone reproduces rank_loans' tie-breaking
+        order = sorted(range(len(records)), key=lambda i: records[i].min_rate)
+        self.records = [records[i] for i in order]
+        self.banks = [r.bank for r in self.records]
+        self.is_public = np.array([r.is_public for r in self.records], dtype=np.int64)
+        self.max_amount = np.array([r.max_amount or 0 for r in self.records], dtype=np.int64)
+
+    def scores(self, cgpa, loan_amount, family_income, lti):
+        """
+        (students x banks) rubric scores, as loan_scoring.score_product gives them
+        """
+        academic = _bands(cgpa, loan_scoring.ACADEMIC_BANDS, loan_scoring.ACADEMIC_DEFAULT, at_least=True)
+        lti_points = _bands(lti, loan_scoring.LTI_BANDS, loan_scoring.LTI_DEFAULT, at_least=False)
+
+        cgpa_class = (cgpa >= loan_scoring.WEAK_CGPA).astype(np.int64) + (cgpa >= loan_scoring.STRONG_CGPA)
+        modest = (family_income < loan_scoring.MODEST_INCOME).astype(np.int64)
+        suitability = SUITABILITY[cgpa_class[:, None], modest[:, None], self.is_public[None, :]]
+
+        lti_class = (lti > loan_scoring.HIGH_LTI).astype(np.int64) + (lti > loan_scoring.EXTREME_LTI)
+        risk = RISK[
+            (cgpa < loan_scoring.RISKY_CGPA).astype(np.int64)[:, None],
+            lti_class[:, None],
+            (loan_amount > loan_scoring.COLLATERAL_LIMIT).astype(np.int64)[:, None],
+            (family_income < loan_scoring.LOW_INCOME).astype(np.int64)[:, None],
+            self.is_public[None, :],
+        ]
+
+        w_academic, w_lti, w_suitability = loan_scoring.WEIGHTS
+        weighted = (
+            (w_academic * academic)[:, None] + (w_lti * lti_points)[:, None] + w_suitability * suitability + risk
+        )
+        return np.clip(np.rint(weighted), 0, 100).astype(np.int64)
+
+    def rank(self, cgpa, loan_amount, family_income, lti, top_n=3):
+        """
+        Top banks per student as (bank indexes, scores, counts); banks that
+        cannot lend the amount are left out unless none can
+        """
+        scores = self.scores(cgpa, loan_amount, family_income, lti)
+        eligible = self.max_amount[None, :] >= np.maximum(loan_amount, 1)[:, None]
+        eligible[~eligible.any(axis=1)] = True
+        ranked = np.argsort(np.where(eligible, -scores, 1), axis=1, kind="stable")[:, :top_n]
+        top_scores = np.take_along_axis(scores, ranked, axis=1)
+        counts = np.minimum(eligible.sum(axis=1), top_n)
+        return ranked, top_scores, counts
+
+
+def _column_map(fields):
+    lookup = {name.strip(): name for name in fields if name}
+    lowered = {name.lower(): original for name, original in lookup.items()}
+    columns = {}
+    for column, spellings in COLUMNS.items():
+        for spelling in spellings:
+            found = lookup.get(spelling) or lowered.get(spelling.lower())
+            if found is not None:
+                columns[column] = found
+                break
+    missing = [column for column in ("cgpa", "loanAmount", "familyIncome") if column not in columns]
+    if missing:
+        raise BatchFormatError(f"Missing column(s): {', '.join(missing)}")
+    return columns
+
+
+def read_csv(binary):
+    """
+    Rows of a CSV file as dicts. The header is checked straight away, so a
+    file without the needed columns fails before anything is streamed.
+    """
+    reader = csv.DictReader(io.TextIOWrapper(binary, encoding="utf-8-sig", errors="replace", newline=""))
+    try:
+        fieldnames = reader.fieldnames
+    except csv.Error as e:
+        raise BatchFormatError(f"Invalid CSV header: {e}")
+    columns = _column_map(fieldnames or [])
+
+    def rows():
+        # A malformed line (e.g. a NUL byte) becomes an error row; the
+        # reader carries on with the next line
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                yield f"Invalid CSV: {e}"
+                continue
+            yield {column: row.get(field) for column, field in columns.items()}
+
+    return rows()
+
+
+def _pick(row, spellings):
+    for spelling in spellings:
+        if spelling in row:
+            return row[spelling]
+    return None
+
+
+def read_ndjson(binary):
+    """
+    Rows of an NDJSON file as dicts; a line that is not a JSON object is
+    yielded as an error string instead
+    """
+    for line in io.TextIOWrapper(binary, encoding="utf-8-sig", errors="replace"):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield "Each line must be a JSON object"
+            continue
+        yield {column: _pick(row, spellings) for column, spellings in COLUMNS.items()}
+
+
+def detect_format(filename, content_type, head):
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in (content_type or "") or "jsonl" in (content_type or ""):
+        return "ndjson"
+    if name.endswith(".csv") or "csv" in (content_type or ""):
+        return "csv"
+    return "ndjson" if head.lstrip()[:1] == b"{" else "csv"
+
+
+def _check_range(values):
+    """
+    Why sanitized (cgpa, loan amount, family income, lti) cannot be ranked,
+    or None if they can
+    """
+    cgpa, loan_amount, family_income, _ = values
+    if not math.isfinite(cgpa):
+        return "cgpa must be a finite number"
+    if loan_amount > MAX_AMOUNT or family_income > MAX_AMOUNT:
+        return f"loanAmount and familyIncome must be at most {MAX_AMOUNT}"
+    return None
+
+
+def rank_rows(ranker, rows, top_n=3, max_rows=None):
+    """
+    NDJSON lines of rankings for an iterable of rows, one string per chunk,
+    ending with a summary line
+    """
+    started = time.perf_counter()
+    processed = errors = 0
+    row_number = 0
+    truncated = False
+
+    while True:
+        chunk = list(itertools.islice(rows, CHUNK_ROWS))
+        if not chunk:
+            break
+
+        lines = []
+        valid = []
+        for row in chunk:
+            row_number += 1
+            if max_rows is not None and row_number > max_rows:
+                truncated = True
+                break
+            if isinstance(row, str):
+                errors += 1
+                lines.append((row_number, {"row": row_number, "error": row}))
+                continue
+            values = loan_scoring.sanitize(row["cgpa"], row["loanAmount"], row["familyIncome"])
+            problem = _check_range(values)
+            if problem is not None:
+                errors += 1
+                lines.append((row_number, {"row": row_number, "error": problem}))
+                continue
+            valid.append((row_number, row, values))
+
+        if valid:
+            numbers = np.array([values for _, _, values in valid], dtype=np.float64)
+            ranked, top_scores, counts = ranker.rank(
+                numbers[:, 0], numbers[:, 1].astype(np.int64), numbers[:, 2].astype(np.int64), numbers[:, 3], top_n
+            )
+            for (number, row, values), banks, scores, count in zip(
+                valid, ranked.tolist(), top_scores.tolist(), counts.tolist()
+            ):
+                result = {"row": number}
+                if row.get("id") not in (None, ""):
+                    result["id"] = row["id"]
+                if row.get("name") not in (None, ""):
+                    result["name"] = row["name"]
+                result["lti"] = values[3]
+                result["recommendations"] = [
+                    {"bank": ranker.banks[bank], "score": score} for bank, score in zip(banks[:count], scores[:count])
+                ]
+                lines.append((number, result))
+            processed += len(valid)
+
+        lines.sort(key=lambda line: line[0])
+        yield "".join(json.dumps(line, ensure_ascii=False) + "\n" for _, line in lines)
+        if truncated:
+            break
+
+    elapsed = time.perf_counter() - started
+    summary = {"rows": processed, "errors": errors, "seconds": round(elapsed, 3)}
+    if truncated:
+        summary["truncated_at"] = max_rows
+    yield json.dumps({"summary": summary}) + "\n"
@@ -0,0 +1,205 @@
+"""
+Local stand-in for google.generativeai, for benchmarks.
+
+Mimics the parts of the SDK the backend uses (GenerativeModel.generate_content
+with and without streaming, upload_file, get_file) with configurable latency,
+error rate and output quality, so load tests are repeatable and cost nothing.
+Replies are canned JSON chosen from the requested response schema, keyed per
+profile for micro-batched prompts; a share of them is deliberately malformed
+(fenced, missing commas) to exercise repair.
+"""
+import re
+import json
+import time
+import random
+import threading
+from dataclasses import dataclass
+
+
+@dataclass
+class FakeConfig:
+    # Lognormal latency: median seconds and sigma of the underlying normal
+    latency_median: float = 0.8
+    latency_sigma: float = 0.5
+    error_rate: float = 0.0
+    malformed_rate: float = 0.0
+    # Seconds an uploaded file stays PROCESSING
+    processing_time: float = 1.0
+    stream_chunks: int = 4
+    seed: int = 0
+
+
+OCR_REPLY = {
+    "name": "Asha Verma",
+    "dob": "14/03/2003",
+    "college": "National Institute of Technology, Tiruchirappalli",
+    "course": "B.Tech Computer Science",
+    "batch": "2021-2025",
+    "cgpa": "8.42",
+    "loanAmount": "900000",
+    "familyIncome": "450000",
+}
+
+SCHOLARSHIP_REPLY = [
+    {
+        "name": f"Sample Scholarship {i}",
+        "provider": "Sample Foundation",
+        "amount": "₹50,000 per year",
+        "eligibility": "Family income below ₹8 lakh, 60% in the previous year",
+        "deadline": "October 31",
+        "category": "Need-based",
+        "link": "https://scholarships.gov.in",
+        "description": "A canned scholarship used by the benchmark stand-in. It is not a real scheme.",
+    }
+    for i in range(1, 11)
+]
+
+
+class FakeUpstreamError(Exception):
+    # Like google.api_core's ServiceUnavailable, so the breaker counts it
+    code = 503
+
+
+class _State:
+    def __init__(self, name):
+        self.name = name
+
+
+class _Usage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class FakeResponse:
+    def __init__(self, text, usage=None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class FakeFile:
+    def __init__(self, name, ready_at):
+        self.name = name
+        self.ready_at = ready_at
+
+    @property
+    def state(self):
+        return _State("ACTIVE" if time.monotonic() >= self.ready_at else "PROCESSING")
+
+
+def _schema_of(generation_config):
+    if isinstance(generation_config, dict):
+        return generation_config.get("response_schema") or {}
+    return getattr(generation_config, "response_schema", None) or {}
+
+
+def _prompt_text(contents):
+    parts = contents if isinstance(contents, list) else [contents]
+    return "\n".join(part for part in parts if isinstance(part, str))
+
+
+def _reply(item, prompt):
+    fields = set((item.get("properties") or {}).keys())
+
+    if "key" in fields:
+        # Micro-batched prompt: one keyed answer per "### Profile key: n" section
+        field = next(name for name in fields if name != "key")
+        inner = item["properties"][field].get("items", {})
+        sections = re.split(r"^### Profile key: (\w+)$", prompt, flags=re.MULTILINE)[1:]
+        return [
+            {"key": key, field: _reply(inner, section)}
+            for key, section in zip(sections[::2], sections[1::2])
+        ]
+    if "match_reason" in fields:
+        banks = re.findall(r'"bank": "([^"]+)"', prompt)
+        return [
+            {"bank": bank, "match_reason": f"{bank} fits this profile on rate, collateral limit and repayment terms."}
+            for bank in dict.fromkeys(banks)
+        ]
+    if "provider" in fields:
+        return SCHOLARSHIP_REPLY
+    if "familyIncome" in fields:
+        return OCR_REPLY
+    return {"text": "ok"}
+
+
+def _malform(text):
+    broken = text.replace(",\n", "\n", 1) if ",\n" in text else text.replace(", ", " ", 1)
+    return f"Here is the JSON you asked for:\n```json\n{broken}\n```"
+
+
+class FakeGenAI:
+    """
+    Drop-in for the google.generativeai module (as returned by gemini_client.sdk())
+    """
+
+    def __init__(self, config=None):
+        self.config = config or FakeConfig()
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._files = {}
+        self.calls = 0
+
+    def configure(self, **kwargs):
+        pass
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            latency = self._random.lognormvariate(0, self.config.latency_sigma) * self.config.latency_median
+            failed = self._random.random() < self.config.error_rate
+            malformed = self._random.random() < self.config.malformed_rate
+        return latency, failed, malformed
+
+    def reply_for(self, contents, generation_config):
+        schema = _schema_of(generation_config)
+        prompt = _prompt_text(contents)
+        reply = _reply(schema.get("items", schema), prompt)
+        return json.dumps(reply, ensure_ascii=False, indent=2), len(prompt) // 4
+
+    def GenerativeModel(self, name, **kwargs):
+        return FakeModel(self, name)
+
+    def upload_file(self, *args, **kwargs):
+        latency, failed, _ = self._draw()
+        time.sleep(latency / 4)
+        if failed:
+            raise FakeUpstreamError("upload failed")
+        with self._lock:
+            name = f"files/fake-{len(self._files) + 1}"
+            uploaded = self._files[name] = FakeFile(name, time.monotonic() + self.config.processing_time)
+        return uploaded
+
+    def get_file(self, name):
+        time.sleep(0.02)
+        return self._files[name]
+
+
+class FakeModel:
+    def __init__(self, sdk, name):
+        self.sdk = sdk
+        self.model_name = f"models/{name}"
+
+    def generate_content(self, contents, generation_config=None, stream=False, **kwargs):
+        latency, failed, malformed = self.sdk._draw()
+        text, prompt_tokens = self.sdk.reply_for(contents, generation_config)
+        if malformed:
+            text = _malform(text)
+        usage = _Usage(prompt_tokens, len(text) // 4)
+
+        if not stream:
+            time.sleep(latency)
+            if failed:
+                raise FakeUpstreamError("generate_content failed")
+            return FakeResponse(text, usage)
+        return self._stream(text, usage, latency, failed)
+
+    def _stream(self, text, usage, latency, failed):
+        chunks = max(1, self.sdk.config.stream_chunks)
+        size = -(-len(text) // chunks)
+        for i in range(chunks):
+            time.sleep(latency / chunks)
+            if failed and i == chunks // 2:
+                raise FakeUpstreamError("stream interrupted")
+            yield FakeResponse(text[i * size:(i + 1) * size], usage if i == chunks - 1 else None)
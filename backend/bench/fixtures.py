@@ -0,0 +1,135 @@
+"""
+Generated document fixtures for the benchmarks: a phone-photo sized JPEG, a
+digitally generated PDF with a text layer, a long text brochure and a scanned
+(image-only) PDF.
+Everything is built deterministically in memory, so no binary files are
+checked in and every run uses identical inputs.
+"""
+import io
+
+STUDENT_LINES = [
+    "NATIONAL INSTITUTE OF TECHNOLOGY, TIRUCHIRAPPALLI",
+    "Grade Card - B.Tech Computer Science and Engineering",
+    "Name of the Student: Asha Verma",
+    "Date of Birth: 14/03/2003",
+    "Batch: 2021-2025",
+    "Semester VI  SGPA: 8.61   CGPA: 8.42",
+    "Annual Family Income: Rs. 4,50,000",
+    "Course: Bachelor of Technology (4 years)",
+]
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def text_pdf(pages=None):
+    """
+    A minimal PDF whose pages carry a real text layer. pages is a list of
+    line lists; by default a single grade-card page.
+    """
+    pages = pages or [STUDENT_LINES]
+    page_count = len(pages)
+    # 1: catalog, 2: page tree, 3: font, then a (page, contents) pair per page
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for lines in pages:
+        page_id = len(objects) + 1
+        kids.append(f"{page_id} 0 R")
+        content = "BT /F1 11 Tf 14 TL 56 780 Td " + " ".join(f"({_escape(line)}) '" for line in lines) + " ET"
+        content = content.encode("latin-1", "replace")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {page_count} >>".encode()
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+BROCHURE_LINES = [
+    "The institute offers undergraduate and postgraduate programmes across engineering and sciences.",
+    "Hostel accommodation is available for all first year students on a shared basis.",
+    "The central library holds over two lakh volumes and subscribes to major journals.",
+    "Students are encouraged to take part in cultural, sports and technical festivals.",
+    "Placement statistics for the previous year are published on the notice board.",
+    "Transport facilities connect the campus with the railway station and the city bus stand.",
+    "Anti-ragging rules apply on campus and are enforced by the discipline committee.",
+    "Medical facilities include a health centre with a resident doctor and an ambulance.",
+]
+
+
+def brochure_pdf(pages=40):
+    """
+    A long admission brochure whose student details sit on one page in the middle
+    """
+    filler = [BROCHURE_LINES[i:] + BROCHURE_LINES[:i] for i in range(len(BROCHURE_LINES))]
+    body = [filler[i % len(filler)] * 4 for i in range(pages)]
+    body[pages // 2] = STUDENT_LINES
+    return text_pdf(body)
+
+
+def _document_image(size, lines):
+    from PIL import Image, ImageDraw
+
+    width, height = size
+    # Paper-coloured background with sensor-like noise, as in a phone photo
+    noise = Image.effect_noise(size, 24).point(lambda p: 180 + p // 4)
+    image = Image.merge("RGB", (noise, noise, noise.point(lambda p: max(0, p - 12))))
+    draw = ImageDraw.Draw(image)
+    step = max(40, height // (len(lines) + 6))
+    for i, line in enumerate(lines):
+        draw.text((width // 12, step * (i + 2)), line, fill=(20, 20, 20))
+    return image
+
+
+def photo_jpeg(size=(3024, 4032), quality=92):
+    """
+    A 12 MP phone-photo sized JPEG of a grade card
+    """
+    out = io.BytesIO()
+    _document_image(size, STUDENT_LINES).save(out, format="JPEG", quality=quality)
+    return out.getvalue()
+
+
+def scanned_pdf(pages=2, size=(1240, 1754)):
+    """
+    An image-only PDF (no text layer), as produced by a scanner
+    """
+    images = [_document_image(size, STUDENT_LINES) for _ in range(pages)]
+    out = io.BytesIO()
+    images[0].save(out, format="PDF", save_all=True, append_images=images[1:], resolution=150)
+    return out.getvalue()
+
+
+def with_nonce(data, nonce):
+    """
+    Make a fixture byte-for-byte unique without changing how it parses
+    (trailing bytes after JPEG EOI / PDF %%EOF are ignored by readers), so
+    content-addressed caches do not turn a load test into a cache test.
+    """
+    return data + b"\n%% bench-" + str(nonce).encode() + b"\n"
+
+
+FIXTURES = {
+    "image": ("grade-card.jpg", "image/jpeg", photo_jpeg),
+    "pdf_text": ("grade-card.pdf", "application/pdf", text_pdf),
+    "pdf_scanned": ("scan.pdf", "application/pdf", scanned_pdf),
+    "pdf_brochure": ("admission-brochure.pdf", "application/pdf", brochure_pdf),
+}
@@ -0,0 +1,326 @@
+"""
+Load and latency benchmark for the backend, against a local Gemini stand-in.
+
+Each endpoint runs in a fresh interpreter. The FastAPI app is driven in-process
+through httpx's ASGI transport by --concurrency workers, with
+bench/fake_genai.py in place of google.generativeai, and the script reports
+req/s, p50/p95/p99 latency, error counts and peak RSS. OCR endpoints upload
+the generated fixtures from bench/fixtures.py, made unique per request so the
+OCR cache does not answer them. Each worker sends as its own client IP in
+X-Forwarded-For, and the children trust that header from the in-process
+transport's 127.0.0.1 peer, so admission control sees --concurrency separate
+callers with a bucket each.
+
+    python bench/load.py
+    python bench/load.py --endpoints ocr_image,recommend --concurrency 32 --requests 400
+    python bench/load.py --latency-median 1.2 --error-rate 0.02 --malformed-rate 0.1 --output after.json --compare before.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import resource
+import itertools
+import statistics
+import subprocess
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+
+PROFILE = {
+    "name": "Asha Verma", "dob": "14/03/2003", "college": "NIT Trichy", "course": "B.Tech",
+    "cgpa": 8.42, "loanAmount": 900000, "familyIncome": 450000,
+}
+
+SCHOLARSHIP_QUERIES = [
+    {"course": course, "category": category, "familyIncome": income, "cgpa": cgpa}
+    for course, category, income, cgpa in itertools.product(
+        ("B.Tech", "MBBS", "MBA", "B.Sc Physics"),
+        ("General", "SC", "OBC"),
+        (150000, 450000, 900000),
+        (6.5, 8.5),
+    )
+]
+
+
+def _ocr_request(fixture):
+    def build(i, fixtures):
+        filename, mime_type, _ = fixtures_module().FIXTURES[fixture]
+        data = fixtures_module().with_nonce(fixtures[fixture], i)
+        return "POST", "/ocr", {"files": {"file": (filename, data, mime_type)}}
+    return build
+
+
+# name: (fixtures needed, request builder(i, fixtures) -> (method, path, httpx kwargs))
+ENDPOINTS = {
+    "loans": ((), lambda i, _: ("GET", "/loans", {})),
+    "recommend": ((), lambda i, _: ("POST", "/recommend", {"json": {**PROFILE, "cgpa": 6 + (i % 40) / 10}})),
+    "recommend_stream": ((), lambda i, _: ("POST", "/recommend/stream", {"json": PROFILE})),
+    "scholarships": ((), lambda i, _: ("POST", "/scholarships", {"json": SCHOLARSHIP_QUERIES[i % len(SCHOLARSHIP_QUERIES)]})),
+    "ocr_image": (("image",), _ocr_request("image")),
+    "ocr_pdf_text": (("pdf_text",), _ocr_request("pdf_text")),
+    "ocr_pdf_scanned": (("pdf_scanned",), _ocr_request("pdf_scanned")),
+    "ocr_pdf_brochure": (("pdf_brochure",), _ocr_request("pdf_brochure")),
+}
+
+DEFAULT_ENDPOINTS = "loans,recommend,scholarships,ocr_image,ocr_pdf_text,ocr_pdf_brochure,ocr_pdf_scanned"
+
+
+def fixtures_module():
+    if BENCH_DIR not in sys.path:
+        sys.path.insert(0, BENCH_DIR)
+    import fixtures
+    return fixtures
+
+
+def percentile(quantiles, p):
+    return quantiles[p - 1] if quantiles else 0.0
+
+
+def peak_rss_mb():
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return own / scale, children / scale
+
+
+async def drive(app, endpoint, requests, concurrency, warmup, fixtures):
+    import httpx
+
+    _, build = ENDPOINTS[endpoint]
+    latencies = []
+    statuses = {}
+    counter = itertools.count()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def send(i, client_ip="10.0.0.1"):
+            method, path, kwargs = build(i, fixtures)
+            # Each worker is its own client to admission control
+            kwargs["headers"] = {**kwargs.get("headers", {}), "X-Forwarded-For": client_ip}
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            return time.perf_counter() - start, status
+
+        for i in range(warmup):
+            await send(-1 - i)
+
+        async def worker(n):
+            while True:
+                i = next(counter)
+                if i >= requests:
+                    return
+                elapsed, status = await send(i, f"10.0.{n // 256}.{n % 256}")
+                latencies.append(elapsed)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    return latencies, statuses, wall
+
+
+def child(args):
+    sys.path.insert(0, BACKEND_DIR)
+    fixtures = fixtures_module()
+    import fake_genai
+    import main
+    import metrics
+    import microbatch
+    import gemini_client
+    import structured_output
+
+    sdk = fake_genai.FakeGenAI(fake_genai.FakeConfig(
+        latency_median=args.latency_median,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        processing_time=args.processing_time,
+        seed=args.seed,
+    ))
+    gemini_client._genai = sdk
+    gemini_client._models.clear()
+
+    needed, _ = ENDPOINTS[args.child]
+    data = {name: fixtures.FIXTURES[name][2]() for name in needed}
+
+    latencies, statuses, wall = asyncio.run(
+        drive(main.app, args.child, args.requests, args.concurrency, args.warmup, data)
+    )
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    own_rss, children_rss = peak_rss_mb()
+    print(json.dumps({
+        "endpoint": args.child,
+        "requests": len(latencies),
+        "concurrency": args.concurrency,
+        "statuses": statuses,
+        "rps": len(latencies) / wall if wall else 0.0,
+        "p50_ms": percentile(quantiles, 50) * 1000,
+        "p95_ms": percentile(quantiles, 95) * 1000,
+        "p99_ms": percentile(quantiles, 99) * 1000,
+        "max_ms": max(latencies, default=0) * 1000,
+        "peak_rss_mb": own_rss,
+        "peak_rss_children_mb": children_rss,
+        "upstream_calls": sdk.calls,
+        "structured_output": structured_output.stats(),
+        "microbatch": microbatch.stats(),
+        "admission": main.ADMISSION.stats(),
+        "pdf_text_tokens": {key[0]: value for key, value in metrics.PDF_TEXT_TOKENS._values.items()},
+    }))
+
+
+def ingest_memory():
+    """
+    Peak Python allocation while ingesting each fixture, via tracemalloc.
+    Uploads are spooled the way Starlette spools them (to disk past 1 MB),
+    so large files are measured on the path real requests take.
+    """
+    sys.path.insert(0, BACKEND_DIR)
+    from starlette.datastructures import UploadFile
+    import upload_ingest
+
+    fixtures = fixtures_module()
+    results = {}
+    for name, (filename, _, make) in fixtures.FIXTURES.items():
+        data = make()
+        spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        spool.write(data)
+        spool.seek(0)
+        upload = UploadFile(file=spool, filename=filename, size=len(data))
+        tracemalloc.start()
+        asyncio.run(upload_ingest.ingest(upload))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {"size_bytes": len(data), "peak_bytes": peak, "ratio": round(peak / len(data), 2)}
+    print(json.dumps(results))
+
+
+def run_child(argv, env):
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), *argv],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"benchmark child failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def print_report(results, ingest, baseline=None):
+    header = f"{'endpoint':<18} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'rss MB':>8}  upstream"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        errors = sum(n for status, n in r["statuses"].items() if not status.startswith("2"))
+        rss = r["peak_rss_mb"] + r["peak_rss_children_mb"]
+        print(f"{r['endpoint']:<18} {r['rps']:8.1f} {r['p50_ms']:9.1f} {r['p95_ms']:9.1f} {r['p99_ms']:9.1f} "
+              f"{errors:7d} {rss:8.1f}  {r['upstream_calls']}")
+        previous = (baseline or {}).get(r["endpoint"])
+        if previous:
+            def delta(key):
+                before = previous[key]
+                return f"{(r[key] - before) / before * 100:+.0f}%" if before else "n/a"
+            print(f"{'  vs baseline':<18} {delta('rps'):>8} {delta('p50_ms'):>9} {delta('p95_ms'):>9} {delta('p99_ms'):>9}")
+        if errors:
+            print(f"{'':<18} statuses {r['statuses']}")
+        tokens = r.get("pdf_text_tokens") or {}
+        if tokens.get("extracted"):
+            sent = tokens.get("sent", 0)
+            print(f"{'':<18} PDF text tokens: ~{tokens['extracted']:.0f} extracted, ~{sent:.0f} sent to the model "
+                  f"({(sent - tokens['extracted']) / tokens['extracted'] * 100:+.0f}%)")
+
+    print("\nIngest peak memory (tracemalloc):")
+    for name, m in ingest.items():
+        print(f"  {name:<12} {m['size_bytes'] / 1024:9.0f} KB upload, peak {m['peak_bytes'] / 1024:9.0f} KB ({m['ratio']}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default=DEFAULT_ENDPOINTS, help=f"comma-separated, from: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--latency-median", type=float, default=0.8, help="fake Gemini median latency, seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal sigma of fake latency")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.05, help="share of replies that are fenced/broken JSON")
+    parser.add_argument("--processing-time", type=float, default=1.0, help="seconds an uploaded PDF stays PROCESSING")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="JSON from an earlier --output run to compare against")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--ingest-memory", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return 0
+    if args.ingest_memory:
+        ingest_memory()
+        return 0
+
+    endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    unknown = [name for name in endpoints if name not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+
+    env = {
+        **os.environ,
+        "API_KEY": os.getenv("API_KEY", "bench"),
+        "DEBUG_LOGS": "0",
+        "PYTHONWARNINGS": "ignore",
+        # Workers identify themselves with X-Forwarded-For, sent through the
+        # ASGI transport whose peer address is 127.0.0.1
+        "ADMISSION_TRUST_FORWARDED": "1",
+        "ADMISSION_TRUSTED_PROXIES": "127.0.0.1",
+        # Measure throughput, not the per-client rate limit
+        "ADMISSION_RATE": os.getenv("ADMISSION_RATE", "1000"),
+        "ADMISSION_BURST": os.getenv("ADMISSION_BURST", "1000"),
+    }
+    passthrough = [
+        "--requests", str(args.requests),
+        "--concurrency", str(args.concurrency),
+        "--warmup", str(args.warmup),
+        "--latency-median", str(args.latency_median),
+        "--latency-sigma", str(args.latency_sigma),
+        "--error-rate", str(args.error_rate),
+        "--malformed-rate", str(args.malformed_rate),
+        "--processing-time", str(args.processing_time),
+        "--seed", str(args.seed),
+    ]
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="edbridge-bench-") as tmp:
+        for endpoint in endpoints:
+            print(f"⏱️ {endpoint}: {args.requests} requests at concurrency {args.concurrency}...", file=sys.stderr)
+            child_env = {**env, "OCR_CACHE_PATH": os.path.join(tmp, f"{endpoint}.sqlite3")}
+            results.append(run_child(["--child", endpoint, *passthrough], child_env))
+    ingest = run_child(["--ingest-memory"], env)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = {r["endpoint"]: r for r in json.load(f)["results"]}
+
+    print_report(results, ingest, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results, "ingest_memory": ingest}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Cold-start benchmark for the backend.
+
+Every measurement runs in a fresh interpreter, the way a new serverless
+instance does: import time of main.py, then time-to-first-response for each
+endpoint, with LLM calls disabled so only our own start-up cost is measured.
+It also checks that the heavy SDKs stay unloaded on paths that do not use them.
+
+    python bench/startup.py                 # report, exit 1 if over budget
+    python bench/startup.py --runs 5 --budget-scale 1.5
+
+Budgets are in milliseconds and deliberately loose; the point is to catch a
+heavy import creeping back onto the module-level path, not to benchmark the
+machine.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_BUDGET_MS = 900
+
+# name: (method, path, body, budget in ms for import + first response)
+ENDPOINTS = {
+    "loans": ("GET", "/loans", None, 900),
+    "recommend": ("POST", "/recommend", {
+        "name": "Asha", "dob": "2003-04-01", "college": "NIT Trichy", "course": "B.Tech",
+        "cgpa": 8.4, "loanAmount": 900000, "familyIncome": 450000,
+    }, 900),
+    "scholarships": ("POST", "/scholarships", {
+        "course": "B.Tech", "cgpa": 8.4, "familyIncome": 450000, "category": "OBC",
+    }, 900),
+    "nearest-branches": ("POST", "/nearest-branches", {
+        "user_coords": {"lat": 19.07, "lng": 72.87},
+        "branches": [{"bank": "SBI"}, {"bank": "HDFC Bank"}],
+    }, 1000),
+}
+
+# Modules that must not be imported just to serve these endpoints
+HEAVY_MODULES = ("google.generativeai", "PIL", "PyPDF2")
+
+CHILD_ENV = {
+    "API_KEY": os.getenv("API_KEY", "startup-bench"),
+    "RECOMMEND_LLM_REASONS": "0",
+    "SCHOLARSHIP_LLM_ENRICH": "0",
+    "PYTHONWARNINGS": "ignore",
+}
+
+
+def child(endpoint):
+    """
+    Runs inside the fresh interpreter: import the app, serve one request
+    """
+    sys.path.insert(0, BACKEND_DIR)
+    start = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+
+    from fastapi.testclient import TestClient
+    client = TestClient(main.app)
+    request_start = time.perf_counter()
+    if endpoint:
+        method, path, body, _ = ENDPOINTS[endpoint]
+        response = client.request(method, path, json=body)
+        status = response.status_code
+    else:
+        status = None
+    done = time.perf_counter()
+
+    print(json.dumps({
+        "import_ms": (imported - start) * 1000,
+        "first_response_ms": (done - request_start) * 1000,
+        "total_ms": (imported - start + done - request_start) * 1000,
+        "status": status,
+        "heavy_loaded": [m for m in HEAVY_MODULES if m in sys.modules],
+    }))
+
+
+def measure(endpoint, runs):
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", endpoint or ""],
+            cwd=BACKEND_DIR,
+            env={**os.environ, **CHILD_ENV},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per measurement (median is reported)")
+    parser.add_argument("--budget-scale", type=float, default=float(os.getenv("STARTUP_BUDGET_SCALE", "1.0")),
+                        help="multiply every budget, e.g. for slow CI machines")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        child(args.child)
+        return 0
+
+    failures = []
+
+    samples = measure(None, args.runs)
+    import_ms = statistics.median(s["import_ms"] for s in samples)
+    budget = IMPORT_BUDGET_MS * args.budget_scale
+    print(f"{'import main':<22} {import_ms:8.1f} ms   budget {budget:.0f} ms")
+    if import_ms > budget:
+        failures.append(f"import main took {import_ms:.0f} ms (budget {budget:.0f} ms)")
+
+    for name, (_, _, _, endpoint_budget) in ENDPOINTS.items():
+        samples = measure(name, args.runs)
+        total = statistics.median(s["total_ms"] for s in samples)
+        first = statistics.median(s["first_response_ms"] for s in samples)
+        budget = endpoint_budget * args.budget_scale
+        heavy = sorted({m for s in samples for m in s["heavy_loaded"]})
+        status = samples[-1]["status"]
+        print(f"{name:<22} {total:8.1f} ms   (first response {first:.1f} ms, status {status})   budget {budget:.0f} ms"
+              + (f"   loaded {', '.join(heavy)}" if heavy else ""))
+        if status != 200:
+            failures.append(f"{name} returned {status}")
+        if total > budget:
+            failures.append(f"{name} cold start took {total:.0f} ms (budget {budget:.0f} ms)")
+        if heavy:
+            failures.append(f"{name} imported {', '.join(heavy)}")
+
+    if failures:
+        print("\n❌ Startup budget exceeded:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    print("\n✅ Within startup budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
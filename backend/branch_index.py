@@ -0,0 +1,269 @@
+"""
+Geospatial index of bank branches for /nearest-branches.
+
+Branches are partitioned per bank and, within a bank, sorted by a coarse
+lat/lng grid cell. A query computes haversine distances with NumPy over the
+whole partition when it is small, or over an expanding ring of grid cells
+when it is large, so lookups stay in microseconds with tens of thousands of
+branches. Rings only visit perimeter cells inside the partition's bounding
+box, and a query far from every branch falls back to one vectorized scan.
+
+The index loads from a compact binary form (branches.npy, memory-mapped, plus
+branches.txt for names/addresses and branches.banks.json) written by:
+
+    python branch_index.py data/branches.csv
+
+When no binary files exist, it falls back to parsing the CSV directly.
+"""
+import os
+import re
+import csv
+import sys
+import json
+import math
+import numpy as np
+
+DATA_DIR = os.getenv(
+    "BRANCH_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"),
+)
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+CELL_DEGREES = 0.5
+# Partitions up to this size are scanned in one vectorized pass
+BRUTE_FORCE_LIMIT = 4096
+
+RECORD_DTYPE = np.dtype([
+    ("bank", "<u2"),
+    ("cell_lat", "<i2"),
+    ("cell_lng", "<i2"),
+    ("lat", "<f8"),
+    ("lng", "<f8"),
+    ("text_offset", "<u8"),
+    ("text_length", "<u4"),
+])
+
+BANK_ALIASES = {
+    "sbi": "State Bank of India",
+    "pnb": "Punjab National Bank",
+    "bob": "Bank of Baroda",
+    "boi": "Bank of India",
+    "bom": "Bank of Maharashtra",
+    "cbi": "Central Bank of India",
+    "hdfc": "HDFC Bank",
+    "icici": "ICICI Bank",
+    "axis": "Axis Bank",
+    "canara": "Canara Bank",
+}
+
+
+def bank_key(name):
+    return re.sub(r"[^a-z0-9]", "", (name or "").lower())
+
+
+def cell_of(lat, lng):
+    return np.floor(np.asarray(lat) / CELL_DEGREES).astype(np.int16), np.floor(np.asarray(lng) / CELL_DEGREES).astype(np.int16)
+
+
+def haversine_km(lat, lng, lats, lngs):
+    lat1 = math.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlng = np.radians(lngs) - math.radians(lng)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def compile_rows(rows):
+    """
+    Turn (bank, name, lat, lng, address) rows into (records, text bytes, bank names),
+    sorted by bank and grid cell
+    """
+    banks = sorted({row[0] for row in rows})
+    bank_ids = {bank: i for i, bank in enumerate(banks)}
+
+    records = np.zeros(len(rows), dtype=RECORD_DTYPE)
+    texts = []
+    offset = 0
+    for i, (bank, name, lat, lng, address) in enumerate(rows):
+        text = f"{name}\t{address}".encode("utf-8")
+        records[i]["bank"] = bank_ids[bank]
+        records[i]["lat"] = lat
+        records[i]["lng"] = lng
+        records[i]["text_offset"] = offset
+        records[i]["text_length"] = len(text)
+        texts.append(text)
+        offset += len(text)
+
+    records["cell_lat"], records["cell_lng"] = cell_of(records["lat"], records["lng"])
+    order = np.lexsort((records["cell_lng"], records["cell_lat"], records["bank"]))
+    return records[order], b"".join(texts), banks
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [
+            (row["bank"], row["name"], float(row["lat"]), float(row["lng"]), row.get("address", ""))
+            for row in csv.DictReader(f)
+        ]
+
+
+class BranchIndex:
+    def __init__(self, records, text, banks):
+        self.records = records
+        self.text = text
+        self.banks = list(banks)
+        self._bank_ids = {bank_key(bank): i for i, bank in enumerate(self.banks)}
+
+        # Contiguous [start, end) slice per bank, and per bank a map from grid
+        # cell to its slice within that partition.
+        self._partitions = {}
+        self._cells = {}
+        self._bounds = {}
+        bank_column = np.asarray(records["bank"])
+        for bank_id in range(len(self.banks)):
+            start = int(np.searchsorted(bank_column, bank_id, side="left"))
+            end = int(np.searchsorted(bank_column, bank_id, side="right"))
+            self._partitions[bank_id] = (start, end)
+            if end - start > BRUTE_FORCE_LIMIT:
+                cells = np.stack([records["cell_lat"][start:end], records["cell_lng"][start:end]], axis=1)
+                keys, first = np.unique(cells, axis=0, return_index=True)
+                bounds = list(first) + [end - start]
+                self._cells[bank_id] = {
+                    (int(k[0]), int(k[1])): (start + int(bounds[j]), start + int(bounds[j + 1]))
+                    for j, k in enumerate(keys)
+                }
+                self._bounds[bank_id] = (
+                    int(keys[:, 0].min()), int(keys[:, 0].max()),
+                    int(keys[:, 1].min()), int(keys[:, 1].max()),
+                )
+
+    @classmethod
+    def load(cls, data_dir=DATA_DIR):
+        binary = os.path.join(data_dir, "branches.npy")
+        if os.path.exists(binary):
+            records = np.load(binary, mmap_mode="r")
+            with open(os.path.join(data_dir, "branches.txt"), "rb") as f:
+                text = f.read()
+            with open(os.path.join(data_dir, "branches.banks.json"), encoding="utf-8") as f:
+                banks = json.load(f)
+            return cls(records, text, banks)
+        return cls(*compile_rows(read_csv(os.path.join(data_dir, "branches.csv"))))
+
+    def resolve_bank(self, name):
+        """
+        Partition id for `name`, matched on its normalised name or an entry in
+        BANK_ALIASES; unknown banks resolve to None rather than a near miss
+        """
+        key = bank_key(name)
+        if key in self._bank_ids:
+            return self._bank_ids[key]
+        alias = BANK_ALIASES.get(key)
+        if alias is not None:
+            return self._bank_ids.get(bank_key(alias))
+        return None
+
+    def _ring(self, bank_id, cell_lat, cell_lng, ring):
+        """
+        Spans of the occupied cells on the perimeter of `ring`, clipped to the
+        partition's bounding box
+        """
+        cells = self._cells[bank_id]
+        lat_lo, lat_hi, lng_lo, lng_hi = self._bounds[bank_id]
+        lngs = range(max(cell_lng - ring, lng_lo), min(cell_lng + ring, lng_hi) + 1)
+        lats = range(max(cell_lat - ring + 1, lat_lo), min(cell_lat + ring - 1, lat_hi) + 1)
+
+        keys = []
+        for edge_lat in {cell_lat - ring, cell_lat + ring}:
+            if lat_lo <= edge_lat <= lat_hi:
+                keys.extend((edge_lat, c) for c in lngs)
+        for edge_lng in {cell_lng - ring, cell_lng + ring}:
+            if lng_lo <= edge_lng <= lng_hi:
+                keys.extend((c, edge_lng) for c in lats)
+        return [cells[key] for key in keys if key in cells], len(keys)
+
+    def _candidates(self, bank_id, lat, lng, k):
+        """
+        Row range(s) that are guaranteed to contain the k nearest branches
+        """
+        start, end = self._partitions[bank_id]
+        cells = self._cells.get(bank_id)
+        if cells is None:
+            return np.arange(start, end)
+
+        cell_lat, cell_lng = (int(c) for c in cell_of(lat, lng))
+        lat_lo, lat_hi, lng_lo, lng_hi = self._bounds[bank_id]
+        # Queries outside the bounding box would only walk empty rings
+        if not (lat_lo <= cell_lat <= lat_hi and lng_lo <= cell_lng <= lng_hi):
+            return np.arange(start, end)
+
+        # Once every cell of the bounding box is inside the rings searched,
+        # or probing has cost as much as a full pass, scan the partition
+        last_ring = max(cell_lat - lat_lo, lat_hi - cell_lat, cell_lng - lng_lo, lng_hi - cell_lng)
+        probe_budget = len(cells)
+
+        rows = []
+        probes = 0
+        for ring in range(last_ring + 1):
+            spans, probed = self._ring(bank_id, cell_lat, cell_lng, ring)
+            probes += probed
+            rows.extend(np.arange(*span) for span in spans)
+            if rows and sum(len(r) for r in rows) >= k:
+                candidates = np.concatenate(rows)
+                distances = haversine_km(lat, lng, self.records["lat"][candidates], self.records["lng"][candidates])
+                kth = np.partition(distances, k - 1)[k - 1]
+                # Anything outside the rings searched so far is at least this far away
+                shrink = math.cos(math.radians(min(89.0, abs(lat) + (ring + 1) * CELL_DEGREES)))
+                if kth <= ring * CELL_DEGREES * KM_PER_DEGREE * shrink:
+                    return candidates
+            if probes >= probe_budget:
+                break
+        return np.arange(start, end)
+
+    def nearest(self, bank, lat, lng, k=1):
+        """
+        The k branches of `bank` closest to (lat, lng), nearest first
+        """
+        bank_id = self.resolve_bank(bank)
+        if bank_id is None:
+            return []
+
+        candidates = self._candidates(bank_id, lat, lng, k)
+        if len(candidates) == 0:
+            return []
+        distances = haversine_km(lat, lng, self.records["lat"][candidates], self.records["lng"][candidates])
+
+        k = min(k, len(candidates))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        # Stable tie-break on row order keeps results reproducible
+        nearest = nearest[np.lexsort((candidates[nearest], distances[nearest]))]
+
+        results = []
+        for i in nearest:
+            row = self.records[candidates[i]]
+            offset, length = int(row["text_offset"]), int(row["text_length"])
+            name, _, address = self.text[offset:offset + length].decode("utf-8").partition("\t")
+            results.append({
+                "bank": self.banks[int(row["bank"])],
+                "name": name,
+                "lat": float(row["lat"]),
+                "lng": float(row["lng"]),
+                "address": address,
+                "distance_km": round(float(distances[i]), 3),
+            })
+        return results
+
+
+def build(csv_path, data_dir=DATA_DIR):
+    records, text, banks = compile_rows(read_csv(csv_path))
+    np.save(os.path.join(data_dir, "branches.npy"), records)
+    with open(os.path.join(data_dir, "branches.txt"), "wb") as f:
+        f.write(text)
+    with open(os.path.join(data_dir, "branches.banks.json"), "w", encoding="utf-8") as f:
+        json.dump(banks, f, ensure_ascii=False)
+    print(f"✅ Wrote {len(records)} branches for {len(banks)} banks to {data_dir}")
+
+
+if __name__ == "__main__":
+    build(sys.argv[1] if len(sys.argv) > 1 else os.path.join(DATA_DIR, "branches.csv"))
@@ -0,0 +1,208 @@
+import os
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+import metrics
+
+# Gemini's Python SDK is synchronous, so every call is pushed onto a sized
+# thread pool instead of running on the event loop. The semaphore caps how
+# many calls are in flight; once it is saturated, at most GEMINI_MAX_QUEUE
+# callers may wait for a slot before new ones are turned away with a 503.
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_MAX_QUEUE = int(os.getenv("GEMINI_MAX_QUEUE", "32"))
+GEMINI_RETRY_AFTER = int(os.getenv("GEMINI_RETRY_AFTER", "5"))
+
+_executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY, thread_name_prefix="gemini")
+_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+_waiting = 0
+_in_flight = 0
+
+# google.generativeai takes most of a second to import, so it is loaded on the
+# first Gemini call (on a worker thread) rather than on every cold start.
+_genai = None
+_sdk_lock = threading.RLock()
+_models = {}
+
+
+def sdk():
+    """
+    The configured google.generativeai module, imported on first use
+    """
+    global _genai
+    if _genai is None:
+        with _sdk_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=os.getenv("API_KEY"))
+                _genai = genai
+    return _genai
+
+
+def get_model(name):
+    """
+    Shared GenerativeModel handle for a model name
+    """
+    model = _models.get(name)
+    if model is None:
+        with _sdk_lock:
+            model = _models.get(name)
+            if model is None:
+                model = _models[name] = sdk().GenerativeModel(name)
+    return model
+
+
+def _resolve(model):
+    return get_model(model) if isinstance(model, str) else model
+
+
+def _model_name(model):
+    name = model if isinstance(model, str) else getattr(model, "model_name", "")
+    return name.removeprefix("models/")
+
+
+def stats():
+    """
+    Current load on the Gemini call layer
+    """
+    return {
+        "in_flight": _in_flight,
+        "waiting": _waiting,
+        "max_concurrency": GEMINI_MAX_CONCURRENCY,
+        "max_queue": GEMINI_MAX_QUEUE,
+    }
+
+
+async def _acquire():
+    """
+    Wait for a concurrency slot, or raise 503 with Retry-After when the wait
+    queue is already full.
+    """
+    global _waiting, _in_flight
+
+    if _semaphore.locked() and _waiting >= GEMINI_MAX_QUEUE:
+        metrics.UPSTREAM_ERRORS.inc(operation="acquire", error="busy")
+        raise HTTPException(
+            status_code=503,
+            detail="AI service is busy, please retry shortly",
+            headers={"Retry-After": str(GEMINI_RETRY_AFTER)},
+        )
+
+    _waiting += 1
+    try:
+        await _semaphore.acquire()
+    finally:
+        _waiting -= 1
+    _in_flight += 1
+
+
+def _submit(func):
+    """
+    Start func on the worker pool. The slot is held until the SDK call
+    actually finishes, even if the awaiting request is cancelled or times out first.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        future = _executor.submit(func)
+    except Exception:
+        _release()
+        raise
+    def done(_):
+        try:
+            loop.call_soon_threadsafe(_release)
+        except RuntimeError:
+            # The loop has already shut down; nothing is waiting on the slot
+            _release()
+
+    future.add_done_callback(done)
+    return future
+
+
+async def run(func, *args, **kwargs):
+    """
+    Run a blocking Gemini SDK call on the worker pool, holding a concurrency slot.
+    Raises 503 with Retry-After when the wait queue is already full.
+    """
+    await _acquire()
+    future = _submit(functools.partial(func, *args, **kwargs))
+    return await asyncio.wrap_future(future)
+
+
+async def _observed(operation, func):
+    """
+    run(func), counting upstream failures by operation and error type
+    """
+    try:
+        return await run(func)
+    except HTTPException:
+        raise
+    except Exception as e:
+        metrics.UPSTREAM_ERRORS.inc(operation=operation, error=type(e).__name__)
+        raise
+
+
+def _release():
+    global _in_flight
+    _in_flight -= 1
+    _semaphore.release()
+
+
+async def generate_content(model, *args, **kwargs):
+    """
+    model is a GenerativeModel or a model name; names are resolved to a
+    shared handle on the worker thread.
+    """
+    def call():
+        return _resolve(model).generate_content(*args, **kwargs)
+
+    response = await _observed("generate_content", call)
+    metrics.record_usage(_model_name(model), response)
+    return response
+
+
+async def stream_generate_content(model, *args, **kwargs):
+    """
+    Async generator over the text chunks of a streaming generate_content call.
+    The SDK iterator is drained on the worker pool; stopping early tells the
+    worker to stop reading.
+    """
+    await _acquire()
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def produce():
+        chunk = None
+        try:
+            for chunk in _resolve(model).generate_content(*args, stream=True, **kwargs):
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, (chunk.text, None))
+        except Exception as e:
+            metrics.UPSTREAM_ERRORS.inc(operation="stream_generate_content", error=type(e).__name__)
+            loop.call_soon_threadsafe(queue.put_nowait, (None, e))
+        else:
+            # The final chunk carries usage for the whole response
+            metrics.record_usage(_model_name(model), chunk)
+            loop.call_soon_threadsafe(queue.put_nowait, (None, None))
+
+    _submit(produce)
+    try:
+        while True:
+            text, error = await queue.get()
+            if error is not None:
+                raise error
+            if text is None:
+                return
+            yield text
+    finally:
+        stop.set()
+
+
+async def upload_file(*args, **kwargs):
+    return await _observed("upload_file", lambda: sdk().upload_file(*args, **kwargs))
+
+
+async def get_file(name):
+    return await _observed("get_file", lambda: sdk().get_file(name))
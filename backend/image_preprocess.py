@@ -0,0 +1,87 @@
+"""
+Bounded-size image preprocessing for /ocr.
+
+Phone photos of marksheets are often 12 MP or more; the extra resolution only
+inflates upload size and model latency. Images are auto-oriented, capped on
+their long edge and re-encoded to a compact JPEG before they are sent to
+Gemini. The PIL work is CPU-bound, so it runs in a process pool.
+"""
+import io
+import os
+import time
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import metrics
+
+OCR_IMAGE_MAX_EDGE = int(os.getenv("OCR_IMAGE_MAX_EDGE", "2000"))
+OCR_IMAGE_QUALITY = int(os.getenv("OCR_IMAGE_QUALITY", "85"))
+# "color", "grayscale" or "binary"
+OCR_IMAGE_MODE = os.getenv("OCR_IMAGE_MODE", "color")
+OCR_IMAGE_BINARY_THRESHOLD = 160
+# 0 runs preprocessing on a thread instead (e.g. where multiprocessing is unavailable)
+IMAGE_PREPROCESS_WORKERS = int(os.getenv("IMAGE_PREPROCESS_WORKERS", str(min(2, os.cpu_count() or 1))))
+
+_pool = None
+
+
+def preprocess(data, max_edge=OCR_IMAGE_MAX_EDGE, mode=OCR_IMAGE_MODE, quality=OCR_IMAGE_QUALITY):
+    """
+    Decode, orient, downscale and re-encode an image.
+    Returns (jpeg bytes, original size, final size).
+    """
+    # Imported here so only image uploads (and pool workers) pay for PIL
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(data))
+    original_size = image.size
+
+    # JPEG can decode straight to a reduced scale, skipping most of the work
+    if image.format == "JPEG":
+        image.draft(image.mode, (max_edge, max_edge))
+
+    image = ImageOps.exif_transpose(image)
+
+    if mode == "binary":
+        image = image.convert("L").point(lambda p: 255 if p > OCR_IMAGE_BINARY_THRESHOLD else 0)
+    elif mode == "grayscale":
+        image = image.convert("L")
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=quality, optimize=True)
+    return out.getvalue(), original_size, image.size
+
+
+def _get_pool():
+    global _pool, IMAGE_PREPROCESS_WORKERS
+    if _pool is None and IMAGE_PREPROCESS_WORKERS > 0:
+        try:
+            _pool = ProcessPoolExecutor(max_workers=IMAGE_PREPROCESS_WORKERS)
+        except (OSError, NotImplementedError) as e:
+            print(f"⚠️ Process pool unavailable, preprocessing on threads: {e}")
+            IMAGE_PREPROCESS_WORKERS = 0
+    return _pool
+
+
+async def preprocess_async(data):
+    """
+    Run preprocess() off the event loop and log the size/latency win.
+    Returns a Gemini inline image part.
+    """
+    started = time.perf_counter()
+    pool = _get_pool()
+    if pool is not None:
+        loop = asyncio.get_running_loop()
+        encoded, original_size, final_size = await loop.run_in_executor(pool, preprocess, bytes(data))
+    else:
+        encoded, original_size, final_size = await asyncio.to_thread(preprocess, bytes(data))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    metrics.debug(
+        f"🖼️ Preprocessed image {original_size} -> {final_size}, "
+        f"{len(data)} -> {len(encoded)} bytes in {elapsed_ms:.1f} ms"
+    )
+    return {"mime_type": "image/jpeg", "data": encoded}
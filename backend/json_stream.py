@@ -0,0 +1,70 @@
+"""
+Incremental parser for a JSON array of objects arriving in chunks.
+
+Streaming model output is fed in as it arrives; each top-level object of the
+array is returned as soon as its closing brace is seen, so it can be sent to
+the client before the rest of the response has been generated. Anything
+before the opening bracket (such as a ```json fence) is skipped.
+"""
+import json
+
+
+class JsonArrayStream:
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._in_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._start = None
+        self.emitted = 0
+
+    def feed(self, chunk):
+        """
+        Add a chunk of text and return the objects it completed
+        """
+        self._text += chunk
+        completed = []
+        text = self._text
+        i = self._pos
+
+        while i < len(text):
+            char = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif not self._in_array:
+                if char == "[":
+                    self._in_array = True
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif char == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        completed.append(json.loads(text[self._start:i + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                    self._start = None
+            i += 1
+
+        # Drop everything that can no longer be part of an object
+        if self._start is None:
+            self._text = ""
+            self._pos = 0
+        else:
+            self._text = text[self._start:]
+            self._pos = i - self._start
+            self._start = 0
+
+        self.emitted += len(completed)
+        return completed
@@ -0,0 +1,291 @@
+"""
+Typed, indexed view over the loan catalog.
+
+data/loan_products.json is written as human-readable strings ("8.30%–11.50%",
+"Up to ₹3 crore"). They are parsed once here into typed records so /loans
+filters and /recommend ranking never have to re-read the free text.
+
+A LoanCatalog is an immutable snapshot tagged with a version (a hash of the
+file it came from). CatalogStore holds the current one and polls the file in
+the background: when its mtime or size moves and the content hash differs,
+a new snapshot is built off the event loop and swapped in with a single
+attribute assignment. Requests read the store once and keep that snapshot,
+so they never wait on a reload or see a half-built catalog, and anything
+cached per snapshot (serialized /loans bodies, the batch ranker) is dropped
+only when the catalog actually changes. Rates can be updated by replacing
+the file, without a redeploy; write it to a temporary name and rename it
+over the old one so a reload never reads a partial file.
+"""
+import os
+import re
+import json
+import time
+import bisect
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from typing import Optional
+import metrics
+
+DATA_PATH = os.getenv(
+    "LOAN_DATA_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "loan_products.json"),
+)
+RELOAD_INTERVAL = float(os.getenv("LOAN_CATALOG_RELOAD_SECONDS", "30"))
+
+CATALOG_RELOADS = metrics.Counter(
+    "edbridge_loan_catalog_reloads_total", "Loan catalog file checks that found a change", ("outcome",)
+)
+
+PUBLIC_SECTOR_BANKS = {
+    "State Bank of India",
+    "Punjab National Bank",
+    "Bank of Baroda",
+    "Bank of India",
+    "Canara Bank",
+    "Bank of Maharashtra",
+    "Central Bank of India",
+    "Union Bank of India",
+}
+
+BANK_TYPES = ("public", "private")
+
+UNITS = {"lakh": 100_000, "crore": 10_000_000}
+
+_RATE = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+# Ranges are written with a hyphen or an en dash
+_AMOUNT = re.compile(r"₹\s*([\d.]+)(?:\s*[-–]\s*([\d.]+))?\s*(lakh|crore)", re.IGNORECASE)
+_YEARS = re.compile(r"(\d+)(?:\s*[-–]\s*(\d+))?\s*years?", re.IGNORECASE)
+
+
+@dataclass(frozen=True, slots=True)
+class LoanProduct:
+    bank: str
+    min_rate: float
+    max_rate: Optional[float]
+    max_amount: Optional[int]
+    collateral_free_limit: Optional[int]
+    max_tenure_years: Optional[int]
+    is_public: bool
+    raw: dict
+
+    @property
+    def bank_type(self):
+        return "public" if self.is_public else "private"
+
+
+def parse_rate(text):
+    """
+    "8.30%–11.50%" -> (8.3, 11.5); "9.50% onwards" -> (9.5, None)
+    """
+    rates = [float(value) for value in _RATE.findall(text or "")]
+    if not rates:
+        return float("inf"), None
+    if len(rates) == 1:
+        return rates[0], None
+    return min(rates), max(rates)
+
+
+def parse_amount(text):
+    """
+    Largest rupee amount mentioned: "Up to ₹50-150 lakh" -> 15000000
+    """
+    best = None
+    for low, high, unit in _AMOUNT.findall(text or ""):
+        value = round(float(high or low) * UNITS[unit.lower()])
+        if best is None or value > best:
+            best = value
+    return best
+
+
+def parse_tenure(text):
+    """
+    Longest repayment period in years: "Moratorium, then 10-15 years" -> 15
+    """
+    years = [int(high or low) for low, high in _YEARS.findall(text or "")]
+    return max(years) if years else None
+
+
+def parse_product(raw):
+    min_rate, max_rate = parse_rate(raw.get("interest_rate"))
+    return LoanProduct(
+        bank=raw["bank"],
+        min_rate=min_rate,
+        max_rate=max_rate,
+        max_amount=parse_amount(raw.get("loan_amount")),
+        collateral_free_limit=parse_amount(raw.get("collateral")),
+        max_tenure_years=parse_tenure(raw.get("repayment")),
+        is_public=raw["bank"] in PUBLIC_SECTOR_BANKS,
+        raw=raw,
+    )
+
+
+class LoanCatalog:
+    """
+    Parsed records plus the indexes and pre-serialized /loans bodies built from them
+    """
+
+    def __init__(self, products, version=None):
+        if version is None:
+            version = hashlib.sha256(json.dumps(products, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+        self.version = version
+        self.records = tuple(parse_product(raw) for raw in products)
+        self._position = {id(record): i for i, record in enumerate(self.records)}
+
+        # Products sorted by how much they lend. Products with no stated cap
+        # sort first and never satisfy an amount filter.
+        by_amount = sorted(self.records, key=lambda r: r.max_amount or 0)
+        self._amount_keys = [r.max_amount or 0 for r in by_amount]
+        self._by_amount = tuple(by_amount)
+
+        self._by_type = {
+            bank_type: tuple(r for r in self.records if r.bank_type == bank_type)
+            for bank_type in BANK_TYPES
+        }
+
+        self._payloads = {}
+
+    def filter(self, amount=None, max_rate=None, bank_type=None):
+        """
+        Records that can lend `amount`, start at or below `max_rate` and
+        match `bank_type`, in catalog order.
+        """
+        candidates = self.records
+        if amount is not None:
+            start = bisect.bisect_left(self._amount_keys, max(amount, 1))
+            candidates = self._by_amount[start:]
+        if bank_type is not None:
+            allowed = {id(r) for r in self._by_type[bank_type]}
+            candidates = [r for r in candidates if id(r) in allowed]
+        if max_rate is not None:
+            candidates = [r for r in candidates if r.min_rate <= max_rate]
+        return sorted(candidates, key=lambda r: self._position[id(r)])
+
+    def payload(self, amount=None, max_rate=None, bank_type=None):
+        """
+        Serialized {"loans": [...]} body and its ETag for a filter. Bodies are
+        cached per distinct result set, so repeat queries skip serialization.
+        """
+        records = self.filter(amount, max_rate, bank_type)
+        key = tuple(self._position[id(r)] for r in records)
+        cached = self._payloads.get(key)
+        if cached is None:
+            body = json.dumps({"loans": [r.raw for r in records]}, ensure_ascii=False).encode("utf-8")
+            etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+            cached = (body, etag)
+            self._payloads[key] = cached
+        return cached
+
+
+def load(data):
+    """
+    A LoanCatalog from the bytes of a loan_products.json file, versioned by
+    their hash. Raises ValueError if the file is not a list of products.
+    """
+    products = json.loads(data)
+    if not isinstance(products, list) or not all(isinstance(p, dict) and p.get("bank") for p in products):
+        raise ValueError("Loan catalog must be a JSON list of products, each with a bank")
+    return LoanCatalog(products, version=hashlib.sha256(data).hexdigest()[:12])
+
+
+class CatalogStore:
+    """
+    The current LoanCatalog, reloaded from `path` when the file changes.
+    Read `store.current` once per request and use that snapshot throughout.
+    """
+
+    def __init__(self, path=DATA_PATH, interval=RELOAD_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._stamp = None
+        self._task = None
+        self.reloads = 0
+        self.failures = 0
+        self.loaded_at = None
+        # Fails loudly at import: there is no previous snapshot to fall back to
+        self.current = None
+        self.reload()
+
+    def _file_stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self):
+        """
+        Swap in a new snapshot if the file's content changed; True if it did.
+        A file that fails to parse raises and leaves the current snapshot.
+        """
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return False
+        with open(self.path, "rb") as f:
+            data = f.read()
+        # Recorded before parsing, so a broken file is reported once rather
+        # than on every poll; fixing it moves the stamp again
+        self._stamp = stamp
+        if self.current is not None and hashlib.sha256(data).hexdigest()[:12] == self.current.version:
+            return False
+        catalog = load(data)
+        # One reference assignment: readers see the old snapshot or the new one
+        self.current = catalog
+        self.loaded_at = time.time()
+        return True
+
+    def start(self):
+        """
+        Start polling the file on the running loop (idempotent)
+        """
+        if self._task is not None and not self._task.done():
+            return
+        if self.interval <= 0:
+            return
+        self._task = asyncio.create_task(self._poll(), name="loan-catalog-reload")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            previous = self.current.version
+            try:
+                changed = await asyncio.to_thread(self.reload)
+            except Exception as e:
+                self.failures += 1
+                CATALOG_RELOADS.inc(outcome="failed")
+                print(f"⚠️ Loan catalog reload failed, keeping version {previous}: {type(e).__name__}: {e}")
+                continue
+            if changed:
+                self.reloads += 1
+                CATALOG_RELOADS.inc(outcome="reloaded")
+                print(f"✅ Loan catalog reloaded: version {previous} -> {self.current.version}")
+
+    def stats(self):
+        return {
+            "version": self.current.version,
+            "products": len(self.current.records),
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "loaded_at": self.loaded_at,
+            "interval_seconds": self.interval,
+        }
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Evaluate an If-None-Match header against an ETag (weak comparison)
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
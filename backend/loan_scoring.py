@@ -0,0 +1,182 @@
+"""
+Deterministic loan ranking.
+
+Implements the scoring rubric that used to be spelled out in the /recommend
+prompt, so the ranked list no longer depends on a Gemini round trip.
+"""
+
+# (lower bound, score) pairs, checked top-down; anything below the last band
+# falls through to the default.
+ACADEMIC_BANDS = ((9, 100), (8, 85), (7, 70), (6, 50), (5, 30))
+ACADEMIC_DEFAULT = 10
+
+# (upper bound, score) pairs for the loan-to-income ratio.
+LTI_BANDS = ((1, 90), (2, 80), (3, 70), (5, 50), (10, 30), (20, 15))
+LTI_DEFAULT = 5
+
+COLLATERAL_LIMIT = 2_000_000
+LOW_INCOME = 300_000
+MODEST_INCOME = 500_000
+
+# CGPA below which a profile counts as weak, at or above which as strong,
+# and below which it carries extra risk
+WEAK_CGPA = 7
+STRONG_CGPA = 8
+RISKY_CGPA = 6
+# Loan-to-income ratios above which the risk penalty grows
+HIGH_LTI = 10
+EXTREME_LTI = 20
+
+WEIGHTS = (0.4, 0.4, 0.2)
+
+# Fallbacks for missing or unusable profile numbers
+DEFAULT_LOAN_AMOUNT = 500_000
+DEFAULT_FAMILY_INCOME = 300_000
+
+
+def _whole(value):
+    # Spreadsheet exports write "4,50,000" or "450000.0"
+    if isinstance(value, str):
+        value = float(value.replace(",", "").strip())
+    return int(value)
+
+
+def _number(value, cast, default):
+    try:
+        return cast(value) if value not in ("", None) else default
+    except (TypeError, ValueError, OverflowError):
+        return default
+
+
+def sanitize(cgpa, loan_amount, family_income):
+    """
+    Numeric ranking inputs (cgpa, loan amount, family income, loan-to-income
+    ratio), with fallbacks for missing or invalid values
+    """
+    cgpa = _number(cgpa, float, 0.0)
+    loan_amount = _number(loan_amount, _whole, 0)
+    family_income = _number(family_income, _whole, 0)
+    if loan_amount <= 0:
+        loan_amount = DEFAULT_LOAN_AMOUNT
+    if family_income <= 0:
+        family_income = DEFAULT_FAMILY_INCOME
+    lti = round(loan_amount / max(family_income, 1), 2)
+    return cgpa, loan_amount, family_income, lti
+
+
+def academic_score(cgpa):
+    for bound, score in ACADEMIC_BANDS:
+        if cgpa >= bound:
+            return score
+    return ACADEMIC_DEFAULT
+
+
+def lti_score(lti):
+    for bound, score in LTI_BANDS:
+        if lti <= bound:
+            return score
+    return LTI_DEFAULT
+
+
+def suitability_score(cgpa, family_income, is_public):
+    """
+    0-100 fit between the profile and the bank type: public banks suit weak
+    or low-income profiles, private banks only strong ones.
+    """
+    weak = cgpa < WEAK_CGPA or family_income < MODEST_INCOME
+    strong = cgpa >= STRONG_CGPA and family_income >= MODEST_INCOME
+    if is_public:
+        return 80 if weak else 60
+    if strong:
+        return 70
+    return 20 if weak else 45
+
+
+def risk_adjustment(cgpa, lti, loan_amount, family_income, is_public):
+    adjustment = 0
+    if cgpa < RISKY_CGPA:
+        adjustment -= 10
+    if lti > EXTREME_LTI:
+        adjustment -= 30
+    elif lti > HIGH_LTI:
+        adjustment -= 20
+    if loan_amount > COLLATERAL_LIMIT:
+        adjustment -= 10
+    if family_income < LOW_INCOME:
+        adjustment += 5 if is_public else -10
+    return adjustment
+
+
+def score_product(record, cgpa, loan_amount, family_income):
+    """
+    Score one catalog record for a profile. Returns the final 0-100 score
+    along with the rubric components that produced it.
+    """
+    is_public = record.is_public
+    lti = round(loan_amount / max(family_income, 1), 2)
+    academic = academic_score(cgpa)
+    lti_points = lti_score(lti)
+    suitability = suitability_score(cgpa, family_income, is_public)
+    risk = risk_adjustment(cgpa, lti, loan_amount, family_income, is_public)
+
+    weighted = WEIGHTS[0] * academic + WEIGHTS[1] * lti_points + WEIGHTS[2] * suitability + risk
+    score = max(0, min(100, round(weighted)))
+
+    return {
+        "score": score,
+        "academic": academic,
+        "lti": lti,
+        "lti_score": lti_points,
+        "suitability": suitability,
+        "risk": risk,
+        "is_public": is_public,
+    }
+
+
+def key_features(product):
+    features = [
+        f"Interest: {product['interest_rate']}",
+        product["loan_amount"],
+        product["repayment"],
+    ]
+    if product.get("special"):
+        features.append(product["special"])
+    return features
+
+
+def default_reason(product, breakdown, cgpa):
+    bank_type = "public sector" if breakdown["is_public"] else "private"
+    lines = [
+        f"{product['bank']} scores {breakdown['score']}/100 for this profile.",
+        f"A CGPA of {cgpa} gives an academic score of {breakdown['academic']}, "
+        f"and a loan-to-income ratio of {breakdown['lti']} scores {breakdown['lti_score']}.",
+        f"As a {bank_type} bank its fit for this profile is rated {breakdown['suitability']}/100.",
+        f"Collateral: {product['collateral']}. Interest: {product['interest_rate']}.",
+    ]
+    return " ".join(lines)
+
+
+def rank_loans(records, cgpa, loan_amount, family_income, top_n=3):
+    """
+    Rank loan_catalog records for a student profile and return the top_n
+    recommendations in the /recommend response shape. Equal scores go to the
+    cheaper starting rate, then catalog order.
+    """
+    scored = []
+    for record in records:
+        breakdown = score_product(record, cgpa, loan_amount, family_income)
+        scored.append((record, breakdown))
+
+    scored.sort(key=lambda item: (-item[1]["score"], item[0].min_rate))
+
+    recommendations = []
+    for record, breakdown in scored[:top_n]:
+        product = record.raw
+        recommendations.append({
+            "bank": product["bank"],
+            "match_reason": default_reason(product, breakdown, cgpa),
+            "score": breakdown["score"],
+            "key_features": key_features(product),
+            "link": "",
+        })
+    return recommendations
@@ -0,0 +1,152 @@
+"""
+EMI and repayment simulation across the loan catalog for /loans/simulate.
+
+Every scenario is one (bank, rate, amount, tenure, moratorium) combination.
+Rates are the two ends of each bank's advertised range. The whole grid is
+computed in one NumPy pass by broadcasting, so hundreds of scenarios cost a
+few milliseconds and no model call.
+
+Interest during the moratorium is simple interest that is added to the
+principal when repayment starts, as Indian education loans usually do. The
+capitalized amount is then repaid in equal monthly instalments:
+
+    EMI = P * i * (1 + i)^n / ((1 + i)^n - 1),  i = annual rate / 12, n = months
+"""
+import math
+import numpy as np
+
+DEFAULT_AMOUNTS = (500_000, 1_000_000, 2_000_000, 4_000_000)
+DEFAULT_TENURES = (5, 10, 15)
+DEFAULT_MORATORIUMS = (0, 12, 48)
+RATE_BOUNDS = ("min", "max")
+MAX_SCENARIOS = 20_000
+MAX_GRID_VALUES = 50
+MAX_AMOUNT = 100_000_000
+MAX_TENURE_YEARS = 30
+MAX_MORATORIUM_MONTHS = 84
+
+
+def bank_rates(records):
+    """
+    (banks, rates) for records with a usable rate: rates has one row per
+    bank holding the low and high ends of its range (equal when open-ended)
+    """
+    banks = [r for r in records if math.isfinite(r.min_rate)]
+    rates = np.array([(r.min_rate, r.max_rate or r.min_rate) for r in banks], dtype=np.float64).reshape(-1, 2)
+    return banks, rates
+
+
+def _emi(principal, monthly_rate, months):
+    growth = np.power(1 + monthly_rate, months)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        emi = principal * monthly_rate * growth / (growth - 1)
+    # A zero rate is plain division
+    return np.where(monthly_rate > 0, emi, principal / months)
+
+
+def _balance(principal, monthly_rate, emi, paid):
+    """
+    Outstanding balance after `paid` instalments
+    """
+    growth = np.power(1 + monthly_rate, paid)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        repaid = emi * (growth - 1) / monthly_rate
+    repaid = np.where(monthly_rate > 0, repaid, emi * paid)
+    return np.maximum(principal * growth - repaid, 0.0)
+
+
+def simulate(records, amounts=DEFAULT_AMOUNTS, tenures=DEFAULT_TENURES, moratoriums=DEFAULT_MORATORIUMS):
+    """
+    One dict per scenario, ordered by bank, rate bound, amount, tenure and
+    moratorium. Tenures longer than a bank's stated maximum are left out, as
+    is the high end for banks that only quote a starting rate.
+    """
+    banks, rates = bank_rates(records)
+    amount_column = np.asarray(amounts, dtype=np.int64)[None, None, :, None, None]
+    amount = amount_column.astype(np.float64)
+    tenure = np.asarray(tenures, dtype=np.int64)[None, None, None, :, None]
+    moratorium = np.asarray(moratoriums, dtype=np.int64)[None, None, None, None, :]
+    annual = rates[:, :, None, None, None] / 100
+
+    # Simple interest through the moratorium, capitalized at its end
+    capitalized = amount * (1 + annual * moratorium / 12)
+    monthly = annual / 12
+    months = tenure * 12
+    emi = _emi(capitalized, monthly, months)
+    total_payment = emi * months
+    first_year = np.minimum(months, 12)
+    first_year_principal = capitalized - _balance(capitalized, monthly, emi, first_year)
+    first_year_interest = emi * first_year - first_year_principal
+
+    shape = np.broadcast_shapes(emi.shape, amount.shape, tenure.shape, moratorium.shape)
+    columns = {
+        "rate": np.broadcast_to(rates[:, :, None, None, None], shape),
+        "amount": np.broadcast_to(amount_column, shape),
+        "tenure_years": np.broadcast_to(tenure, shape),
+        "moratorium_months": np.broadcast_to(moratorium, shape),
+        "emi": np.round(np.broadcast_to(emi, shape), 2),
+        "total_interest": np.round(np.broadcast_to(total_payment - amount, shape), 2),
+        "total_payment": np.round(np.broadcast_to(total_payment, shape), 2),
+        "moratorium_interest": np.round(np.broadcast_to(capitalized - amount, shape), 2),
+        "first_year_interest": np.round(np.broadcast_to(first_year_interest, shape), 2),
+        "first_year_principal": np.round(np.broadcast_to(first_year_principal, shape), 2),
+    }
+    max_tenure = np.array([r.max_tenure_years or np.iinfo(np.int64).max for r in banks], dtype=np.int64)
+    # Open-ended rates ("9.50% onwards") only have a low end
+    has_bound = np.array([(True, r.max_rate is not None) for r in banks], dtype=bool).reshape(-1, 2)
+    keep = np.broadcast_to(
+        (tenure <= max_tenure[:, None, None, None, None]) & has_bound[:, :, None, None, None], shape
+    )
+    max_amount = np.array([r.max_amount or np.inf for r in banks], dtype=np.float64)
+    within_limit = np.broadcast_to(amount <= max_amount[:, None, None, None, None], shape)
+
+    flat = {name: column[keep].tolist() for name, column in columns.items()}
+    flat["within_amount_limit"] = within_limit[keep].tolist()
+    positions = np.nonzero(keep)
+
+    scenarios = []
+    for row, (b, bound) in enumerate(zip(positions[0].tolist(), positions[1].tolist())):
+        scenario = {"bank": banks[b].bank, "rate_bound": RATE_BOUNDS[bound]}
+        for name, values in flat.items():
+            scenario[name] = values[row]
+        scenarios.append(scenario)
+    return scenarios
+
+
+def schedule(record, amount, tenure_years, moratorium_months, rate_bound="min"):
+    """
+    Month-by-month rows for one bank: moratorium months (no payment, simple
+    interest accruing) followed by the EMI schedule
+    """
+    _, rates = bank_rates([record])
+    annual = float(rates[0, RATE_BOUNDS.index(rate_bound)]) / 100
+    monthly = annual / 12
+    capitalized = amount * (1 + annual * moratorium_months / 12)
+    months = tenure_years * 12
+    emi = float(_emi(capitalized, monthly, months))
+
+    accrued = amount * monthly * np.arange(1, moratorium_months + 1)
+    for month, interest_so_far in enumerate(accrued.tolist(), start=1):
+        yield {
+            "month": month,
+            "phase": "moratorium",
+            "payment": 0.0,
+            "interest": round(amount * monthly, 2),
+            "principal": 0.0,
+            "balance": round(amount + interest_so_far, 2),
+        }
+
+    paid = np.arange(0, months + 1)
+    balances = _balance(capitalized, monthly, emi, paid)
+    interest = balances[:-1] * monthly
+    principal = balances[:-1] - balances[1:]
+    rows = zip(interest.round(2).tolist(), principal.round(2).tolist(), balances[1:].round(2).tolist())
+    for i, (interest_part, principal_part, balance) in enumerate(rows):
+        yield {
+            "month": moratorium_months + i + 1,
+            "phase": "repayment",
+            "payment": round(emi, 2),
+            "interest": interest_part,
+            "principal": principal_part,
+            "balance": balance,
+        }
@@ -1,16 +1,58 @@
 import os
 import json
-from fastapi import FastAPI, HTTPException, File, UploadFile
+from typing import Optional
+from fastapi import FastAPI, HTTPException, File, UploadFile, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import google.generativeai as genai
-from PIL import Image
-import io
-import PyPDF2
-import base64
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict
+import asyncio
+import gemini_client
+import loan_scoring
+import loan_catalog
+import response_cache
+import ocr_cache
+import hashlib
+import tempfile
+import pdf_text
+import pdf_pages
+import image_preprocess
+import upload_ingest
+import profile_merge
+import json_stream
+import scholarship_catalog
+import structured_output
+import metrics
+import resilience
+import ocr_jobs
+import microbatch
+import admission
 
 app = FastAPI(title="Loan Recommendation API with OCR", version="2.0")
 
+# Priority class of each LLM-backed endpoint; see admission.py
+ADMISSION_CLASSES = {
+    "/recommend": "interactive",
+    "/recommend/stream": "interactive",
+    "/scholarships": "standard",
+    "/scholarships/stream": "standard",
+    "/ocr": "standard",
+    "/ocr/batch": "bulk",
+    "/ocr/jobs": "bulk",
+}
+ADMISSION = admission.Admission()
+OCR_BATCH_MAX_FILES = int(os.getenv("OCR_BATCH_MAX_FILES", "10"))
+
+# Added first so it sits inside CORS and metrics: 429s still carry CORS
+# headers and are timed like any other response
+app.add_middleware(admission.AdmissionMiddleware, controller=ADMISSION, classes=ADMISSION_CLASSES)
+app.add_middleware(
+    upload_ingest.BodyLimitMiddleware,
+    limits={
+        "/ocr": upload_ingest.OCR_MAX_UPLOAD_BYTES + upload_ingest.MULTIPART_OVERHEAD,
+        "/ocr/jobs": upload_ingest.OCR_MAX_UPLOAD_BYTES + upload_ingest.MULTIPART_OVERHEAD,
+        "/ocr/batch": OCR_BATCH_MAX_FILES * (upload_ingest.OCR_MAX_UPLOAD_BYTES + upload_ingest.MULTIPART_OVERHEAD),
+    },
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://127.0.0.1:5173", "http://localhost:3000", "https://edbridgeai.vercel.app"],
@@ -18,6 +60,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
 
 from dotenv import load_dotenv
 
@@ -27,111 +70,6 @@ API_KEY = os.getenv("API_KEY")
 if not API_KEY:
     raise ValueError("API_KEY not found in environment variables")
 
-genai.configure(api_key=API_KEY)
-
-LOAN_PRODUCTS = [
-  {
-    "bank": "State Bank of India",
-    "interest_rate": "8.30%–11.50%",
-    "loan_amount": "Up to ₹3 crore",
-    "collateral": "Not required up to ₹7.5 lakh; required above",
-    "documents": ["Admission letter", "Previous marksheets", "Cost estimate", "KYC", "Co-applicant details"],
-    "credit_score": "Co-applicant CIBIL 685+ preferred",
-    "repayment": "Moratorium, then up to 15 years",
-    "special": "Global Ed-Vantage scheme"
-  },
-  {
-    "bank": "Punjab National Bank",
-    "interest_rate": "8.55%–11.25%",
-    "loan_amount": "Up to ₹1 crore",
-    "collateral": "None up to ₹7.5 lakh; otherwise, tangible security",
-    "documents": ["Admission proof", "Mark sheets", "Co-applicant"],
-    "credit_score": "Co-borrower's credit profile considered",
-    "repayment": "Moratorium, then 15 years",
-    "special": None
-  },
-  {
-    "bank": "Bank of Baroda",
-    "interest_rate": "9.10%–12.45%",
-    "loan_amount": "Up to ₹80 lakh (abroad)",
-    "collateral": "None up to ₹7.5 lakh, security above",
-    "documents": ["Admission letter", "Past marksheets"],
-    "credit_score": "Co-applicant or collateral",
-    "repayment": "Moratorium, then 15 years",
-    "special": None
-  },
-  {
-    "bank": "ICICI Bank",
-    "interest_rate": "9.50% onwards",
-    "loan_amount": "Up to ₹2 crore",
-    "collateral": "May be required for large amounts",
-    "documents": ["Admission letter", "KYC", "Co-applicant"],
-    "credit_score": "Co-applicant or collateral",
-    "repayment": "Moratorium, then 10-15 years",
-    "special": None
-  },
-  {
-    "bank": "Bank of India",
-    "interest_rate": "8.25%–11.60%",
-    "loan_amount": "Up to ₹1 crore",
-    "collateral": "None up to ₹7.5 lakh; tangible security above",
-    "documents": ["Merit/admission letter", "Past marksheets"],
-    "credit_score": "Co-applicant/collateral",
-    "repayment": "Moratorium, then 15 years",
-    "special": None
-  },
-  {
-    "bank": "Canara Bank",
-    "interest_rate": "7.30%–10.85%",
-    "loan_amount": "Up to ₹1 crore",
-    "collateral": "Not required up to ₹7.5 lakh; otherwise tangible security",
-    "documents": ["Admission", "Academic proofs", "Co-applicant"],
-    "credit_score": "Co-applicant's CIBIL used",
-    "repayment": "Moratorium, then 15 years",
-    "special": None
-  },
-  {
-    "bank": "Bank of Maharashtra",
-    "interest_rate": "7.60%–11.05%",
-    "loan_amount": "Up to ₹20-40 lakh",
-    "collateral": "Not required up to ₹7.5 lakh; above: collateral",
-    "documents": ["Fee schedule", "Marksheets", "Co-applicant", "Account proof"],
-    "credit_score": "Co-applicant preferred",
-    "repayment": "Moratorium, then 15 years",
-    "special": None
-  },
-  {
-    "bank": "Axis Bank",
-    "interest_rate": "13.70%–15.20%",
-    "loan_amount": "Up to ₹40 lakh",
-    "collateral": "May not be required for select institutes",
-    "documents": ["Academic proofs", "Co-applicant"],
-    "credit_score": "Applicant & co-applicant scored",
-    "repayment": "Moratorium, then up to 10-15 years",
-    "special": None
-  },
-  {
-    "bank": "HDFC Bank",
-    "interest_rate": "9.50% onwards",
-    "loan_amount": "Up to ₹50-150 lakh",
-    "collateral": "May not be needed for select institutes",
-    "documents": ["Admission", "Academic", "Cost", "Co-applicant"],
-    "credit_score": "Co-applicant preferred",
-    "repayment": "Moratorium, then max 15 years",
-    "special": None
-  },
-  {
-    "bank": "Central Bank of India",
-    "interest_rate": "8.30%–11.25%",
-    "loan_amount": "Up to ₹50 lakh",
-    "collateral": "Required above ₹7.5 lakh",
-    "documents": ["Admission", "Proof of expenses", "Past records"],
-    "credit_score": "Co-applicant preferred",
-    "repayment": "Moratorium, then max 15 years",
-    "special": None
-  }
-]
-
 class StudentProfile(BaseModel):
     name: str
     dob: str
@@ -141,144 +79,453 @@ class StudentProfile(BaseModel):
     loanAmount: int
     familyIncome: int
 
+class OcrExtraction(BaseModel):
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+    name: str = ""
+    dob: str = ""
+    college: str = ""
+    course: str = ""
+    batch: str = ""
+    cgpa: str = ""
+    loanAmount: str = ""
+    familyIncome: str = ""
+
+class MatchReason(BaseModel):
+    bank: str
+    match_reason: str
+
+class Scholarship(BaseModel):
+    name: str
+    provider: str = ""
+    amount: str = ""
+    eligibility: str = ""
+    deadline: str = ""
+    category: str = ""
+    link: str = ""
+    description: str = ""
+
+class MatchReasonBatch(BaseModel):
+    key: str
+    reasons: list[MatchReason]
+
+class ScholarshipBatch(BaseModel):
+    key: str
+    scholarships: list[Scholarship]
+
+LOAN_CATALOG = loan_catalog.CatalogStore()
+
 @app.get("/loans")
-async def get_loan_products():
+async def get_loan_products(
+    request: Request,
+    amount: Optional[int] = None,
+    max_rate: Optional[float] = None,
+    bank_type: Optional[str] = None,
+):
+    """
+    Return available loan products, optionally only those that can lend
+    `amount`, start at or below `max_rate` or are `public`/`private` banks
+    """
+    if bank_type is not None and bank_type not in loan_catalog.BANK_TYPES:
+        raise HTTPException(status_code=400, detail="bank_type must be 'public' or 'private'")
+
+    catalog = LOAN_CATALOG.current
+    body, etag = catalog.payload(amount=amount, max_rate=max_rate, bank_type=bank_type)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Catalog-Version": catalog.version}
+
+    if loan_catalog.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+class LoanSimulationRequest(BaseModel):
+    amounts: Optional[list[int]] = None
+    tenure_years: Optional[list[int]] = None
+    moratorium_months: Optional[list[int]] = None
+    banks: Optional[list[str]] = None
+    bank_type: Optional[str] = None
+
+
+def simulation_records(banks=None, bank_type=None):
+    if bank_type is not None and bank_type not in loan_catalog.BANK_TYPES:
+        raise HTTPException(status_code=400, detail="bank_type must be 'public' or 'private'")
+    records = LOAN_CATALOG.current.filter(bank_type=bank_type)
+    if banks:
+        unknown = set(banks) - {r.bank for r in records}
+        if unknown:
+            raise HTTPException(status_code=404, detail=f"Unknown bank: {', '.join(sorted(unknown))}")
+        records = [r for r in records if r.bank in banks]
+    return records
+
+
+def check_grid(name, values, low, high, limit):
+    if not values:
+        raise HTTPException(status_code=400, detail=f"{name} must not be empty")
+    if len(values) > limit:
+        raise HTTPException(status_code=400, detail=f"At most {limit} {name} values")
+    if any(value < low or value > high for value in values):
+        raise HTTPException(status_code=400, detail=f"{name} must be between {low} and {high}")
+    return sorted(set(values))
+
+
+@app.post("/loans/simulate")
+async def simulate_loans(payload: LoanSimulationRequest):
+    """
+    EMI, total interest and first-year amortization for every bank across a
+    grid of amounts, tenures and moratorium lengths, at both ends of each
+    bank's rate range. Computed locally in one vectorized pass.
+    """
+    import loan_simulation
+
+    records = simulation_records(payload.banks, payload.bank_type)
+    amounts = check_grid(
+        "amounts", payload.amounts or loan_simulation.DEFAULT_AMOUNTS,
+        1, loan_simulation.MAX_AMOUNT, loan_simulation.MAX_GRID_VALUES,
+    )
+    tenures = check_grid(
+        "tenure_years", payload.tenure_years or loan_simulation.DEFAULT_TENURES,
+        1, loan_simulation.MAX_TENURE_YEARS, loan_simulation.MAX_GRID_VALUES,
+    )
+    moratoriums = check_grid(
+        "moratorium_months",
+        loan_simulation.DEFAULT_MORATORIUMS if payload.moratorium_months is None else payload.moratorium_months,
+        0, loan_simulation.MAX_MORATORIUM_MONTHS, loan_simulation.MAX_GRID_VALUES,
+    )
+    if len(records) * 2 * len(amounts) * len(tenures) * len(moratoriums) > loan_simulation.MAX_SCENARIOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many scenarios (max {loan_simulation.MAX_SCENARIOS}), narrow the grid or the banks",
+        )
+
+    with metrics.span("loan_simulation"):
+        scenarios = await asyncio.to_thread(loan_simulation.simulate, records, amounts, tenures, moratoriums)
+    return {"count": len(scenarios), "scenarios": scenarios}
+
+
+@app.get("/loans/simulate/schedule")
+async def loan_schedule(
+    bank: str,
+    amount: int,
+    tenure_years: int,
+    moratorium_months: int = 0,
+    rate_bound: str = "min",
+):
     """
-    Return all available loan products
+    Stream the full month-by-month repayment schedule for one bank as NDJSON
     """
-    return {"loans": LOAN_PRODUCTS}
+    import loan_simulation
+
+    if rate_bound not in loan_simulation.RATE_BOUNDS:
+        raise HTTPException(status_code=400, detail="rate_bound must be 'min' or 'max'")
+    check_grid("amount", [amount], 1, loan_simulation.MAX_AMOUNT, 1)
+    check_grid("tenure_years", [tenure_years], 1, loan_simulation.MAX_TENURE_YEARS, 1)
+    check_grid("moratorium_months", [moratorium_months], 0, loan_simulation.MAX_MORATORIUM_MONTHS, 1)
+    record = simulation_records([bank])[0]
+    if not loan_simulation.bank_rates([record])[0]:
+        raise HTTPException(status_code=422, detail=f"{bank} does not publish an interest rate")
+
+    def stream():
+        lines = []
+        for row in loan_simulation.schedule(record, amount, tenure_years, moratorium_months, rate_bound):
+            lines.append(json.dumps(row))
+            # One chunk per year of the schedule
+            if len(lines) == 12:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+OCR_MODEL = "gemini-2.5-flash"
+
+OCR_PDF_PROMPT = """
+You are analyzing a student document (ID card, marksheet, or admission letter) in PDF format.
+
+Extract and return ONLY this JSON (no extra text):
+{
+  "name": "student full name",
+  "dob": "date of birth",
+  "college": "college/university name",
+  "course": "course/program name",
+  "batch": "batch/year",
+  "cgpa": "CGPA or percentage",
+  "loanAmount": "loan amount needed in INR",
+  "familyIncome": "family annual income in INR"
+}
+
+Rules:
+- Extract exactly what you see
+- If a field is not visible, use empty string ""
+- Return pure JSON only, no markdown, no explanations
+"""
 
-@app.post("/ocr")
-async def extract_student_data(file: UploadFile = File(...)):
+OCR_TEXT_PROMPT = """
+Here is text extracted from a student document:
+
+{text}
+
+Extract and return ONLY this JSON:
+{{
+  "name": "student full name",
+  "dob": "date of birth",
+  "college": "college/university name",
+  "course": "course/program name",
+  "batch": "batch/year",
+  "cgpa": "CGPA or percentage",
+  "loanAmount": "loan amount needed in INR",
+  "familyIncome": "family annual income in INR"
+}}
+
+Return pure JSON only, no markdown.
+"""
+
+OCR_IMAGE_PROMPT = """
+You are analyzing a student document (ID card, marksheet, or admission letter).
+
+Extract and return ONLY this JSON (no extra text):
+{
+  "name": "student full name",
+  "dob": "date of birth",
+  "college": "college/university name",
+  "course": "course/program name",
+  "batch": "batch/year",
+  "cgpa": "CGPA or percentage",
+  "loanAmount": "loan amount needed in INR",
+  "familyIncome": "family annual income in INR"
+}
+
+Rules:
+- Extract exactly what you see
+- If a field is not visible, use empty string ""
+- Return pure JSON only, no markdown, no explanations
+"""
+
+OCR_PAGE_PROMPT = """
+You are analyzing one page of a scanned student document (ID card, marksheet, or admission letter).
+Other pages are read separately, so only report what is on this page.
+
+Extract and return ONLY this JSON (no extra text):
+{
+  "name": "student full name",
+  "dob": "date of birth",
+  "college": "college/university name",
+  "course": "course/program name",
+  "batch": "batch/year",
+  "cgpa": "CGPA or percentage",
+  "loanAmount": "loan amount needed in INR",
+  "familyIncome": "family annual income in INR"
+}
+
+Rules:
+- Extract exactly what you see
+- If a field is not on this page, use empty string ""
+- Return pure JSON only, no markdown, no explanations
+"""
+
+OCR_TEMPERATURE = 0.1
+
+# Scanned PDFs with several pages are split and read page by page
+OCR_PER_PAGE = os.getenv("OCR_PER_PAGE", "1") == "1"
+# Reading pages stops once all of these have a value. Only fields that
+# marksheets and ID pages actually print: loan amount and family income are
+# almost never on them, and requiring those would read every page.
+OCR_REQUIRED_FIELDS = tuple(
+    field.strip()
+    for field in os.getenv("OCR_REQUIRED_FIELDS", "name,college,course,cgpa").split(",")
+    if field.strip() in OcrExtraction.model_fields
+)
+
+PDF_POLL_INITIAL = 0.5
+PDF_POLL_MAX = 4.0
+PDF_PROCESSING_TIMEOUT = float(os.getenv("PDF_PROCESSING_TIMEOUT", "30"))
+# Total time one document may spend waiting on Gemini
+OCR_DEADLINE = float(os.getenv("OCR_DEADLINE", "45"))
+
+# Cached extractions are only valid for the prompts, model, PDF and image
+# settings that produced them; changing any (or bumping OCR_CACHE_SALT) starts a fresh cache.
+OCR_CACHE = ocr_cache.OcrCache(
+    os.getenv("OCR_CACHE_PATH", os.path.join(tempfile.gettempdir(), "edbridge-ocr-cache.sqlite3")),
+    version=hashlib.sha256(
+        "\0".join([
+            OCR_MODEL, OCR_PDF_PROMPT, OCR_TEXT_PROMPT, OCR_IMAGE_PROMPT, OCR_PAGE_PROMPT,
+            str(pdf_text.TOKEN_BUDGET), str(OCR_PER_PAGE), ",".join(OCR_REQUIRED_FIELDS),
+            str(image_preprocess.OCR_IMAGE_MAX_EDGE), str(image_preprocess.OCR_IMAGE_QUALITY),
+            image_preprocess.OCR_IMAGE_MODE, str(image_preprocess.OCR_IMAGE_BINARY_THRESHOLD),
+            os.getenv("OCR_CACHE_SALT", ""),
+        ]).encode("utf-8")
+    ).hexdigest(),
+    max_bytes=int(os.getenv("OCR_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+)
+
+async def upload_pdf(upload):
     """
-    Upload a student document (ID card, marksheet, PDF, etc.)
-    → Extract structured details using Gemini Vision OCR.
+    Upload a PDF to Gemini and wait, with backoff, until it has been processed
+    """
+    with metrics.span("file_upload"):
+        uploaded_file = await resilience.upload_file(upload.stream(), mime_type="application/pdf")
+
+    with metrics.span("processing_wait"), resilience.deadline(PDF_PROCESSING_TIMEOUT):
+        delay = PDF_POLL_INITIAL
+        while uploaded_file.state.name == "PROCESSING":
+            metrics.debug("⏳ Waiting for PDF processing...")
+            if resilience.remaining() <= delay:
+                metrics.DEADLINES_EXCEEDED.inc()
+                raise resilience.DeadlineExceeded("PDF processing did not finish in time")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, PDF_POLL_MAX)
+            uploaded_file = await resilience.get_file(uploaded_file.name)
+
+    if uploaded_file.state.name == "FAILED":
+        raise ValueError("PDF processing failed")
+
+    metrics.debug("✅ PDF uploaded and processed")
+    return uploaded_file
+
+
+async def read_pdf_page(page):
     """
+    OCR one page of a scanned PDF, sent inline
+    """
+    if page.mime_type.startswith("image/"):
+        with metrics.span("image_preprocess"):
+            part = await image_preprocess.preprocess_async(page.data)
+    else:
+        part = {"mime_type": page.mime_type, "data": page.data}
+    return await structured_output.generate(
+        OCR_MODEL,
+        [OCR_PAGE_PROMPT, part],
+        OcrExtraction,
+        temperature=OCR_TEMPERATURE,
+    )
+
+
+async def split_pdf(file_bytes):
+    """
+    Pages of a scanned PDF for per-page OCR, or [] to read it as one file
+    """
+    if not OCR_PER_PAGE:
+        return []
     try:
-        print(f"📥 Received file: {file.filename}")
-        print(f"📋 Content type: {file.content_type}")
-        
-        file_bytes = await file.read()
-        print(f"📊 File size: {len(file_bytes)} bytes")
-        
-        if len(file_bytes) == 0:
-            raise HTTPException(status_code=400, detail="Empty file uploaded")
+        with metrics.span("pdf_split"):
+            pages = await asyncio.to_thread(pdf_pages.split, file_bytes)
+    except Exception as split_error:
+        print(f"⚠️ Could not split PDF into pages: {split_error}")
+        return []
+    return pages if len(pages) > 1 else []
+
+
+def local_extraction(text):
+    """
+    Fields read from a PDF text layer without Gemini, used while it is unavailable
+    """
+    metrics.FALLBACKS.inc(path="pdf_text")
+    print("⚠️ Gemini unavailable, extracting fields from the PDF text layer")
+    return pdf_text.extract_fields(text)
+
+
+async def extract_document(upload):
+    """
+    Extract structured details from one ingested document using Gemini Vision OCR.
+    Raises HTTPException on failure.
+    """
+    with resilience.deadline(OCR_DEADLINE):
+        return await _extract_document(upload)
+
+
+async def _extract_document(upload):
+    cacheable = True
+    try:
+        file_bytes = upload.data
+        digest = upload.sha256
+
+        cached = await OCR_CACHE.get(digest)
+        if cached is not None:
+            metrics.debug(f"⚡ OCR cache hit: {digest[:12]}")
+            return cached
         
-        if file.content_type == "application/pdf":
-            print("📄 Processing PDF file...")
-            
+        if upload.is_pdf:
+            metrics.debug("📄 Processing PDF file...")
+            model = OCR_MODEL
+
+            # Tier 1: the local text layer. Digitally generated PDFs are
+            # answered from their text without uploading the document.
             try:
-                pdf_part = {
-                    "mime_type": "application/pdf",
-                    "data": base64.b64encode(file_bytes).decode('utf-8')
-                }
-                
-                ocr_prompt = """
-                You are analyzing a student document (ID card, marksheet, or admission letter) in PDF format.
-                
-                Extract and return ONLY this JSON (no extra text):
-                {
-                  "name": "student full name",
-                  "dob": "date of birth",
-                  "college": "college/university name",
-                  "course": "course/program name",
-                  "batch": "batch/year",
-                  "cgpa": "CGPA or percentage"
-                  "loanAmount": "loan amount needed in INR"
-                  "familyIncome": "family annual income in INR"
-                }
-
-                Rules:
-                - Extract exactly what you see
-                - If a field is not visible, use empty string ""
-                - Return pure JSON only, no markdown, no explanations
-                """
-                
-                print("🤖 Sending PDF to Gemini...")
-                model = genai.GenerativeModel('gemini-2.5-flash')
-                
-                import tempfile
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(file_bytes)
-                    tmp_path = tmp_file.name
-                
+                with metrics.span("pdf_text"):
+                    pages = await asyncio.to_thread(pdf_text.extract_pages, file_bytes)
+            except Exception as text_error:
+                print(f"⚠️ Could not read PDF text layer: {text_error}")
+                pages = []
+            text = "\n".join(pages)
+            metrics.debug(f"📝 Extracted text from PDF ({len(text)} chars)")
+
+            # Only the parts of a long document that mention our fields go in the prompt
+            prompt_text, selection = pdf_text.select_text(pages)
+            metrics.PDF_TEXT_TOKENS.inc(selection["tokens_before"], stage="extracted")
+            metrics.PDF_TEXT_TOKENS.inc(selection["tokens_after"], stage="sent")
+            if selection["tokens_after"] < selection["tokens_before"]:
+                metrics.debug(
+                    f"✂️ PDF text cut from ~{selection['tokens_before']} to ~{selection['tokens_after']} tokens "
+                    f"({selection['pages_used']} of {selection['pages']} pages)"
+                )
+
+            if pdf_text.is_usable(text):
+                metrics.debug("🤖 Sending PDF text to Gemini...")
                 try:
-                    uploaded_file = genai.upload_file(tmp_path, mime_type="application/pdf")
-                    
-                    import time
-                    while uploaded_file.state.name == "PROCESSING":
-                        print("⏳ Waiting for PDF processing...")
-                        time.sleep(2)
-                        uploaded_file = genai.get_file(uploaded_file.name)
-                    
-                    if uploaded_file.state.name == "FAILED":
-                        raise ValueError("PDF processing failed")
-                    
-                    print("✅ PDF uploaded and processed")
-                    
-                    response = model.generate_content(
-                        [ocr_prompt, uploaded_file],
-                        generation_config=genai.types.GenerationConfig(
-                            temperature=0.1,
-                        )
+                    extracted_data = await structured_output.generate(
+                        model,
+                        OCR_TEXT_PROMPT.format(text=prompt_text),
+                        OcrExtraction,
+                        temperature=OCR_TEMPERATURE,
                     )
-                finally:
-                    os.unlink(tmp_path)
-                
-                print("📥 Received response from Gemini")
-                
-            except Exception as pdf_error:
-                print(f"❌ PDF processing error: {pdf_error}")
+                except resilience.UpstreamUnavailable:
+                    extracted_data = local_extraction(text)
+                    cacheable = False
+            else:
+                # Tier 2: image-only PDF, Gemini has to read the document itself
                 try:
-                    pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
-                    text = ""
-                    for page in pdf_reader.pages:
-                        text += page.extract_text() + "\n"
-                    
-                    print(f"📝 Extracted text from PDF ({len(text)} chars)")
-                    
-                    ocr_prompt = f"""
-                    Here is text extracted from a student document:
-                    
-                    {text}
-                    
-                    Extract and return ONLY this JSON:
-                    {{
-                      "name": "student full name",
-                      "dob": "date of birth",
-                      "college": "college/university name",
-                      "course": "course/program name",
-                      "batch": "batch/year",
-                      "cgpa": "CGPA or percentage"
-                      "loanAmount": "loan amount needed in INR"
-                      "familyIncome": "family annual income in INR"
-                    }}
-                    
-                    Return pure JSON only, no markdown.
-                    """
-                    
-                    model = genai.GenerativeModel('gemini-2.5-flash')
-                    response = model.generate_content(
-                        ocr_prompt,
-                        generation_config=genai.types.GenerationConfig(
-                            temperature=0.1,
+                    pages = await split_pdf(file_bytes)
+                    if pages:
+                        metrics.debug(f"🤖 Reading {len(pages)} scanned pages with Gemini...")
+                        extracted_data = await pdf_pages.extract(pages, read_pdf_page, OCR_REQUIRED_FIELDS)
+                    else:
+                        metrics.debug("🤖 Uploading scanned PDF to Gemini...")
+                        uploaded_file = await upload_pdf(upload)
+                        extracted_data = await structured_output.generate(
+                            model,
+                            [OCR_PDF_PROMPT, uploaded_file],
+                            OcrExtraction,
+                            temperature=OCR_TEMPERATURE,
                         )
+                except (HTTPException, structured_output.StructuredOutputError):
+                    raise
+                except resilience.UpstreamUnavailable:
+                    if not text.strip():
+                        raise
+                    extracted_data = local_extraction(text)
+                    cacheable = False
+                except Exception as pdf_error:
+                    print(f"❌ PDF processing error: {pdf_error}")
+                    if not text.strip():
+                        raise HTTPException(
+                            status_code=400,
+                            detail=f"Could not process PDF: {str(pdf_error)}"
+                        )
+                    # Whatever text there was is still better than failing
+                    extracted_data = await structured_output.generate(
+                        model,
+                        OCR_TEXT_PROMPT.format(text=prompt_text),
+                        OcrExtraction,
+                        temperature=OCR_TEMPERATURE,
                     )
-                    
-                except Exception as fallback_error:
-                    print(f"❌ PDF fallback also failed: {fallback_error}")
-                    raise HTTPException(
-                        status_code=400, 
-                        detail=f"Could not process PDF: {str(fallback_error)}"
-                    )
+
+            metrics.debug("📥 Received response from Gemini")
         
         else:
-            print("🖼️ Processing image file...")
+            metrics.debug("🖼️ Processing image file...")
             try:
-                image = Image.open(io.BytesIO(file_bytes))
-                if image.mode not in ('RGB', 'L'):
-                    image = image.convert('RGB')
-                print(f"✅ Image loaded: format={image.format}, mode={image.mode}, size={image.size}")
+                with metrics.span("image_preprocess"):
+                    image = await image_preprocess.preprocess_async(file_bytes)
             except Exception as img_error:
                 print(f"❌ Image processing error: {img_error}")
                 raise HTTPException(
@@ -286,70 +533,39 @@ async def extract_student_data(file: UploadFile = File(...)):
                     detail=f"Invalid image file. Please upload JPG, PNG, or PDF. Error: {str(img_error)}"
                 )
             
-            ocr_prompt = """
-            You are analyzing a student document (ID card, marksheet, or admission letter).
-            
-            Extract and return ONLY this JSON (no extra text):
-            {
-              "name": "student full name",
-              "dob": "date of birth",
-              "college": "college/university name",
-              "course": "course/program name",
-              "batch": "batch/year",
-              "cgpa": "CGPA or percentage"
-              "loanAmount": "loan amount needed in INR"
-              "familyIncome": "family annual income in INR"
-            }
-
-            Rules:
-            - Extract exactly what you see
-            - If a field is not visible, use empty string ""
-            - Return pure JSON only, no markdown, no explanations
-            """
-
-            print("🤖 Sending image to Gemini...")
-            model = genai.GenerativeModel('gemini-2.5-flash')
+            ocr_prompt = OCR_IMAGE_PROMPT
+
+            metrics.debug("🤖 Sending image to Gemini...")
+            model = OCR_MODEL
             
-            response = model.generate_content(
+            extracted_data = await structured_output.generate(
+                model,
                 [ocr_prompt, image],
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.1,
-                )
+                OcrExtraction,
+                temperature=OCR_TEMPERATURE,
             )
             
-            print("📥 Received response from Gemini")
+            metrics.debug("📥 Received response from Gemini")
         
-        if not response or not response.text:
-            raise HTTPException(status_code=500, detail="Empty response from Gemini API")
-
-        response_text = response.text.strip()
-        print(f"📝 Raw response (first 500 chars):\n{response_text[:500]}")
-        
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            parts = response_text.split("```")
-            if len(parts) >= 2:
-                response_text = parts[1].strip()
-
-        print(f"🧹 Cleaned response:\n{response_text}")
-        
-        try:
-            extracted_data = json.loads(response_text)
-            print(f"✅ Successfully parsed JSON: {extracted_data}")
-        except json.JSONDecodeError as e:
-            print(f"❌ JSON parsing failed: {e}")
-            print(f"❌ Problematic text: {response_text}")
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Could not parse OCR response as JSON. Error: {str(e)}"
-            )
+        metrics.debug(f"✅ Successfully parsed JSON: {extracted_data}")
 
-        return {"extracted_data": extracted_data}
+        # Fallback answers are not cached, so the next upload gets a real extraction
+        if cacheable:
+            await OCR_CACHE.put(digest, extracted_data)
+        return extracted_data
 
     except HTTPException as he:
-        print(f"⚠️ HTTP Exception: {he.detail}")
+        metrics.debug(f"⚠️ HTTP Exception: {he.detail}")
         raise
+    except resilience.UpstreamUnavailable as e:
+        print(f"⚠️ Gemini unavailable: {e}")
+        raise resilience.http_error(e)
+    except structured_output.StructuredOutputError as e:
+        print(f"❌ JSON parsing failed: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Could not parse OCR response as JSON. Error: {str(e)}"
+        )
     except Exception as e:
         print(f"❌ Unexpected error: {type(e).__name__}: {e}")
         import traceback
@@ -358,142 +574,489 @@ async def extract_student_data(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"OCR failed: {str(e)}")
 
 
-@app.post("/recommend")
-async def recommend_loans(profile: StudentProfile):
+@app.post("/ocr")
+async def extract_student_data(file: UploadFile = File(...)):
     """
-    Input: Student profile
-    Output: Top 3 recommended loans (JSON)
+    Upload a student document (ID card, marksheet, PDF, etc.)
+    → Extract structured details using Gemini Vision OCR.
     """
-    try:
-        # --------- Data sanitization to avoid 422 ---------
-        try:
-            cgpa = float(profile.cgpa) if profile.cgpa not in ["", None] else 0.0
-        except:
-            cgpa = 0.0
+    metrics.debug(f"📥 Received file: {file.filename}")
+    metrics.debug(f"📋 Content type: {file.content_type}")
 
-        try:
-            loanAmount = int(profile.loanAmount)
-        except:
-            loanAmount = 0
+    with metrics.span("ingest"):
+        upload = await upload_ingest.ingest(file)
+    metrics.debug(f"📊 File size: {upload.size} bytes, detected type: {upload.mime_type}")
+
+    return {"extracted_data": await extract_document(upload)}
+
+
+OCR_BATCH_PARALLELISM = int(os.getenv("OCR_BATCH_PARALLELISM", "4"))
+
+
+@app.post("/ocr/batch")
+async def extract_student_data_batch(files: list[UploadFile] = File(...)):
+    """
+    Upload several student documents at once. Each document's extracted_data
+    is streamed back as an NDJSON line as soon as it is ready; the last line
+    holds the profile merged across all documents.
+    """
+    if len(files) > OCR_BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"Too many files (max {OCR_BATCH_MAX_FILES})")
+
+    metrics.debug(f"📥 Received batch of {len(files)} files")
+
+    semaphore = asyncio.Semaphore(OCR_BATCH_PARALLELISM)
 
+    async def process(index, file):
+        # Each file is read from its spooled copy only once it has a slot, so
+        # at most OCR_BATCH_PARALLELISM uploads are held in memory at a time
+        async with semaphore:
+            try:
+                with metrics.span("ingest"):
+                    upload = await upload_ingest.ingest(file)
+                return index, await extract_document(upload), None
+            except HTTPException as he:
+                return index, None, {"status": he.status_code, "detail": he.detail}
+
+    async def stream():
+        tasks = [asyncio.create_task(process(i, file)) for i, file in enumerate(files)]
+        results = [None] * len(files)
         try:
-            familyIncome = int(profile.familyIncome)
-        except:
-            familyIncome = 0
+            for finished in asyncio.as_completed(tasks):
+                index, extracted_data, error = await finished
+                line = {"index": index, "filename": files[index].filename}
+                if error is None:
+                    results[index] = extracted_data
+                    line["extracted_data"] = extracted_data
+                else:
+                    line["error"] = error
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+
+            merged, sources, conflicts = profile_merge.merge_profiles(results)
+            yield json.dumps(
+                {"merged_profile": merged, "sources": sources, "conflicts": conflicts},
+                ensure_ascii=False,
+            ) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+def job_error(error):
+    if isinstance(error, HTTPException):
+        return error.status_code, str(error.detail)
+    return 500, f"OCR failed: {error}"
+
+
+async def run_ocr_job(job):
+    upload = upload_ingest.IngestedUpload(job["filename"], job["payload"], job["sha256"], job["mime_type"])
+    return json.dumps(await extract_document(upload), ensure_ascii=False)
+
+
+OCR_JOBS = ocr_jobs.JobStore(
+    os.getenv("OCR_JOBS_PATH", os.path.join(tempfile.gettempdir(), "edbridge-ocr-jobs.sqlite3")),
+    # A job still running after this long is assumed lost with its worker
+    lease_seconds=OCR_DEADLINE * 2,
+    retention_seconds=int(os.getenv("OCR_JOB_RETENTION", str(24 * 3600))),
+)
+OCR_JOB_QUEUE = ocr_jobs.JobQueue(
+    OCR_JOBS,
+    run_ocr_job,
+    job_error,
+    workers=int(os.getenv("OCR_JOB_WORKERS", "3")),
+    priority_workers=int(os.getenv("OCR_JOB_PRIORITY_WORKERS", "1")),
+    small_image_bytes=int(os.getenv("OCR_JOB_SMALL_IMAGE_BYTES", str(1024 * 1024))),
+)
+OCR_JOB_EVENTS_TIMEOUT = float(os.getenv("OCR_JOB_EVENTS_TIMEOUT", "300"))
 
-        # Safeguard: If any numeric field is zero, use fallback defaults
-        if loanAmount <= 0:
-            loanAmount = 500000
-        if familyIncome <= 0:
-            familyIncome = 300000
 
-        lti = round(loanAmount / max(familyIncome, 1), 2)
+@app.on_event("startup")
+async def start_ocr_job_workers():
+    OCR_JOB_QUEUE.start()
 
-        # --------- AI prompt ---------
-        prompt_text = f"""
-You are an experienced Indian education loan analyst. Evaluate the student's profile carefully and recommend the **TOP 3 banks** most suitable for an education loan.
 
-STUDENT PROFILE:
-- Name: {profile.name}
-- DOB: {profile.dob}
-- College: {profile.college}
+@app.on_event("shutdown")
+async def stop_ocr_job_workers():
+    await OCR_JOB_QUEUE.stop()
+
+
+@app.on_event("startup")
+async def start_loan_catalog_reload():
+    LOAN_CATALOG.start()
+
+
+@app.on_event("shutdown")
+async def stop_loan_catalog_reload():
+    await LOAN_CATALOG.stop()
+
+
+def job_view(job):
+    """
+    Public shape of a job: status and timings, plus the result or error once finished
+    """
+    view = {
+        "id": job["id"],
+        "status": job["status"],
+        "lane": job["lane"],
+        "filename": job["filename"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }
+    if "queue_position" in job:
+        view["queue_position"] = job["queue_position"]
+    if job["status"] == ocr_jobs.DONE:
+        view["extracted_data"] = json.loads(job["result"])
+    elif job["status"] == ocr_jobs.FAILED:
+        view["error"] = {"status": job["error_status"], "detail": job["error_detail"]}
+    return view
+
+
+@app.post("/ocr/jobs", status_code=202)
+async def create_ocr_job(file: UploadFile = File(...)):
+    """
+    Queue a document for OCR and return its job id immediately. Poll
+    GET /ocr/jobs/{id} or subscribe to GET /ocr/jobs/{id}/events for the result.
+    """
+    with metrics.span("ingest"):
+        upload = await upload_ingest.ingest(file)
+
+    # Known documents finish straight away
+    cached = await OCR_CACHE.get(upload.sha256)
+    result = json.dumps(cached, ensure_ascii=False) if cached is not None else None
+    job_id = await OCR_JOB_QUEUE.submit(upload, result=result)
+    metrics.debug(f"🧾 Queued OCR job {job_id[:8]} for {upload.filename}")
+
+    return {
+        "id": job_id,
+        "status": ocr_jobs.DONE if result is not None else ocr_jobs.QUEUED,
+        "lane": OCR_JOB_QUEUE.lane_for(upload.mime_type, upload.size),
+        "links": {"self": f"/ocr/jobs/{job_id}", "events": f"/ocr/jobs/{job_id}/events"},
+    }
+
+
+@app.get("/ocr/jobs/{job_id}")
+async def get_ocr_job(job_id: str):
+    job = await OCR_JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_view(job)
+
+
+@app.get("/ocr/jobs/{job_id}/events")
+async def ocr_job_events(job_id: str):
+    """
+    Server-Sent Events for one job: a `status` event on every change, then
+    `done` (with extracted_data) or `failed` (with the error).
+    """
+    job = await OCR_JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        current = job
+        last = None
+        try:
+            async with asyncio.timeout(OCR_JOB_EVENTS_TIMEOUT):
+                while True:
+                    view = job_view(current)
+                    state = (view["status"], view.get("queue_position"), view["attempts"])
+                    if current["status"] in ocr_jobs.FINISHED:
+                        yield sse(current["status"], view)
+                        return
+                    if state != last:
+                        last = state
+                        yield sse("status", view)
+                    await OCR_JOB_QUEUE.wait_for_change(job_id, OCR_JOB_QUEUE.poll_interval)
+                    current = await OCR_JOBS.get(job_id)
+                    if current is None:
+                        return
+        except TimeoutError:
+            yield sse("timeout", {"id": job_id, "detail": "Still running; poll the job for its result"})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+RECOMMEND_LLM_REASONS = os.getenv("RECOMMEND_LLM_REASONS", "1") == "1"
+# How long /recommend/stream keeps streaming model-written reasons
+RECOMMEND_REASON_TIMEOUT = float(os.getenv("RECOMMEND_REASON_TIMEOUT", "6"))
+# How long plain /recommend may hold its answer for model-written reasons.
+# 0 returns the local ranking with rule-based reasons straight away; the
+# prose is then only available from /recommend/stream.
+RECOMMEND_REASON_BUDGET = float(os.getenv("RECOMMEND_REASON_BUDGET", "0"))
+
+
+MATCH_REASON_ROLE = "You are an experienced Indian education loan analyst."
+MATCH_REASON_TASK = (
+    "Write a short explanation (50–100 words) of why each bank suits the student; "
+    "mention CGPA, LTI, collateral, subsidy and risk."
+)
+
+
+def match_reason_profile(profile: StudentProfile, cgpa, lti, recommendations):
+    return f"""STUDENT PROFILE:
 - Course: {profile.course}
+- College: {profile.college}
 - CGPA: {cgpa}
 - Loan Amount Needed: ₹{profile.loanAmount:,}
-- Family Income: ₹{familyIncome:,}
 - Loan-to-Income Ratio (LTI): {lti}
 
----------------------------------------------------
-EVALUATION LOGIC:
-Use these rules to decide eligibility and scoring.
-
-1️⃣ **Academic Score (0–100)**
-   - CGPA ≥ 9 → 100  
-   - 8–9 → 85  
-   - 7–8 → 70  
-   - 6–7 → 50  
-   - 5–6 → 30  
-   - <5 → 10  
-
-2️⃣ **Loan-to-Income Ratio (LTI = LoanAmount / FamilyIncome)**
-   - LTI ≤ 1 → 90  
-   - ≤2 → 80  
-   - ≤3 → 70  
-   - ≤5 → 50  
-   - ≤10 → 30  
-   - ≤20 → 15  
-   - >20 → 5  
-
-3️⃣ **Risk Adjustment**
-   - If CGPA < 6 → −10 points  
-   - If LTI > 10 → −20 points  
-   - If LTI > 20 → −30 points  
-   - If LoanAmount > 20L → −10 (collateral mandatory)  
-   - If FamilyIncome < 3L → +5 if government/public bank, −10 for private  
-
-4️⃣ **Bank Suitability**
-   - Public banks (SBI, PNB, Canara, BoB, Union, Central Bank) = best for low income or low CGPA.  
-   - Private banks (HDFC, ICICI, Axis) = only if strong profile and high CGPA.  
-   - Penalize private banks for weak profiles.  
-   - Favor government banks if CGPA < 7 or income < ₹5L.
-
-5️⃣ **Final Score**
-   Weighted = 0.4*(Academic) + 0.4*(LTI) + 0.2*(Suitability adjustments)
-   Clamp between 0–100.
-   Be very critical — weak profiles should get <45.
-
----------------------------------------------------
-OUTPUT RULES:
-Return **only** a pure JSON array with exactly 3 items. No markdown, no comments.
-Each object must follow:
+RANKED BANKS (with scores):
+{json.dumps([{"bank": rec["bank"], "score": rec["score"], "key_features": rec["key_features"]} for rec in recommendations], ensure_ascii=False)}"""
+
+
+def match_reason_prompt(profile: StudentProfile, cgpa, lti, recommendations):
+    return f"""
+{MATCH_REASON_ROLE} The banks below have already been ranked for this student.
+{MATCH_REASON_TASK}
+
+{match_reason_profile(profile, cgpa, lti, recommendations)}
+
+Return **only** a pure JSON array with one object per bank, in the same order. No markdown, no comments.
 
 [
   {{
     "bank": "Bank Name",
-    "match_reason": "Why this bank is suitable (50–100 words; mention CGPA, LTI, collateral, subsidy, risk)",
-    "score": <integer 0–100>,
-    "key_features": ["feature1", "feature2", "feature3"],
-    "link": "https://..."
+    "match_reason": "Why this bank is suitable"
   }}
 ]
 """
 
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        response = model.generate_content(prompt_text)
 
-        if not response or not response.text:
-            raise HTTPException(status_code=500, detail="No response from Gemini model.")
-        
-        response_text = response.text.strip()
+def match_reason_batch_prompt(items):
+    """
+    One prompt covering several students, each answered under its own key
+    """
+    profiles = "\n\n".join(
+        f"### Profile key: {index + 1}\n{match_reason_profile(*item)}" for index, item in enumerate(items)
+    )
+    return f"""
+{MATCH_REASON_ROLE} Below are {len(items)} students, each with banks that have already been ranked for them.
+For each student: {MATCH_REASON_TASK}
 
-        # Clean JSON
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            parts = response_text.split("```")
-            if len(parts) >= 2:
-                response_text = parts[1].strip()
+{profiles}
+
+Return **only** a pure JSON array with one object per student, using the student's key. No markdown, no comments.
+Each "reasons" array has one object per bank of that student, in the same order.
+
+[
+  {{
+    "key": "1",
+    "reasons": [
+      {{
+        "bank": "Bank Name",
+        "match_reason": "Why this bank is suitable"
+      }}
+    ]
+  }}
+]
+"""
+
+
+def keyed_results(replies, field, count):
+    """
+    {index: value} from a batch reply of {"key": "<n>", field: value} objects
+    """
+    results = {}
+    for reply in replies:
+        key = str(reply.get("key", "")).strip()
+        if key.isdigit() and 1 <= int(key) <= count:
+            results.setdefault(int(key) - 1, reply[field])
+    return results
+
+
+def apply_match_reason(recommendations, item):
+    """
+    Copy one model-written reason onto its recommendation; returns the
+    recommendation it updated, if any
+    """
+    if not isinstance(item, dict):
+        return None
+    reason = item.get("match_reason")
+    if not isinstance(reason, str) or not reason.strip():
+        return None
+    for rec in recommendations:
+        if rec["bank"] == item.get("bank"):
+            rec["match_reason"] = reason.strip()
+            return rec
+    return None
+
+
+async def generate_match_reasons(items):
+    """
+    Match reasons for a list of (profile, cgpa, lti, recommendations), as
+    {index: reasons}. A single item gets the plain one-student prompt.
+    """
+    model = "gemini-2.5-flash"
+    if len(items) == 1:
+        return {0: await structured_output.generate(model, match_reason_prompt(*items[0]), MatchReason, many=True)}
+    replies = await structured_output.generate(model, match_reason_batch_prompt(items), MatchReasonBatch, many=True)
+    return keyed_results(replies, "reasons", len(items))
+
+
+MATCH_REASON_BATCHER = microbatch.MicroBatcher(
+    "match_reasons",
+    generate_match_reasons,
+    max_items=int(os.getenv("RECOMMEND_MICROBATCH_SIZE", "4")),
+)
+
+
+async def write_match_reasons(profile: StudentProfile, cgpa, lti, recommendations):
+    """
+    Ask Gemini to rewrite the match_reason prose for already-ranked banks.
+    Scores and ordering are never taken from the model.
+    """
+    item = (profile, cgpa, lti, recommendations)
+    if microbatch.LLM_MICROBATCH:
+        reasons = await MATCH_REASON_BATCHER.submit(item, budget=RECOMMEND_REASON_BUDGET)
+    else:
+        reasons = (await generate_match_reasons([item]))[0]
+    for reason in reasons:
+        apply_match_reason(recommendations, reason)
+
+
+def sanitize_profile(profile: StudentProfile):
+    """
+    Numeric inputs for ranking, with fallbacks for missing values
+    """
+    return loan_scoring.sanitize(profile.cgpa, profile.loanAmount, profile.familyIncome)
 
-        # Parse JSON safely
-        try:
-            result_json = json.loads(response_text)
-        except json.JSONDecodeError as e:
-            print(f"JSON parse error: {e}")
-            raise HTTPException(status_code=500, detail="Invalid JSON returned by Gemini")
 
-        # Normalize output
-        if isinstance(result_json, dict):
-            result_json = [result_json]
-        if not isinstance(result_json, list):
-            raise ValueError("Invalid format: expected JSON array")
+def rank_for_profile(profile: StudentProfile, catalog):
+    cgpa, loanAmount, familyIncome, lti = sanitize_profile(profile)
+    # Prefer banks that can lend the full amount; if none can, rank them all
+    candidates = catalog.filter(amount=loanAmount) or catalog.records
+    recommendations = loan_scoring.rank_loans(candidates, cgpa, loanAmount, familyIncome)
+    return cgpa, lti, recommendations
 
-        return {"recommendations": result_json[:3]}
 
+@app.post("/recommend")
+async def recommend_loans(profile: StudentProfile):
+    """
+    Input: Student profile
+    Output: Top 3 recommended loans (JSON), ranked locally. Match reasons are
+    rule-based unless RECOMMEND_REASON_BUDGET allows a short wait for the
+    model; use /recommend/stream for model-written reasons.
+    """
+    try:
+        # --------- Local ranking ---------
+        catalog = LOAN_CATALOG.current
+        cgpa, lti, recommendations = rank_for_profile(profile, catalog)
+
+        # --------- Optional AI prose, only within a short budget ---------
+        if RECOMMEND_LLM_REASONS and RECOMMEND_REASON_BUDGET > 0:
+            try:
+                await asyncio.wait_for(
+                    write_match_reasons(profile, cgpa, lti, recommendations),
+                    timeout=RECOMMEND_REASON_BUDGET,
+                )
+            except Exception as e:
+                metrics.FALLBACKS.inc(path="rule_based_reasons")
+                print(f"Match reason generation skipped: {type(e).__name__}: {e}")
+
+        return {"recommendations": recommendations, "catalog_version": catalog.version}
+
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Recommendation error: {type(e).__name__}: {e}")
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
 
 
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+@app.post("/recommend/stream")
+async def recommend_loans_stream(profile: StudentProfile):
+    """
+    Server-Sent Events version of /recommend: the ranked banks are sent at
+    once as `recommendation` events, then each model-written match_reason
+    follows as a `reason` event as soon as it has been generated.
+    """
+    catalog = LOAN_CATALOG.current
+    cgpa, lti, recommendations = rank_for_profile(profile, catalog)
+
+    async def events():
+        for rec in recommendations:
+            yield sse("recommendation", rec)
+
+        if RECOMMEND_LLM_REASONS:
+            parser = json_stream.JsonArrayStream()
+            model = "gemini-2.5-flash"
+            try:
+                async with asyncio.timeout(RECOMMEND_REASON_TIMEOUT):
+                    prompt_text = match_reason_prompt(profile, cgpa, lti, recommendations)
+                    async for chunk in resilience.stream_generate_content(
+                        model,
+                        prompt_text,
+                        generation_config=structured_output.generation_config(MatchReason, many=True),
+                    ):
+                        for item in parser.feed(chunk):
+                            rec = apply_match_reason(recommendations, item)
+                            if rec is not None:
+                                yield sse("reason", {"bank": rec["bank"], "match_reason": rec["match_reason"]})
+            except Exception as e:
+                print(f"Match reason streaming stopped: {type(e).__name__}: {e}")
+
+        yield sse("done", {"recommendations": recommendations, "catalog_version": catalog.version})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+RECOMMEND_BATCH_MAX_ROWS = int(os.getenv("RECOMMEND_BATCH_MAX_ROWS", "200000"))
+
+_batch_ranker = None
+
+
+def get_batch_ranker():
+    """
+    Catalog columns for bulk ranking, built (along with NumPy) on first use
+    and again whenever the catalog version changes
+    """
+    global _batch_ranker
+    catalog = LOAN_CATALOG.current
+    if _batch_ranker is None or _batch_ranker[0] != catalog.version:
+        import batch_scoring
+        _batch_ranker = (catalog.version, batch_scoring.BatchRanker(catalog.records))
+    return _batch_ranker[1]
+
+
+@app.post("/recommend/batch")
+async def recommend_loans_batch(file: UploadFile = File(...)):
+    """
+    Rank loans for a whole cohort. Upload a CSV (header with cgpa, loanAmount,
+    familyIncome and optionally name/id) or NDJSON of the same fields; each
+    student's top 3 banks stream back as NDJSON lines in row order, followed
+    by a summary line. Uses the /recommend rubric only, without model prose.
+    """
+    import batch_scoring
+
+    head = await file.read(64)
+    await file.seek(0)
+    if not head.strip():
+        raise HTTPException(status_code=400, detail="Empty file")
+
+    if batch_scoring.detect_format(file.filename, file.content_type, head) == "csv":
+        try:
+            rows = batch_scoring.read_csv(file.file)
+        except batch_scoring.BatchFormatError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        rows = batch_scoring.read_ndjson(file.file)
+
+    ranker = get_batch_ranker()
+    # A plain generator: Starlette runs it on a worker thread, chunk by chunk
+    lines = batch_scoring.rank_rows(ranker, rows, max_rows=RECOMMEND_BATCH_MAX_ROWS)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
 class ScholarshipQuery(BaseModel):
     course: str = ""
     college: str = ""
@@ -502,23 +1065,53 @@ class ScholarshipQuery(BaseModel):
     category: str = ""  # General, SC, ST, OBC, etc.
 
 
-@app.post("/scholarships")
-async def find_scholarships(query: ScholarshipQuery):
+# Scholarship eligibility is decided by income ceilings and CGPA cut-offs, so
+# queries are bucketed before prompting: students in the same bucket get the
+# same answer and share one cache entry.
+INCOME_BRACKETS = (100_000, 150_000, 200_000, 250_000, 450_000, 800_000, 1_000_000)
+CGPA_BANDS = (6, 7, 8, 9)
+
+SCHOLARSHIP_CACHE = response_cache.ResponseCache(
+    "scholarships",
+    max_entries=int(os.getenv("SCHOLARSHIP_CACHE_SIZE", "2048")),
+    ttl=int(os.getenv("SCHOLARSHIP_CACHE_TTL", "21600")),
+)
+
+
+def income_bracket(income):
+    if income <= 0:
+        return "Not specified"
+    lower = 0
+    for upper in INCOME_BRACKETS:
+        if income <= upper:
+            return f"Up to ₹{upper:,}" if lower == 0 else f"₹{lower + 1:,}–₹{upper:,}"
+        lower = upper
+    return f"Above ₹{lower:,}"
+
+
+def cgpa_band(cgpa):
+    if cgpa <= 0:
+        return "Not specified"
+    if cgpa < CGPA_BANDS[0]:
+        return f"Below {CGPA_BANDS[0]}"
+    for low, high in zip(CGPA_BANDS, CGPA_BANDS[1:]):
+        if cgpa < high:
+            return f"{low}–{high}"
+    return f"{CGPA_BANDS[-1]} and above"
+
+
+def scholarship_bucket(query: ScholarshipQuery):
     """
-    Find relevant scholarships using Gemini API based on student profile
+    Normalized (course, category, income bracket, CGPA band) for a query
     """
-    try:
-        prompt_text = f"""
-You are an expert on Indian scholarships and financial aid for students. Based on the student profile below, recommend relevant scholarships they can apply for.
+    course = " ".join(query.course.lower().split()) or "any course"
+    category = " ".join(query.category.lower().split()) or "general"
+    return (course, category, income_bracket(query.familyIncome), cgpa_band(query.cgpa))
+
 
-STUDENT PROFILE:
-- Course: {query.course if query.course else "Any course"}
-- College: {query.college if query.college else "Any college"}
-- CGPA: {query.cgpa if query.cgpa > 0 else "Not specified"}
-- Family Income: ₹{query.familyIncome:,} per year
-- Category: {query.category if query.category else "General"}
+SCHOLARSHIP_ROLE = "You are an expert on Indian scholarships and financial aid for students."
 
-TASK:
+SCHOLARSHIP_TASK = """TASK:
 List scholarships that match this profile. Include both government and private scholarships.
 Consider:
 1. Merit-based scholarships (if CGPA is good)
@@ -526,14 +1119,9 @@ Consider:
 3. Category-specific scholarships (if applicable)
 4. Course-specific scholarships
 5. State and central government schemes
-6. Corporate/private scholarships
-
-OUTPUT FORMAT:
-Return ONLY a pure JSON array with 8-12 scholarship options. No markdown, no comments.
-Each object must include:
+6. Corporate/private scholarships"""
 
-[
-  {{
+SCHOLARSHIP_FIELDS = """{
     "name": "Scholarship Name",
     "provider": "Organization/Government Body",
     "amount": "Award amount or range",
@@ -542,49 +1130,248 @@ Each object must include:
     "category": "Merit/Need-based/Category-specific/Course-specific",
     "link": "Official website or application link",
     "description": "Brief description (2-3 sentences)"
+  }"""
+
+SCHOLARSHIP_RULES = "Include real, well-known scholarships in India. Focus on currently active schemes."
+
+
+def scholarship_profile(bucket):
+    course, category, income, cgpa = bucket
+    return f"""STUDENT PROFILE:
+- Course: {course}
+- CGPA: {cgpa}
+- Family Income: {income} per year
+- Category: {category}"""
+
+
+def scholarship_prompt(bucket):
+    return f"""
+{SCHOLARSHIP_ROLE} Based on the student profile below, recommend relevant scholarships they can apply for.
+
+{scholarship_profile(bucket)}
+
+{SCHOLARSHIP_TASK}
+
+OUTPUT FORMAT:
+Return ONLY a pure JSON array with 8-12 scholarship options. No markdown, no comments.
+Each object must include:
+
+[
+  {SCHOLARSHIP_FIELDS}
+]
+
+{SCHOLARSHIP_RULES}
+"""
+
+
+def scholarship_batch_prompt(buckets):
+    """
+    One prompt covering several query buckets, each answered under its own key
+    """
+    profiles = "\n\n".join(
+        f"### Profile key: {index + 1}\n{scholarship_profile(bucket)}" for index, bucket in enumerate(buckets)
+    )
+    return f"""
+{SCHOLARSHIP_ROLE} Below are {len(buckets)} student profiles. For each one, recommend relevant scholarships they can apply for.
+
+{profiles}
+
+{SCHOLARSHIP_TASK}
+
+OUTPUT FORMAT:
+Return ONLY a pure JSON array with one object per profile, using the profile's key, and 8-12 scholarship
+options in each "scholarships" array. No markdown, no comments.
+
+[
+  {{
+    "key": "1",
+    "scholarships": [
+      {SCHOLARSHIP_FIELDS}
+    ]
   }}
 ]
 
-Include real, well-known scholarships in India. Focus on currently active schemes.
+{SCHOLARSHIP_RULES}
 """
 
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        response = model.generate_content(prompt_text)
 
-        if not response or not response.text:
-            raise HTTPException(status_code=500, detail="No response from Gemini model.")
-        
-        response_text = response.text.strip()
+async def generate_scholarships(buckets):
+    """
+    Gemini suggestions for a list of query buckets, as {index: scholarships}.
+    A single bucket gets the plain one-profile prompt.
+    """
+    model = "gemini-2.5-flash"
+    if len(buckets) == 1:
+        return {0: await structured_output.generate(model, scholarship_prompt(buckets[0]), Scholarship, many=True)}
+    replies = await structured_output.generate(model, scholarship_batch_prompt(buckets), ScholarshipBatch, many=True)
+    return keyed_results(replies, "scholarships", len(buckets))
 
-        # Clean JSON
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            parts = response_text.split("```")
-            if len(parts) >= 2:
-                response_text = parts[1].strip()
 
-        # Parse JSON safely
-        try:
-            scholarships = json.loads(response_text)
-        except json.JSONDecodeError as e:
-            print(f"JSON parse error: {e}")
-            print(f"Response text: {response_text}")
-            raise HTTPException(status_code=500, detail="Invalid JSON returned by Gemini")
-
-        # Normalize output
-        if isinstance(scholarships, dict):
-            scholarships = [scholarships]
-        if not isinstance(scholarships, list):
-            raise ValueError("Invalid format: expected JSON array")
+SCHOLARSHIP_BATCHER = microbatch.MicroBatcher(
+    "scholarships",
+    generate_scholarships,
+    max_items=int(os.getenv("SCHOLARSHIP_MICROBATCH_SIZE", "3")),
+)
+
+
+async def fetch_scholarships(bucket):
+    """
+    Ask Gemini for scholarships matching one query bucket
+    """
+    try:
+        if microbatch.LLM_MICROBATCH:
+            return await SCHOLARSHIP_BATCHER.submit(bucket)
+        return (await generate_scholarships([bucket]))[0]
+    except structured_output.StructuredOutputError as e:
+        print(f"JSON parse error: {e}")
+        raise HTTPException(status_code=500, detail="Invalid JSON returned by Gemini")
+
+
+SCHOLARSHIP_CATALOG = scholarship_catalog.ScholarshipCatalog.load()
+SCHOLARSHIP_LLM_ENRICH = os.getenv("SCHOLARSHIP_LLM_ENRICH", "1") == "1"
+SCHOLARSHIP_ENRICH_TIMEOUT = float(os.getenv("SCHOLARSHIP_ENRICH_TIMEOUT", "10"))
+
+
+def local_scholarships(query: ScholarshipQuery):
+    return SCHOLARSHIP_CATALOG.search(
+        course=query.course,
+        category=query.category,
+        cgpa=query.cgpa,
+        family_income=query.familyIncome,
+    )
+
+
+def scholarship_key(scholarship):
+    return " ".join(str(scholarship.get("name", "")).casefold().split())
+
+
+async def suggested_scholarships(bucket):
+    """
+    Gemini suggestions for a bucket, shared through the cache. The upstream
+    call keeps running (and fills the cache) even if this caller gives up.
+    """
+    task = asyncio.ensure_future(
+        SCHOLARSHIP_CACHE.get_or_compute(bucket, lambda: fetch_scholarships(bucket))
+    )
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return await asyncio.wait_for(asyncio.shield(task), timeout=SCHOLARSHIP_ENRICH_TIMEOUT)
+
+
+@app.post("/scholarships")
+async def find_scholarships(query: ScholarshipQuery):
+    """
+    Find relevant scholarships in the local catalog, enriched with Gemini
+    suggestions when available
+    """
+    try:
+        scholarships = local_scholarships(query)
+
+        if SCHOLARSHIP_LLM_ENRICH:
+            try:
+                suggested = await suggested_scholarships(scholarship_bucket(query))
+                seen = {scholarship_key(s) for s in scholarships}
+                scholarships += [s for s in suggested if isinstance(s, dict) and scholarship_key(s) not in seen]
+            except Exception as e:
+                metrics.FALLBACKS.inc(path="local_catalog")
+                print(f"Scholarship enrichment skipped: {type(e).__name__}: {e}")
 
         return {"scholarships": scholarships}
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Scholarships error: {type(e).__name__}: {e}")
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
 
 
+@app.post("/scholarships/stream")
+async def find_scholarships_stream(query: ScholarshipQuery):
+    """
+    Server-Sent Events version of /scholarships: catalog matches are sent
+    first, then each Gemini suggestion as a `scholarship` event as soon as
+    the model has finished writing it.
+    """
+    bucket = scholarship_bucket(query)
+    local = local_scholarships(query)
+
+    async def events():
+        seen = set()
+        for scholarship in local:
+            seen.add(scholarship_key(scholarship))
+            yield sse("scholarship", scholarship)
+        count = len(local)
+
+        if SCHOLARSHIP_LLM_ENRICH:
+            cached = SCHOLARSHIP_CACHE.get(bucket)
+            if cached is not None:
+                for scholarship in cached:
+                    if scholarship_key(scholarship) not in seen:
+                        count += 1
+                        yield sse("scholarship", scholarship)
+            else:
+                parser = json_stream.JsonArrayStream()
+                suggested = []
+                try:
+                    model = "gemini-2.5-flash"
+                    async with asyncio.timeout(SCHOLARSHIP_ENRICH_TIMEOUT):
+                        async for chunk in resilience.stream_generate_content(
+                            model,
+                            scholarship_prompt(bucket),
+                            generation_config=structured_output.generation_config(Scholarship, many=True),
+                        ):
+                            for scholarship in parser.feed(chunk):
+                                suggested.append(scholarship)
+                                if scholarship_key(scholarship) not in seen:
+                                    count += 1
+                                    yield sse("scholarship", scholarship)
+                    if suggested:
+                        SCHOLARSHIP_CACHE.set(bucket, suggested)
+                except Exception as e:
+                    print(f"Scholarships stream enrichment stopped: {type(e).__name__}: {e}")
+
+        yield sse("done", {"count": count})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Hit/miss counters for the response caches
+    """
+    return {"caches": response_cache.all_stats()}
+
+
+@app.get("/llm/stats")
+async def llm_stats():
+    """
+    Gemini pool usage and structured-output parse/repair counters
+    """
+    return {
+        "pool": gemini_client.stats(),
+        "structured_output": structured_output.stats(),
+        "resilience": resilience.stats(),
+        "ocr_jobs": await OCR_JOB_QUEUE.stats(),
+        "microbatch": microbatch.stats(),
+        "loan_catalog": LOAN_CATALOG.stats(),
+        "admission": ADMISSION.stats(),
+    }
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """
+    Prometheus text-format metrics for this instance
+    """
+    for state, value in gemini_client.stats().items():
+        metrics.GEMINI_POOL.set(value, state=state)
+    for outcome, value in structured_output.stats().items():
+        metrics.STRUCTURED_OUTPUT.set(value, outcome=outcome)
+    await OCR_JOB_QUEUE.stats()
+    metrics.BREAKER_OPEN.set(int(resilience.BREAKER.state != "closed"), breaker=resilience.BREAKER.name)
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 class Branch(BaseModel):
     bank: str
     
@@ -595,61 +1382,41 @@ class UserCoords(BaseModel):
 class NearestBranchRequest(BaseModel):
     user_coords: UserCoords
     branches: list[Branch]
+    k: int = 1
 
-@app.post("/nearest-branches")
-async def nearest_branches(payload: NearestBranchRequest):
-    try:
-        if not API_KEY:
-            raise HTTPException(status_code=500, detail="API Key missing")
-
-        client = GoogleGenai.Client(api_key=API_KEY)
-        model_id = "gemini-2.0-flash"
+_branch_index = None
 
-        # Construct a search-oriented prompt
-        user_lat = payload.user_coords.lat
-        user_lng = payload.user_coords.lng
-        bank_names = ", ".join([b.bank for b in payload.branches])
 
-        prompt_text = f"""
-        Find the nearest physical bank branch for each of the following banks: {bank_names}.
-        The user is located at Latitude: {user_lat}, Longitude: {user_lng}.
-        
-        For each bank, use Google Search to find the exact address and coordinates of the nearest branch.
-        
-        Return the result as a strict JSON object with a single key "nearest_branches" containing a list of objects.
-        Each object must have:
-        - "bank": The name of the bank
-        - "name": The branch name (e.g., "SBI MG Road Branch")
-        - "lat": Latitude (number)
-        - "lng": Longitude (number)
-        - "address": Full address
-        
-        Example Output:
-        {{
-          "nearest_branches": [
-            {{ "bank": "SBI", "name": "SBI Indiranagar", "lat": 12.97, "lng": 77.64, "address": "..." }}
-          ]
-        }}
-        """
-
-        response = model.generate_content(prompt_text)
-        
-        if not response or not response.text:
-             raise HTTPException(status_code=500, detail="No response from Gemini")
+def get_branch_index():
+    """
+    The branch index, loaded (along with NumPy) on first use
+    """
+    global _branch_index
+    if _branch_index is None:
+        import branch_index
+        _branch_index = branch_index.BranchIndex.load()
+    return _branch_index
 
-        try:
-            return json.loads(response.text)
-        except json.JSONDecodeError:
-            # Fallback cleanup for markdown
-            text = response.text.strip()
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0].strip()
-            elif "```" in text:
-                text = text.split("```")[1].strip()
-            return json.loads(text)
 
-    except Exception as e:
-        print(f"Nearest Branch Error: {e}")
-        # Log to see if it's a tool error specific to model version
-        print(f"Make sure gemini-2.0-flash-exp or similar supports tools in this SDK version.")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+@app.post("/nearest-branches")
+async def nearest_branches(payload: NearestBranchRequest):
+    """
+    Nearest physical branches of each requested bank, from the local branch index
+    """
+    if payload.k < 1 or payload.k > 20:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 20")
+
+    user_lat = payload.user_coords.lat
+    user_lng = payload.user_coords.lng
+    if not -90 <= user_lat <= 90 or not -180 <= user_lng <= 180:
+        raise HTTPException(status_code=400, detail="user_coords must have lat in [-90, 90] and lng in [-180, 180]")
+
+    results = []
+    seen = set()
+    for branch in payload.branches:
+        if branch.bank in seen:
+            continue
+        seen.add(branch.bank)
+        results.extend(get_branch_index().nearest(branch.bank, user_lat, user_lng, k=payload.k))
+
+    return {"nearest_branches": results}
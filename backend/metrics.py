@@ -0,0 +1,244 @@
+"""
+In-process metrics in the Prometheus text format, served on /metrics.
+
+Covers per-endpoint latency and in-flight requests, per-stage spans inside
+the OCR pipeline (ingest, preprocessing, PDF text, upload, processing wait,
+generation, parsing), upstream Gemini errors and token usage. Kept
+dependency-free; every instance reports its own counters.
+
+Progress logging goes through debug(); set DEBUG_LOGS=0 to turn it off so
+the hot path does not pay for synchronous stdout writes under load.
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+from starlette.routing import Match
+
+DEBUG_LOGS = os.getenv("DEBUG_LOGS", "1") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+REGISTRY = []
+
+
+def debug(*args, **kwargs):
+    if DEBUG_LOGS:
+        print(*args, **kwargs)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += 1
+            series[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_series(self, key, series):
+        counts, count, total = series
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.label_names, key, ("le", _format_value(bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.label_names, key, ("le", "+Inf"))
+        lines.append(f"{self.name}_bucket{labels} {count}")
+        lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    "edbridge_request_duration_seconds",
+    "Time until the response has been fully sent",
+    ("endpoint", "method", "status"),
+)
+REQUESTS_IN_FLIGHT = Gauge("edbridge_requests_in_flight", "Requests currently being handled", ("endpoint",))
+STAGE_LATENCY = Histogram("edbridge_stage_duration_seconds", "Time spent in one pipeline stage", ("stage",))
+UPSTREAM_ERRORS = Counter("edbridge_upstream_errors_total", "Failed Gemini calls", ("operation", "error"))
+GEMINI_TOKENS = Counter("edbridge_gemini_tokens_total", "Gemini tokens from response usage metadata", ("model", "kind"))
+GEMINI_POOL = Gauge("edbridge_gemini_pool", "Gemini call layer load", ("state",))
+STRUCTURED_OUTPUT = Gauge("edbridge_structured_output", "Structured-output parse and repair counters", ("outcome",))
+DEADLINES_EXCEEDED = Counter("edbridge_deadlines_exceeded_total", "Gemini calls cut off by a request deadline")
+HEDGED_REQUESTS = Counter("edbridge_hedged_requests_total", "Second generate_content calls sent past the observed p95")
+BREAKER_REJECTIONS = Counter("edbridge_breaker_rejections_total", "Calls failed fast by an open circuit", ("breaker",))
+BREAKER_OPEN = Gauge("edbridge_breaker_open", "1 while a circuit is open or half-open", ("breaker",))
+PDF_TEXT_TOKENS = Counter(
+    "edbridge_pdf_text_tokens_total",
+    "Estimated tokens of PDF text layers, as extracted and as sent to the model",
+    ("stage",),
+)
+FALLBACKS = Counter("edbridge_fallbacks_total", "Responses served from a local path instead of Gemini", ("path",))
+
+
+def span(stage):
+    """
+    Context manager recording how long one pipeline stage took
+    """
+    return STAGE_LATENCY.time(stage=stage)
+
+
+def record_usage(model, response):
+    """
+    Add a response's token usage (if the SDK reported any) to GEMINI_TOKENS
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for kind, field in (
+        ("prompt", "prompt_token_count"),
+        ("output", "candidates_token_count"),
+        ("total", "total_token_count"),
+    ):
+        count = getattr(usage, field, 0) or 0
+        if count:
+            GEMINI_TOKENS.inc(count, model=model, kind=kind)
+
+
+def route_template(scope):
+    """
+    Path template of the route serving this request (e.g. /ocr/batch), so
+    labels stay bounded whatever the URL
+    """
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", scope["path"])
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-endpoint latency and in-flight requests.
+    Streaming responses are timed until their last chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = route_template(scope)
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                endpoint=endpoint,
+                method=scope["method"],
+                status=status,
+            )
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
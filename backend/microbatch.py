@@ -0,0 +1,156 @@
+"""
+Micro-batching of concurrent LLM prompts into shared upstream calls.
+
+At peak, many /recommend and /scholarships requests arrive within the same
+second, each with a large instruction block that is nearly identical. A
+MicroBatcher holds items for up to LLM_MICROBATCH_WINDOW_MS (or until
+max_items have arrived) and hands them to run_batch together, which sends
+one combined prompt asking for one keyed answer per item and splits the
+reply back to the waiting callers. Gemini per-minute request quotas then go
+much further.
+
+run_batch(items) receives the list of items and returns {index: result}.
+An item missing from the reply fails with MissingBatchResult, so the caller
+falls back exactly as it would after a failed call of its own.
+
+A caller with a time budget passes it to submit(). Waiting for the batch to
+fill may then use at most LLM_MICROBATCH_WINDOW_SHARE of that budget, and the
+upstream call is cut off when the tightest budget in the batch runs out, so
+batching never pushes a caller past its own timeout.
+"""
+import os
+import time
+import asyncio
+import contextvars
+import metrics
+
+LLM_MICROBATCH = os.getenv("LLM_MICROBATCH", "1") == "1"
+LLM_MICROBATCH_WINDOW = float(os.getenv("LLM_MICROBATCH_WINDOW_MS", "50")) / 1000
+# Largest share of a caller's budget spent waiting for its batch to fill
+LLM_MICROBATCH_WINDOW_SHARE = float(os.getenv("LLM_MICROBATCH_WINDOW_SHARE", "0.1"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 24, 32)
+
+BATCH_SIZE = metrics.Histogram(
+    "edbridge_microbatch_size", "Items sent in one upstream call", ("batcher",), buckets=BATCH_SIZE_BUCKETS
+)
+BATCH_WAIT = metrics.Histogram(
+    "edbridge_microbatch_wait_seconds", "Time items waited for their batch to be sent", ("batcher",)
+)
+BATCH_ITEMS = metrics.Counter("edbridge_microbatch_items_total", "Items submitted to a micro-batcher", ("batcher",))
+BATCH_CALLS = metrics.Counter("edbridge_microbatch_calls_total", "Upstream calls made by a micro-batcher", ("batcher",))
+
+_batchers = []
+
+
+class MissingBatchResult(Exception):
+    pass
+
+
+class MicroBatcher:
+    def __init__(self, name, run_batch, max_items, window=LLM_MICROBATCH_WINDOW):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_items = max_items
+        self.window = window
+        self._pending = []
+        self._timer = None
+        self._flush_at = None
+        self._tasks = set()
+        self.items = 0
+        self.calls = 0
+        _batchers.append(self)
+
+    async def submit(self, item, budget=None):
+        """
+        Queue one item and wait for its share of the batch result. `budget`
+        is how many seconds the caller will wait in total, if it is bounded.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        now = loop.time()
+        deadline = now + budget if budget else None
+        self._pending.append((item, future, time.perf_counter(), deadline))
+        self.items += 1
+        BATCH_ITEMS.inc(batcher=self.name)
+
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        else:
+            window = self.window if budget is None else min(self.window, budget * LLM_MICROBATCH_WINDOW_SHARE)
+            flush_at = now + window
+            if self._flush_at is None or flush_at < self._flush_at:
+                if self._timer is not None:
+                    self._timer.cancel()
+                self._flush_at = flush_at
+                self._timer = loop.call_at(flush_at, self._flush)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # The caller gave up (e.g. its timeout ran out): cancel its share
+            # so the batch result is not left on a future nobody reads
+            future.cancel()
+            self._pending = [entry for entry in self._pending if entry[1] is not future]
+            raise
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+            self._flush_at = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.calls += 1
+        BATCH_CALLS.inc(batcher=self.name)
+        BATCH_SIZE.observe(len(batch), batcher=self.name)
+        now = time.perf_counter()
+        for _, _, queued_at, _ in batch:
+            BATCH_WAIT.observe(now - queued_at, batcher=self.name)
+
+        # A fresh context, so the deadline of whichever request filled the
+        # batch does not cut the call short for the others
+        task = asyncio.create_task(self._run(batch), context=contextvars.Context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        futures = [future for _, future, _, _ in batch]
+        deadlines = [deadline for _, _, _, deadline in batch if deadline is not None]
+        try:
+            # Nobody waits past the tightest budget, so neither does the call
+            async with asyncio.timeout_at(min(deadlines) if deadlines else None):
+                results = await self.run_batch([item for item, _, _, _ in batch])
+        except BaseException as e:
+            for future in futures:
+                if future.done():
+                    continue
+                if isinstance(e, Exception):
+                    future.set_exception(e)
+                else:
+                    future.cancel()
+            if not isinstance(e, Exception):
+                raise
+            return
+        for index, future in enumerate(futures):
+            if future.done():
+                # The caller already gave up waiting
+                continue
+            if index in results:
+                future.set_result(results[index])
+            else:
+                future.set_exception(MissingBatchResult(f"No result for item {index + 1} of the batch"))
+
+    def stats(self):
+        return {
+            "window_ms": round(self.window * 1000, 1),
+            "max_items": self.max_items,
+            "items": self.items,
+            "upstream_calls": self.calls,
+            "calls_saved": self.items - self.calls,
+            "items_per_call": round(self.items / self.calls, 2) if self.calls else 0.0,
+        }
+
+
+def stats():
+    return {batcher.name: batcher.stats() for batcher in _batchers}
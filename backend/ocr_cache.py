@@ -0,0 +1,161 @@
+"""
+Content-addressed store for /ocr extractions.
+
+Results are keyed on the SHA-256 of the uploaded bytes and kept in a local
+SQLite file, so a re-uploaded document is answered without another Gemini
+round trip and the cache survives worker restarts. Rows are keyed on
+(digest, version), where the version covers the prompts, model and settings
+that produced them. A worker only ever reads its own version, so during a
+rolling deploy old and new workers share the file without clobbering each
+other, and rows of a retired version simply age out through LRU eviction.
+
+Reads stay read-only on the hot path: a hit only rewrites its last_used stamp
+once that stamp is LAST_USED_RESOLUTION seconds old. The store's size is kept
+as a running total, so puts and stats() need no table scan.
+"""
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+import response_cache
+
+# How stale a row's last_used may get before a hit refreshes it
+LAST_USED_RESOLUTION = 300
+# The digest-keyed table of earlier releases is dropped once nothing has
+# used it for this long, i.e. once no worker of those releases is left
+LEGACY_GRACE = 24 * 3600
+
+
+class OcrCache:
+    def __init__(self, path, version, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.version = version
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ocr_entries (
+                digest TEXT NOT NULL,
+                version TEXT NOT NULL,
+                result TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (digest, version)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ocr_entries_last_used ON ocr_entries (last_used)")
+        self._drop_legacy()
+        self._conn.commit()
+        self._count, self._bytes = self._totals()
+        response_cache.CACHES["ocr"] = self
+
+    def _drop_legacy(self):
+        try:
+            newest = self._conn.execute("SELECT MAX(last_used) FROM ocr_results").fetchone()[0]
+        except sqlite3.OperationalError:
+            return
+        if newest is None or time.time() - newest > LEGACY_GRACE:
+            self._conn.execute("DROP TABLE ocr_results")
+
+    def _totals(self):
+        return self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_entries").fetchone()
+
+    def _get(self, digest):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, last_used FROM ocr_entries WHERE digest = ? AND version = ?",
+                (digest, self.version),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            now = time.time()
+            if now - row[1] >= LAST_USED_RESOLUTION:
+                self._conn.execute(
+                    "UPDATE ocr_entries SET last_used = ? WHERE digest = ? AND version = ?",
+                    (now, digest, self.version),
+                )
+                self._conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def _put(self, digest, result):
+        payload = json.dumps(result, ensure_ascii=False)
+        size = len(payload.encode("utf-8"))
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT size FROM ocr_entries WHERE digest = ? AND version = ?", (digest, self.version)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr_entries (digest, version, result, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (digest, self.version, payload, size, time.time()),
+            )
+            if previous is None:
+                self._count += 1
+                self._bytes += size
+            else:
+                self._bytes += size - previous[0]
+            if self._bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """
+        Drop least recently used rows until the store fits in max_bytes
+        """
+        # Other workers share the file, so settle the running total first
+        self._count, self._bytes = self._totals()
+        while self._bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT digest, version, size FROM ocr_entries ORDER BY last_used LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for digest, version, size in rows:
+                if self._bytes <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM ocr_entries WHERE digest = ? AND version = ?", (digest, version))
+                self._count -= 1
+                self._bytes -= size
+                self.evictions += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM ocr_entries")
+            self._conn.commit()
+            self._count, self._bytes = 0, 0
+
+    async def get(self, digest):
+        try:
+            return await asyncio.to_thread(self._get, digest)
+        except sqlite3.Error as e:
+            print(f"⚠️ OCR cache read failed: {e}")
+            return None
+
+    async def put(self, digest, result):
+        try:
+            await asyncio.to_thread(self._put, digest, result)
+        except sqlite3.Error as e:
+            print(f"⚠️ OCR cache write failed: {e}")
+
+    def stats(self):
+        """
+        Counters kept in memory, so this never waits on SQLite
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": self._count,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
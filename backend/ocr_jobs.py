@@ -0,0 +1,399 @@
+"""
+Asynchronous OCR jobs backed by SQLite.
+
+POST /ocr/jobs stores the upload and returns straight away; a bounded pool of
+asyncio workers claims queued jobs and runs the normal extraction on them.
+Because the queue lives in a SQLite file (WAL mode), it survives restarts and
+is shared by every uvicorn worker process on the host: a job is claimed with a
+lease inside an IMMEDIATE transaction, so exactly one worker runs it, and a
+job whose lease ran out (its worker died) is queued again. A running job's
+worker renews the lease every third of its length, so slow jobs are never
+mistaken for abandoned ones.
+
+Small images go to a priority lane. Every worker takes priority jobs first,
+and OCR_JOB_PRIORITY_WORKERS of them take nothing else, so a quick photo
+never waits behind a queue of scanned PDFs.
+"""
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+import metrics
+
+PRIORITY = "priority"
+NORMAL = "normal"
+LANES = (PRIORITY, NORMAL)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 10.0
+
+JOBS_QUEUED = metrics.Gauge("edbridge_ocr_jobs_queued", "OCR jobs waiting for a worker", ("lane",))
+JOB_WAIT = metrics.Histogram("edbridge_ocr_job_wait_seconds", "Time OCR jobs spent queued", ("lane",))
+JOBS_FINISHED = metrics.Counter("edbridge_ocr_jobs_finished_total", "OCR jobs that finished", ("lane", "status"))
+
+
+class JobStore:
+    def __init__(self, path, lease_seconds=120, retention_seconds=24 * 3600):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ocr_jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                lane TEXT NOT NULL,
+                filename TEXT,
+                mime_type TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                payload BLOB,
+                result TEXT,
+                error_status INTEGER,
+                error_detail TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                lease_until REAL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ocr_jobs_queue ON ocr_jobs (status, lane, created_at)")
+        self.purge()
+
+    # ---------- synchronous SQLite operations (run on a thread) ----------
+
+    def _insert(self, job):
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO ocr_jobs (id, status, lane, filename, mime_type, sha256, size, payload,
+                                      result, created_at, finished_at)
+                VALUES (:id, :status, :lane, :filename, :mime_type, :sha256, :size, :payload,
+                        :result, :created_at, :finished_at)
+                """,
+                job,
+            )
+
+    def _claim(self, lanes):
+        """
+        Atomically take the oldest queued job from the first non-empty lane
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs whose worker vanished mid-run go back to the queue,
+                # unless they have already used up their attempts
+                self._conn.execute(
+                    """
+                    UPDATE ocr_jobs SET lease_until = NULL, status = CASE WHEN attempts >= ? THEN ? ELSE ? END,
+                        error_status = CASE WHEN attempts >= ? THEN 500 END,
+                        error_detail = CASE WHEN attempts >= ? THEN 'OCR job was interrupted' END,
+                        finished_at = CASE WHEN attempts >= ? THEN ? END,
+                        payload = CASE WHEN attempts >= ? THEN NULL ELSE payload END
+                    WHERE status = ? AND lease_until < ?
+                    """,
+                    (MAX_ATTEMPTS, FAILED, QUEUED, MAX_ATTEMPTS, MAX_ATTEMPTS, MAX_ATTEMPTS, now, MAX_ATTEMPTS,
+                     RUNNING, now),
+                )
+                row = None
+                for lane in lanes:
+                    row = self._conn.execute(
+                        """
+                        SELECT * FROM ocr_jobs WHERE status = ? AND lane = ? AND available_at <= ?
+                        ORDER BY created_at LIMIT 1
+                        """,
+                        (QUEUED, lane, now),
+                    ).fetchone()
+                    if row is not None:
+                        break
+                job = None
+                if row is not None:
+                    job = dict(row, status=RUNNING, started_at=now, lease_until=now + self.lease_seconds,
+                               attempts=row["attempts"] + 1)
+                    self._conn.execute(
+                        """
+                        UPDATE ocr_jobs SET status = ?, started_at = ?, lease_until = ?, attempts = attempts + 1
+                        WHERE id = ?
+                        """,
+                        (RUNNING, now, now + self.lease_seconds, row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return job
+
+    def _finish(self, job_id, result=None, error_status=None, error_detail=None):
+        status = DONE if error_status is None else FAILED
+        with self._lock:
+            self._conn.execute(
+                """
+                UPDATE ocr_jobs SET status = ?, result = ?, error_status = ?, error_detail = ?,
+                                    finished_at = ?, lease_until = NULL, payload = NULL
+                WHERE id = ?
+                """,
+                (status, result, error_status, error_detail, time.time(), job_id),
+            )
+
+    def _renew(self, job_id):
+        """
+        Extend a running job's lease; False if the job is no longer running
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE ocr_jobs SET lease_until = ? WHERE id = ? AND status = ?",
+                (time.time() + self.lease_seconds, job_id, RUNNING),
+            )
+        return cursor.rowcount > 0
+
+    def _requeue(self, job_id, delay=0.0):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ocr_jobs SET status = ?, lease_until = NULL, available_at = ? WHERE id = ? AND status = ?",
+                (QUEUED, time.time() + delay, job_id, RUNNING),
+            )
+
+    def _get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, lane, filename, mime_type, size, result, error_status, error_detail, "
+                "attempts, created_at, started_at, finished_at FROM ocr_jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            if job["status"] == QUEUED:
+                job["queue_position"] = self._conn.execute(
+                    "SELECT COUNT(*) FROM ocr_jobs WHERE status = ? AND lane = ? AND created_at < ?",
+                    (QUEUED, job["lane"], job["created_at"]),
+                ).fetchone()[0]
+            return job
+
+    def _queued_counts(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT lane, COUNT(*) FROM ocr_jobs WHERE status = ? GROUP BY lane", (QUEUED,)
+            ).fetchall()
+        return {lane: count for lane, count in rows}
+
+    def purge(self):
+        """
+        Forget finished jobs past their retention period
+        """
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM ocr_jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (DONE, FAILED, time.time() - self.retention_seconds),
+            )
+
+    # ---------- async API ----------
+
+    async def insert(self, job):
+        await asyncio.to_thread(self._insert, job)
+
+    async def claim(self, lanes):
+        return await asyncio.to_thread(self._claim, lanes)
+
+    async def finish(self, job_id, **outcome):
+        await asyncio.to_thread(self._finish, job_id, **outcome)
+
+    async def renew(self, job_id):
+        return await asyncio.to_thread(self._renew, job_id)
+
+    async def requeue(self, job_id, delay=0.0):
+        await asyncio.to_thread(self._requeue, job_id, delay)
+
+    async def get(self, job_id):
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def queued_counts(self):
+        return await asyncio.to_thread(self._queued_counts)
+
+
+class JobQueue:
+    """
+    Worker pool over a JobStore. process(job) returns the JSON result text or
+    raises; error_of(exception) maps a failure to (status code, detail).
+    """
+
+    def __init__(self, store, process, error_of, workers=3, priority_workers=1,
+                 small_image_bytes=1024 * 1024, poll_interval=1.0):
+        self.store = store
+        self.process = process
+        self.error_of = error_of
+        self.workers = workers
+        self.priority_workers = priority_workers
+        self.small_image_bytes = small_image_bytes
+        self.poll_interval = poll_interval
+        self._tasks = []
+        self._wakeup = None
+        self._changed = {}
+        self._last_purge = time.monotonic()
+
+    def lane_for(self, mime_type, size):
+        if mime_type.startswith("image/") and size <= self.small_image_bytes:
+            return PRIORITY
+        return NORMAL
+
+    @property
+    def running(self):
+        return any(not task.done() for task in self._tasks)
+
+    def start(self):
+        """
+        Start the workers on the running loop (idempotent)
+        """
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker((PRIORITY,)), name=f"ocr-job-priority-{i}")
+            for i in range(self.priority_workers)
+        ] + [
+            asyncio.create_task(self._worker(LANES), name=f"ocr-job-{i}")
+            for i in range(self.workers)
+        ]
+        print(f"✅ OCR job workers started ({self.workers} + {self.priority_workers} priority)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, upload, result=None):
+        """
+        Queue an ingested upload; a known result (e.g. a cache hit) is stored
+        as an already finished job. Returns the job id.
+        """
+        self.start()
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": DONE if result is not None else QUEUED,
+            "lane": self.lane_for(upload.mime_type, upload.size),
+            "filename": upload.filename,
+            "mime_type": upload.mime_type,
+            "sha256": upload.sha256,
+            "size": upload.size,
+            "payload": None if result is not None else upload.data,
+            "result": result,
+            "created_at": now,
+            "finished_at": now if result is not None else None,
+        }
+        await self.store.insert(job)
+        if result is None:
+            self._wakeup.set()
+        return job["id"]
+
+    def _notify(self, job_id):
+        for event in self._changed.get(job_id, ()):
+            event.set()
+
+    async def wait_for_change(self, job_id, timeout):
+        """
+        Wait until this process changes the job, or timeout passes (jobs can
+        also be run by other processes, so callers re-read the store either way)
+        """
+        # One event per waiter, so one subscriber timing out never hides a
+        # change from the others
+        event = asyncio.Event()
+        waiters = self._changed.setdefault(job_id, set())
+        waiters.add(event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except TimeoutError:
+            pass
+        finally:
+            waiters.discard(event)
+            if not waiters and self._changed.get(job_id) is waiters:
+                del self._changed[job_id]
+
+    async def _heartbeat(self, job_id):
+        """
+        Keep renewing the job's lease while it runs
+        """
+        interval = self.store.lease_seconds / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await self.store.renew(job_id):
+                    print(f"⚠️ OCR job {job_id[:8]} lost its lease")
+                    return
+            except Exception as e:
+                print(f"⚠️ OCR job {job_id[:8]} lease renewal failed: {type(e).__name__}: {e}")
+
+    async def _worker(self, lanes):
+        while True:
+            try:
+                job = await self.store.claim(lanes)
+            except Exception as e:
+                print(f"⚠️ OCR job claim failed: {type(e).__name__}: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except TimeoutError:
+                    pass
+                if time.monotonic() - self._last_purge > 600:
+                    self._last_purge = time.monotonic()
+                    await asyncio.to_thread(self.store.purge)
+                continue
+
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep the worker alive; the job's lease runs out and it is retried
+                print(f"⚠️ OCR job {job['id'][:8]} crashed: {type(e).__name__}: {e}")
+
+    async def _run(self, job):
+        JOB_WAIT.observe(max(0.0, job["started_at"] - job["created_at"]), lane=job["lane"])
+        self._notify(job["id"])
+        metrics.debug(f"🧾 OCR job {job['id'][:8]} started ({job['lane']}, attempt {job['attempts']})")
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+        try:
+            result = await self.process(job)
+        except asyncio.CancelledError:
+            # Shutting down: let another worker pick the job up
+            await asyncio.shield(self.store.requeue(job["id"]))
+            raise
+        except Exception as e:
+            status_code, detail = self.error_of(e)
+            if status_code in (503, 504) and job["attempts"] < MAX_ATTEMPTS:
+                # Upstream trouble: try again later rather than failing the job
+                await self.store.requeue(job["id"], delay=RETRY_DELAY * job["attempts"])
+            else:
+                await self.store.finish(job["id"], error_status=status_code, error_detail=detail)
+                JOBS_FINISHED.inc(lane=job["lane"], status=FAILED)
+        else:
+            await self.store.finish(job["id"], result=result)
+            JOBS_FINISHED.inc(lane=job["lane"], status=DONE)
+        finally:
+            heartbeat.cancel()
+        self._notify(job["id"])
+
+    async def stats(self):
+        counts = await self.store.queued_counts()
+        for lane in LANES:
+            JOBS_QUEUED.set(counts.get(lane, 0), lane=lane)
+        return {"queued": {lane: counts.get(lane, 0) for lane in LANES}, "workers_running": self.running}
@@ -0,0 +1,159 @@
+"""
+Page-level OCR of scanned PDFs for /ocr.
+
+Instead of uploading a whole scanned document to Gemini and waiting for it
+to be processed as one unit, the PDF is split locally with PyPDF2. A page
+that is a single scanned image is sent as that image; any other page is sent
+as a one-page PDF. Both go inline, so there is no upload or processing wait.
+
+Pages are triaged first: near-blank pages (much smaller than the typical
+page) are skipped, pages whose text layer mentions our fields go first, and
+at most OCR_MAX_PAGES are read. Up to OCR_PAGE_PARALLELISM pages are read
+at once. Per-page results are merged with profile_merge, each page weighted
+by how many fields it filled. Once every required field has a value the
+remaining pages are cancelled, so a long document costs roughly its slowest
+relevant page. A page that fails only loses its own fields.
+"""
+import io
+import os
+import asyncio
+import statistics
+from dataclasses import dataclass
+import metrics
+import pdf_text
+import profile_merge
+
+OCR_PAGE_PARALLELISM = int(os.getenv("OCR_PAGE_PARALLELISM", "3"))
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", "8"))
+# Pages smaller than this share of the median page are treated as blank
+BLANK_PAGE_RATIO = 0.2
+
+OCR_PAGES = metrics.Counter("edbridge_ocr_pages_total", "Scanned PDF pages by what happened to them", ("outcome",))
+
+_IMAGE_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}
+
+
+@dataclass(slots=True)
+class Page:
+    number: int
+    mime_type: str
+    data: bytes
+    text: str
+
+
+def _page_image(page):
+    """
+    The page's only image, when the page is nothing but a scan
+    """
+    try:
+        images = page.images
+    except Exception:
+        return None
+    if len(images) != 1:
+        return None
+    image = images[0]
+    mime_type = _IMAGE_TYPES.get(os.path.splitext(image.name)[1].lower())
+    if mime_type is None:
+        return None
+    return mime_type, image.data
+
+
+def split(data):
+    """
+    One Page per PDF page, carrying the scanned image or a one-page PDF
+    """
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    pages = []
+    for number, page in enumerate(reader.pages, start=1):
+        text = page.extract_text() or ""
+        image = None if len(text.strip()) >= pdf_text.MIN_TEXT_CHARS else _page_image(page)
+        if image is not None:
+            mime_type, payload = image
+        else:
+            writer = PyPDF2.PdfWriter()
+            writer.add_page(page)
+            out = io.BytesIO()
+            writer.write(out)
+            mime_type, payload = "application/pdf", out.getvalue()
+        pages.append(Page(number, mime_type, payload, text))
+    return pages
+
+
+def triage(pages, limit=OCR_MAX_PAGES):
+    """
+    (pages worth reading, most promising first; page numbers skipped)
+    """
+    if not pages:
+        return [], []
+    median = statistics.median(len(page.data) for page in pages)
+    candidates = [page for page in pages if len(page.data) >= median * BLANK_PAGE_RATIO]
+    candidates.sort(key=lambda page: (-pdf_text.keyword_hits(page.text), page.number))
+    selected = candidates[:limit]
+    chosen = {page.number for page in selected}
+    return selected, [page.number for page in pages if page.number not in chosen]
+
+
+def confidence(result):
+    """
+    Share of profile fields a page filled; a page that reads like the whole
+    record outweighs one that mentions a name in passing
+    """
+    filled = sum(1 for field in profile_merge.PROFILE_FIELDS if str(result.get(field) or "").strip())
+    return filled / len(profile_merge.PROFILE_FIELDS)
+
+
+def _merge(results):
+    numbers = sorted(results)
+    ordered = [results[number] for number in numbers]
+    merged, _, _ = profile_merge.merge_profiles(ordered, [confidence(result) for result in ordered])
+    return merged
+
+
+async def extract(pages, read_page, required_fields, parallelism=OCR_PAGE_PARALLELISM):
+    """
+    Read the triaged pages concurrently with read_page(page) -> fields dict
+    and return the merged fields. Raises the first page error if no page
+    could be read.
+    """
+    selected, skipped = triage(pages)
+    OCR_PAGES.inc(len(skipped), outcome="skipped")
+    semaphore = asyncio.Semaphore(parallelism)
+
+    async def read(page):
+        async with semaphore:
+            return page, await read_page(page)
+
+    tasks = [asyncio.create_task(read(page)) for page in selected]
+    results = {}
+    errors = []
+    merged = None
+    try:
+        for finished in asyncio.as_completed(tasks):
+            try:
+                page, result = await finished
+            except Exception as e:
+                OCR_PAGES.inc(outcome="failed")
+                errors.append(e)
+                continue
+            OCR_PAGES.inc(outcome="read")
+            results[page.number] = result
+            merged = _merge(results)
+            if all(str(merged.get(field) or "").strip() for field in required_fields):
+                break
+    finally:
+        cancelled = sum(1 for task in tasks if task.cancel())
+        OCR_PAGES.inc(cancelled, outcome="cancelled")
+        for task in tasks:
+            # Pages that failed after we stopped listening
+            if task.done() and not task.cancelled():
+                task.exception()
+
+    metrics.debug(
+        f"📑 Read {len(results)} of {len(pages)} pages "
+        f"({len(skipped)} skipped, {len(errors)} failed, {cancelled} not needed)"
+    )
+    if not results:
+        raise errors[0] if errors else ValueError("PDF has no readable pages")
+    return merged
@@ -0,0 +1,195 @@
+"""
+Local PDF text-layer extraction for /ocr.
+
+Most uploaded PDFs are digitally generated and already carry a text layer,
+which PyPDF2 reads in milliseconds. Only when that text looks unusable (a
+scanned, image-only PDF) does the document need to go to Gemini as a file.
+
+Long documents (brochures, multi-page letters) are cut down before they reach
+the prompt: pages are split into short snippets, each snippet is scored for
+the fields we extract, and only the best ones that add something new are
+sent, in document order, within PDF_TOKEN_BUDGET tokens.
+"""
+import io
+import os
+import re
+
+# Words that show up on the documents we extract from (ID cards, marksheets,
+# admission letters). A usable text layer should mention a few of them.
+FIELD_KEYWORDS = (
+    "name",
+    "date of birth",
+    "dob",
+    "college",
+    "university",
+    "institute",
+    "course",
+    "programme",
+    "program",
+    "cgpa",
+    "sgpa",
+    "percentage",
+    "marks",
+    "batch",
+    "income",
+)
+
+# Label-based patterns for the local fallback extractor, tried in order
+FIELD_PATTERNS = {
+    "name": (
+        r"(?:name\s+of\s+(?:the\s+)?(?:student|candidate)|student(?:'s)?\s+name|candidate(?:'s)?\s+name|\bname)\s*[:\-]\s*([^\n]+)",
+    ),
+    "dob": (
+        r"(?:date\s+of\s+birth|\bd\.?o\.?b\.?)\s*[:\-]?\s*(\d{1,2}[/\-.]\d{1,2}[/\-.]\d{2,4})",
+    ),
+    "college": (
+        r"(?:college|university|institute|institution)(?:\s+name)?\s*[:\-]\s*([^\n]+)",
+        r"^([^\n]*\b(?:university|institute|college)\b[^\n]*)$",
+    ),
+    "course": (
+        r"(?:course|programme|program|degree)(?:\s+name)?\s*[:\-]\s*([^\n]+)",
+    ),
+    "batch": (
+        r"(?:batch|academic\s+year|session)\s*[:\-]?\s*(\d{4}\s*[-–]\s*\d{2,4})",
+    ),
+    "cgpa": (
+        r"\bcgpa\s*[:\-]?\s*(\d{1,2}(?:\.\d{1,2})?)",
+        r"\bpercentage\s*[:\-]?\s*(\d{1,3}(?:\.\d{1,2})?)\s*%?",
+    ),
+    "loanAmount": (
+        r"(?:loan\s+amount|amount\s+(?:required|needed))[^\d\n]*(\d[\d,]*)",
+    ),
+    "familyIncome": (
+        r"(?:family|annual|parental)\s+(?:annual\s+)?income[^\d\n]*(\d[\d,]*)",
+    ),
+}
+
+MIN_TEXT_CHARS = int(os.getenv("PDF_MIN_TEXT_CHARS", "200"))
+MIN_KEYWORD_HITS = int(os.getenv("PDF_MIN_KEYWORD_HITS", "2"))
+# Approximate prompt tokens of document text sent to the model
+TOKEN_BUDGET = int(os.getenv("PDF_TOKEN_BUDGET", "1500"))
+SNIPPET_LINES = 6
+# A labelled field match counts for more than a bare keyword
+PATTERN_WEIGHT = 3
+
+
+def iter_pages(data):
+    """
+    Text of each page in turn, so callers can stop early
+    """
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+
+def extract_pages(data):
+    return list(iter_pages(data))
+
+
+def extract_text(data):
+    return "\n".join(iter_pages(data))
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text
+    return (len(text) + 3) // 4
+
+
+def _matches(text):
+    """
+    The fields whose patterns match and the keywords that appear in text
+    """
+    lowered = text.lower()
+    found = {keyword for keyword in FIELD_KEYWORDS if keyword in lowered}
+    for field, patterns in FIELD_PATTERNS.items():
+        if any(re.search(pattern, text, re.IGNORECASE | re.MULTILINE) for pattern in patterns):
+            found.add(field)
+    return found
+
+
+def score(found):
+    return sum(PATTERN_WEIGHT if item in FIELD_PATTERNS else 1 for item in found)
+
+
+def _snippets(pages):
+    for page_number, page in enumerate(pages):
+        lines = [line for line in page.splitlines() if line.strip()]
+        for start in range(0, len(lines), SNIPPET_LINES):
+            yield page_number, start, "\n".join(lines[start:start + SNIPPET_LINES])
+
+
+def select_text(pages, budget=TOKEN_BUDGET):
+    """
+    The document text to put in the prompt: everything when it fits the
+    budget, otherwise the highest-scoring snippets that fit and add a field
+    or keyword not already covered, in page order.
+    Returns (text, stats) where stats has the token counts before and after.
+    """
+    full_text = "\n".join(pages)
+    full_tokens = estimate_tokens(full_text)
+    if full_tokens <= budget:
+        return full_text, {"pages": len(pages), "pages_used": len(pages),
+                           "tokens_before": full_tokens, "tokens_after": full_tokens}
+
+    scored = []
+    for page_number, start, text in _snippets(pages):
+        found = _matches(text)
+        if found:
+            scored.append((-score(found), page_number, start, text, found))
+    scored.sort(key=lambda snippet: snippet[:3])
+
+    # Best snippets first, skipping any that only repeat what is already covered
+    chosen = []
+    covered = set()
+    used = 0
+    for _, page_number, start, text, found in scored:
+        tokens = estimate_tokens(text) + 1
+        if found <= covered or used + tokens > budget:
+            continue
+        chosen.append((page_number, start, text))
+        covered |= found
+        used += tokens
+
+    chosen.sort()
+    text = "\n".join(snippet for _, _, snippet in chosen)
+    return text, {
+        "pages": len(pages),
+        "pages_used": len({page_number for page_number, _, _ in chosen}),
+        "tokens_before": full_tokens,
+        "tokens_after": estimate_tokens(text),
+    }
+
+
+def keyword_hits(text):
+    lowered = text.lower()
+    return sum(1 for keyword in FIELD_KEYWORDS if keyword in lowered)
+
+
+def is_usable(text):
+    """
+    Whether a text layer is good enough to extract fields from without
+    sending the document itself to the model
+    """
+    stripped = text.strip()
+    return len(stripped) >= MIN_TEXT_CHARS and keyword_hits(stripped) >= MIN_KEYWORD_HITS
+
+
+def extract_fields(text):
+    """
+    Best-effort field extraction from a text layer without the model, for
+    when Gemini is unavailable. Fields that are not found are left empty.
+    """
+    fields = {}
+    for field, patterns in FIELD_PATTERNS.items():
+        value = ""
+        for pattern in patterns:
+            match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+            if match:
+                value = " ".join(match.group(1).split())
+                break
+        if field in ("loanAmount", "familyIncome"):
+            value = value.replace(",", "")
+        fields[field] = value
+    return fields
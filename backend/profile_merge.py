@@ -0,0 +1,59 @@
+"""
+Reconcile fields extracted from several documents into one student profile.
+
+Each field is decided by a weighted vote over the documents that filled it;
+values are compared in a normalized form so "8.5" and "8.50", or differently
+cased names, count as the same answer. Ties go to the earliest document.
+"""
+import re
+
+PROFILE_FIELDS = ("name", "dob", "college", "course", "batch", "cgpa", "loanAmount", "familyIncome")
+
+_NUMBER = re.compile(r"^[₹\s]*([\d,]+(?:\.\d+)?)\s*%?$")
+
+
+def normalize(value):
+    text = " ".join(str(value).split())
+    match = _NUMBER.match(text)
+    if match:
+        return float(match.group(1).replace(",", ""))
+    return text.casefold().rstrip(".")
+
+
+def merge_profiles(results, weights=None):
+    """
+    results: list of extracted_data dicts (None for documents that failed)
+    weights: optional per-document confidence, defaults to 1 each
+
+    Returns (merged profile, {field: [indexes that agree]}, {field: [all distinct values]})
+    """
+    merged = {}
+    sources = {}
+    conflicts = {}
+
+    for field in PROFILE_FIELDS:
+        votes = {}
+        first_seen = {}
+        for index, result in enumerate(results):
+            if not isinstance(result, dict):
+                continue
+            value = result.get(field)
+            if value is None or str(value).strip() == "":
+                continue
+            key = normalize(value)
+            weight = weights[index] if weights is not None else 1
+            total, indexes = votes.get(key, (0, []))
+            votes[key] = (total + weight, indexes + [index])
+            first_seen.setdefault(key, value)
+
+        if not votes:
+            merged[field] = ""
+            continue
+
+        winner = max(votes, key=lambda key: (votes[key][0], -votes[key][1][0]))
+        merged[field] = first_seen[winner]
+        sources[field] = votes[winner][1]
+        if len(votes) > 1:
+            conflicts[field] = [first_seen[key] for key in votes]
+
+    return merged, sources, conflicts
@@ -0,0 +1,329 @@
+"""
+Deadlines, hedging and a circuit breaker around Gemini calls.
+
+- Deadlines: a request sets its budget with `deadline(seconds)`; every Gemini
+  call made under it (including repair retries and PDF processing polls) is
+  cut off when the budget runs out and raises DeadlineExceeded.
+- Hedging: if a generate_content call is still running after the observed p95
+  latency and the pool has spare capacity, an identical second call is sent
+  and whichever answers first wins.
+- Circuit breaker: after GEMINI_BREAKER_FAILURES consecutive upstream failures
+  calls fail fast with CircuitOpenError for GEMINI_BREAKER_RESET seconds, then
+  one probe call is let through to decide whether to close again. Only signs
+  that Gemini itself is unavailable count (5xx, quota exhaustion, connection
+  errors, timeouts); a rejected document or prompt is the caller's problem
+  and leaves the breaker alone.
+
+Callers catch UpstreamUnavailable to fall back to a local answer, or turn it
+into a response with http_error().
+"""
+import os
+import time
+import asyncio
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from fastapi import HTTPException
+import metrics
+import gemini_client
+
+GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+GEMINI_BREAKER_RESET = float(os.getenv("GEMINI_BREAKER_RESET", "30"))
+GEMINI_HEDGE = os.getenv("GEMINI_HEDGE", "1") == "1"
+# Latency samples kept for the hedge delay, and how many are needed before hedging
+HEDGE_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = float(os.getenv("GEMINI_HEDGE_MIN_DELAY", "1.0"))
+
+
+class UpstreamUnavailable(Exception):
+    pass
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    def __init__(self, retry_after):
+        super().__init__(f"AI service unavailable, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(UpstreamUnavailable):
+    pass
+
+
+def http_error(error):
+    """
+    HTTPException for an UpstreamUnavailable error
+    """
+    if isinstance(error, CircuitOpenError):
+        return HTTPException(
+            status_code=503,
+            detail="AI service is temporarily unavailable, please retry shortly",
+            headers={"Retry-After": str(error.retry_after)},
+        )
+    return HTTPException(status_code=504, detail="AI service took too long to respond")
+
+
+# ---------- Deadlines ----------
+
+_deadline = contextvars.ContextVar("gemini_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Bound every Gemini call made inside this block (and in tasks it starts)
+    to `seconds` from now. Nested deadlines can only shorten the budget.
+    """
+    limit = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(limit if current is None else min(limit, current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """
+    Seconds left before the current deadline, or None when there is none
+    """
+    limit = _deadline.get()
+    if limit is None:
+        return None
+    return max(0.0, limit - time.monotonic())
+
+
+def check_deadline():
+    left = remaining()
+    if left is not None and left <= 0:
+        metrics.DEADLINES_EXCEEDED.inc()
+        raise DeadlineExceeded("Deadline exceeded")
+
+
+# ---------- Circuit breaker ----------
+
+# google.api_core exception classes meaning upstream, not the request, is at
+# fault; matched by name so the SDK need not be imported here
+_UPSTREAM_ERROR_NAMES = frozenset({
+    "ServerError",
+    "InternalServerError",
+    "BadGateway",
+    "ServiceUnavailable",
+    "GatewayTimeout",
+    "DeadlineExceeded",
+    "ResourceExhausted",
+    "TooManyRequests",
+    "RetryError",
+    "TransportError",
+})
+
+
+def is_upstream_failure(error):
+    """
+    Whether `error` says Gemini is unavailable, as opposed to it rejecting
+    this particular request
+    """
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if any(cls.__name__ in _UPSTREAM_ERROR_NAMES for cls in type(error).__mro__):
+        return True
+    code = getattr(error, "code", None)
+    return isinstance(code, int) and (code == 429 or 500 <= code < 600)
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=GEMINI_BREAKER_FAILURES, reset_timeout=GEMINI_BREAKER_RESET):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        """
+        Raise CircuitOpenError unless a call may go through now
+        """
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return
+        retry_after = max(1, round(self.reset_timeout - (time.monotonic() - self.opened_at)))
+        metrics.BREAKER_REJECTIONS.inc(breaker=self.name)
+        raise CircuitOpenError(retry_after)
+
+    def record_success(self):
+        if self.opened_at is not None:
+            print(f"✅ Circuit {self.name} closed")
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self._probing:
+                print(f"⚠️ Circuit {self.name} open after {self.failures} failures")
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self):
+        """
+        The probe ended without telling us anything about upstream health
+        """
+        self._probing = False
+
+    def stats(self):
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+
+BREAKER = CircuitBreaker("gemini")
+
+
+class LatencyTracker:
+    """
+    Recent successful call latencies, with a cached p95
+    """
+
+    def __init__(self, size=HEDGE_WINDOW):
+        self.samples = deque(maxlen=size)
+        self._p95 = None
+        self._stale = 0
+
+    def observe(self, seconds):
+        self.samples.append(seconds)
+        self._stale += 1
+
+    def p95(self):
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        if self._p95 is None or self._stale >= 10:
+            ordered = sorted(self.samples)
+            self._p95 = ordered[int(len(ordered) * 0.95) - 1]
+            self._stale = 0
+        return self._p95
+
+
+LATENCY = LatencyTracker()
+
+
+def stats():
+    return {
+        "breaker": BREAKER.stats(),
+        "hedge_delay": LATENCY.p95(),
+        "latency_samples": len(LATENCY.samples),
+    }
+
+
+async def _guarded(operation, make_call):
+    """
+    Run make_call() through the breaker, bounded by the current deadline
+    """
+    check_deadline()
+    BREAKER.before_call()
+    try:
+        async with asyncio.timeout(remaining()):
+            result = await make_call()
+    except TimeoutError:
+        BREAKER.record_failure()
+        metrics.DEADLINES_EXCEEDED.inc()
+        raise DeadlineExceeded(f"{operation} exceeded its deadline")
+    except HTTPException:
+        # Our own pool turning the call away says nothing about upstream
+        BREAKER.release_probe()
+        raise
+    except asyncio.CancelledError:
+        BREAKER.release_probe()
+        raise
+    except Exception as e:
+        if is_upstream_failure(e):
+            BREAKER.record_failure()
+        else:
+            BREAKER.release_probe()
+        raise
+    BREAKER.record_success()
+    return result
+
+
+def _has_spare_capacity():
+    load = gemini_client.stats()
+    return load["in_flight"] + load["waiting"] < load["max_concurrency"] // 2
+
+
+async def _hedged(model, args, kwargs):
+    def call():
+        return asyncio.ensure_future(gemini_client.generate_content(model, *args, **kwargs))
+
+    started = time.perf_counter()
+    hedge_delay = LATENCY.p95() if GEMINI_HEDGE else None
+    tasks = {call()}
+    try:
+        if hedge_delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=max(hedge_delay, HEDGE_MIN_DELAY))
+            if not done and _has_spare_capacity():
+                metrics.HEDGED_REQUESTS.inc()
+                tasks.add(call())
+
+        error = None
+        pending = tasks
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    LATENCY.observe(time.perf_counter() - started)
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def generate_content(model, *args, **kwargs):
+    """
+    gemini_client.generate_content with the breaker, the current deadline and hedging
+    """
+    return await _guarded("generate_content", lambda: _hedged(model, args, kwargs))
+
+
+async def upload_file(*args, **kwargs):
+    return await _guarded("upload_file", lambda: gemini_client.upload_file(*args, **kwargs))
+
+
+async def get_file(name):
+    return await _guarded("get_file", lambda: gemini_client.get_file(name))
+
+
+async def stream_generate_content(model, *args, **kwargs):
+    """
+    gemini_client.stream_generate_content behind the breaker. Stream
+    consumers already bound their own time, so no deadline is applied here.
+    """
+    BREAKER.before_call()
+    try:
+        async for text in gemini_client.stream_generate_content(model, *args, **kwargs):
+            yield text
+    except HTTPException:
+        BREAKER.release_probe()
+        raise
+    except (asyncio.CancelledError, GeneratorExit):
+        BREAKER.release_probe()
+        raise
+    except Exception as e:
+        if is_upstream_failure(e):
+            BREAKER.record_failure()
+        else:
+            BREAKER.release_probe()
+        raise
+    BREAKER.record_success()
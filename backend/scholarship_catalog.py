@@ -0,0 +1,175 @@
+"""
+Local scholarship catalog with inverted eligibility indexes.
+
+data/scholarships.json is compiled once at startup into indexes on
+category, course group, income ceiling and minimum CGPA. A ScholarshipQuery
+is answered by intersecting the matching id sets and ranking the result,
+with no LLM involved.
+"""
+import os
+import re
+import json
+import bisect
+
+DATA_PATH = os.getenv(
+    "SCHOLARSHIP_DATA_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "scholarships.json"),
+)
+
+ANY = "any"
+
+# Free-text course names are mapped to the course groups used in the dataset.
+# Keywords are regexes matched as whole words, so "md" does not fire inside
+# "Computer Systems" nor "b.e" inside "B.Ed".
+COURSE_GROUPS = {
+    "engineering": (r"engineering", r"b\.?\s?tech", r"b\.?e", r"m\.?\s?tech", r"m\.e", r"diploma", r"polytechnic", r"technology"),
+    "medical": (r"mbbs", r"medical", r"medicine", r"bds", r"nursing", r"m\.?d", r"m\.?s"),
+    "management": (r"mba", r"bba", r"management", r"pgdm", r"business"),
+    "science": (r"b\.?\s?sc", r"m\.?\s?sc", r"sciences?", r"physics", r"chemistry", r"mathematics", r"biology", r"geology"),
+    "pharmacy": (r"b\.?\s?pharma?", r"m\.?\s?pharma?", r"pharm\.?\s?d", r"pharma", r"pharmacy", r"pharmaceuticals?"),
+    "law": (r"ll\.?b", r"ll\.?m", r"law"),
+    "postgraduate": (r"masters?", r"m\.?\s?tech", r"m\.e", r"mba", r"m\.?\s?sc", r"m\.a", r"ph\.?\s?d", r"post\s?graduate", r"pg"),
+}
+
+_COURSE_PATTERNS = {
+    group: re.compile(r"\b(?:" + "|".join(keywords) + r")(?![\w.]*\w)")
+    for group, keywords in COURSE_GROUPS.items()
+}
+
+CATEGORY_ALIASES = {
+    "sc": "SC",
+    "scheduled caste": "SC",
+    "st": "ST",
+    "scheduled tribe": "ST",
+    "obc": "OBC",
+    "obc-ncl": "OBC",
+    "ebc": "OBC",
+    "general": "General",
+    "gen": "General",
+    "ews": "General",
+    "minority": "Minority",
+}
+
+
+def normalize_category(category):
+    key = " ".join((category or "").lower().split())
+    return CATEGORY_ALIASES.get(key, "General" if not key else key.title())
+
+
+def course_groups(course):
+    text = " ".join((course or "").lower().split())
+    return {group for group, pattern in _COURSE_PATTERNS.items() if pattern.search(text)}
+
+
+def normalize_cgpa(cgpa):
+    """
+    Accept percentages as well as 10-point CGPA
+    """
+    if cgpa and cgpa > 10:
+        return cgpa / 9.5
+    return cgpa
+
+
+class ScholarshipCatalog:
+    def __init__(self, entries):
+        self.entries = tuple(entries)
+
+        self._by_category = {}
+        self._by_course = {}
+        for i, entry in enumerate(self.entries):
+            for category in entry.get("categories") or [ANY]:
+                key = ANY if category == ANY else normalize_category(category)
+                self._by_category.setdefault(key, set()).add(i)
+            for group in entry.get("courses") or [ANY]:
+                self._by_course.setdefault(group, set()).add(i)
+
+        # Income ceilings ascending; _income_suffix[k] holds every scheme whose
+        # ceiling is at least _income_keys[k], plus the schemes with no ceiling.
+        no_ceiling = {i for i, e in enumerate(self.entries) if e.get("max_income") is None}
+        ceilings = sorted((e["max_income"], i) for i, e in enumerate(self.entries) if e.get("max_income") is not None)
+        self._income_keys = [ceiling for ceiling, _ in ceilings]
+        self._income_suffix = []
+        running = set(no_ceiling)
+        for ceiling, i in reversed(ceilings):
+            running.add(i)
+            self._income_suffix.append(frozenset(running))
+        self._income_suffix.reverse()
+        self._income_suffix.append(frozenset(no_ceiling))
+
+        # Minimum CGPA ascending; _cgpa_prefix[k] holds every scheme whose
+        # cut-off is below _cgpa_keys[k], plus the schemes with no cut-off.
+        no_cutoff = {i for i, e in enumerate(self.entries) if e.get("min_cgpa") is None}
+        cutoffs = sorted((e["min_cgpa"], i) for i, e in enumerate(self.entries) if e.get("min_cgpa") is not None)
+        self._cgpa_keys = [cutoff for cutoff, _ in cutoffs]
+        self._cgpa_prefix = [frozenset(no_cutoff)]
+        running = set(no_cutoff)
+        for cutoff, i in cutoffs:
+            running.add(i)
+            self._cgpa_prefix.append(frozenset(running))
+
+    @classmethod
+    def load(cls, path=DATA_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def match(self, course="", category="", cgpa=0.0, family_income=0):
+        """
+        Ids of every scheme the profile is eligible for. Unspecified CGPA or
+        income does not exclude anything.
+        """
+        category_key = normalize_category(category)
+        matched = self._by_category.get(ANY, set()) | self._by_category.get(category_key, set())
+
+        groups = course_groups(course)
+        course_ids = set(self._by_course.get(ANY, set()))
+        for group in groups:
+            course_ids |= self._by_course.get(group, set())
+        matched = matched & course_ids
+
+        if family_income and family_income > 0:
+            start = bisect.bisect_left(self._income_keys, family_income)
+            matched = matched & self._income_suffix[start]
+
+        cgpa = normalize_cgpa(cgpa)
+        if cgpa and cgpa > 0:
+            end = bisect.bisect_right(self._cgpa_keys, cgpa)
+            matched = matched & self._cgpa_prefix[end]
+
+        return matched
+
+    def search(self, course="", category="", cgpa=0.0, family_income=0, limit=None):
+        """
+        Eligible schemes in the /scholarships response shape, most specific
+        first: category-specific, then course-specific, then merit-based.
+        """
+        category_key = normalize_category(category)
+        groups = course_groups(course)
+
+        def rank(i):
+            entry = self.entries[i]
+            specificity = 0
+            if category_key in {normalize_category(c) for c in entry.get("categories", []) if c != ANY}:
+                specificity += 4
+            if groups & set(entry.get("courses", [])):
+                specificity += 2
+            if entry.get("min_cgpa") is not None:
+                specificity += 1
+            return (-specificity, entry["name"])
+
+        ids = sorted(self.match(course, category, cgpa, family_income), key=rank)
+        if limit is not None:
+            ids = ids[:limit]
+        return [public_fields(self.entries[i]) for i in ids]
+
+
+def public_fields(entry):
+    return {
+        "name": entry["name"],
+        "provider": entry["provider"],
+        "amount": entry["amount"],
+        "eligibility": entry["eligibility"],
+        "deadline": entry["deadline"],
+        "category": entry["category"],
+        "link": entry["link"],
+        "description": entry["description"],
+    }
@@ -0,0 +1,229 @@
+"""
+Schema-constrained Gemini output and the single parser for model JSON.
+
+Requests ask Gemini for application/json with a response schema derived from
+a Pydantic model, so well-formed output is the norm. The reply is parsed once;
+if that fails, the text gets one local repair pass (fences, stray prose,
+trailing or missing commas) and, only if that also fails, one targeted model
+call that asks for the broken JSON to be fixed. Counters record how often
+each path is taken.
+"""
+import re
+import json
+import functools
+import metrics
+import resilience
+from pydantic import ValidationError
+
+try:
+    import orjson
+
+    def _loads(text):
+        return orjson.loads(text)
+
+    _DECODE_ERRORS = (orjson.JSONDecodeError, ValueError)
+except ImportError:
+    _loads = json.loads
+    _DECODE_ERRORS = (json.JSONDecodeError, ValueError)
+
+REPAIR_MODEL = "gemini-2.5-flash"
+
+_counters = {
+    "parsed": 0,
+    "repaired_locally": 0,
+    "repaired_by_model": 0,
+    "failed": 0,
+    "model_retries": 0,
+    "invalid_items": 0,
+}
+
+_SCHEMA_KEYS = {"type", "format", "description", "nullable", "enum", "properties", "required", "items"}
+
+
+class StructuredOutputError(ValueError):
+    pass
+
+
+def stats():
+    total = _counters["parsed"] + _counters["repaired_locally"] + _counters["repaired_by_model"] + _counters["failed"]
+    return {
+        **_counters,
+        "failure_rate": round(_counters["failed"] / total, 4) if total else 0.0,
+        "retry_rate": round(_counters["model_retries"] / total, 4) if total else 0.0,
+    }
+
+
+def _to_gemini_schema(node, definitions):
+    if "$ref" in node:
+        node = definitions[node["$ref"].split("/")[-1]]
+    if "anyOf" in node:
+        options = [option for option in node["anyOf"] if option.get("type") != "null"]
+        converted = _to_gemini_schema(options[0], definitions)
+        if len(options) < len(node["anyOf"]):
+            converted["nullable"] = True
+        return converted
+
+    schema = {}
+    for key, value in node.items():
+        if key not in _SCHEMA_KEYS:
+            continue
+        if key == "type":
+            schema["type"] = value.upper()
+        elif key == "properties":
+            schema["properties"] = {name: _to_gemini_schema(child, definitions) for name, child in value.items()}
+        elif key == "items":
+            schema["items"] = _to_gemini_schema(value, definitions)
+        else:
+            schema[key] = value
+    return schema
+
+
+@functools.lru_cache(maxsize=None)
+def response_schema(response_model, many=False):
+    """
+    Gemini (OpenAPI subset) schema for a Pydantic model, or an array of them
+    """
+    json_schema = response_model.model_json_schema()
+    schema = _to_gemini_schema(json_schema, json_schema.get("$defs", {}))
+    if "required" not in schema and "properties" in schema:
+        schema["required"] = list(schema["properties"])
+    if many:
+        return {"type": "ARRAY", "items": schema}
+    return schema
+
+
+def generation_config(response_model, many=False, **kwargs):
+    """
+    generation_config dict asking for JSON in response_model's schema. A plain
+    dict keeps the SDK import off this path; the schema itself is built once.
+    """
+    return {
+        "response_mime_type": "application/json",
+        "response_schema": response_schema(response_model, many),
+        **kwargs,
+    }
+
+
+# Missing comma at a line break between the end of one value and the start of
+# the next member: a key ("name":) in an object or another object in an array.
+# Anchored on both sides, so nothing is inserted after a key or a colon, such
+# as a value that starts on the line after its key ("key":\n"value").
+_MISSING_COMMA = re.compile(r'(["\d}\]]|\btrue|\bfalse|\bnull)(\s*\n\s*)(?="(?:[^"\\\n]|\\.)*"\s*:|\{)')
+# Trailing comma before a closing bracket
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+
+
+def _repair(text):
+    """
+    One local pass over the usual ways model JSON goes wrong
+    """
+    if "```" in text:
+        fenced = re.search(r"```(?:json)?\s*(.*?)```", text, re.DOTALL)
+        if fenced:
+            text = fenced.group(1)
+
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if starts:
+        start = min(starts)
+        end = max(text.rfind("}"), text.rfind("]"))
+        if end > start:
+            text = text[start:end + 1]
+
+    text = _MISSING_COMMA.sub(r"\1,\2", text)
+    text = _TRAILING_COMMA.sub(r"\1", text)
+    return text.strip()
+
+
+def _validate(data, response_model, many):
+    if many:
+        if isinstance(data, dict):
+            data = [data]
+        if not isinstance(data, list):
+            raise StructuredOutputError("Expected a JSON array")
+        items = []
+        for item in data:
+            try:
+                items.append(response_model.model_validate(item).model_dump())
+            except ValidationError:
+                _counters["invalid_items"] += 1
+        return items
+
+    if isinstance(data, list) and len(data) == 1:
+        data = data[0]
+    try:
+        return response_model.model_validate(data).model_dump()
+    except ValidationError as e:
+        raise StructuredOutputError(f"Response does not match schema: {e.error_count()} errors") from e
+
+
+def _parse(text, response_model, many):
+    text = (text or "").strip()
+    try:
+        data = _loads(text)
+        outcome = "parsed"
+    except _DECODE_ERRORS:
+        try:
+            data = _loads(_repair(text))
+            outcome = "repaired_locally"
+        except _DECODE_ERRORS as e:
+            raise StructuredOutputError(f"Could not parse model output as JSON: {e}") from e
+    return _validate(data, response_model, many), outcome
+
+
+def parse(text, response_model, many=False):
+    """
+    Parse and validate model output, with at most one local repair pass.
+    Raises StructuredOutputError if the text is still not usable.
+    """
+    try:
+        result, outcome = _parse(text, response_model, many)
+    except StructuredOutputError:
+        _counters["failed"] += 1
+        raise
+    _counters[outcome] += 1
+    return result
+
+
+async def generate(model, contents, response_model, many=False, **config):
+    """
+    generate_content constrained to response_model's schema, parsed and
+    validated. Makes at most one extra, text-only call to fix broken output.
+    """
+    with metrics.span("generate"):
+        response = await resilience.generate_content(
+            model,
+            contents,
+            generation_config=generation_config(response_model, many, **config),
+        )
+    if not response or not response.text:
+        _counters["failed"] += 1
+        raise StructuredOutputError("Empty response from Gemini")
+
+    try:
+        with metrics.span("parse"):
+            result, outcome = _parse(response.text, response_model, many)
+        _counters[outcome] += 1
+        return result
+    except StructuredOutputError as first_error:
+        metrics.debug(f"⚠️ Structured output unusable, asking for a fix: {first_error}")
+
+    _counters["model_retries"] += 1
+    repair_prompt = (
+        "The following text was supposed to be JSON matching the given schema but is invalid. "
+        "Return only the corrected JSON, keeping every value unchanged.\n\n"
+        f"{response.text}"
+    )
+    with metrics.span("repair"):
+        repaired = await resilience.generate_content(
+            REPAIR_MODEL,
+            repair_prompt,
+            generation_config=generation_config(response_model, many, temperature=0),
+        )
+    try:
+        with metrics.span("parse"):
+            result, _ = _parse(repaired.text if repaired else "", response_model, many)
+    except StructuredOutputError:
+        _counters["failed"] += 1
+        raise
+    _counters["repaired_by_model"] += 1
+    return result
@@ -0,0 +1,182 @@
+"""
+Streaming, size-capped ingestion of uploaded documents.
+
+BodyLimitMiddleware rejects oversized request bodies with 413 while they
+are still arriving, before the multipart parser has spooled them. ingest()
+then reads the spooled file in a single allocation of its known size, so a
+request holds one copy of the upload. The SHA-256 digest (the OCR cache key)
+is computed over that buffer, and the file type is sniffed from its magic
+bytes rather than trusting the client's content_type. Downstream stages share
+the one immutable buffer instead of each making its own copy.
+"""
+import io
+import os
+import hashlib
+from fastapi import HTTPException, UploadFile
+from starlette.responses import JSONResponse
+
+OCR_MAX_UPLOAD_BYTES = int(os.getenv("OCR_MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+CHUNK_SIZE = 256 * 1024
+# Multipart boundaries and part headers on top of the file bytes themselves
+MULTIPART_OVERHEAD = 64 * 1024
+
+PDF = "application/pdf"
+
+_SIGNATURES = (
+    (b"%PDF-", PDF),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+    (b"BM", "image/bmp"),
+)
+
+
+def sniff_mime_type(head):
+    head = bytes(head[:16])
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, mime_type in _SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    return None
+
+
+class IngestedUpload:
+    __slots__ = ("filename", "data", "size", "sha256", "mime_type")
+
+    def __init__(self, filename, data, sha256, mime_type):
+        self.filename = filename
+        self.data = data
+        self.size = len(data)
+        self.sha256 = sha256
+        self.mime_type = mime_type
+
+    @property
+    def view(self):
+        return memoryview(self.data)
+
+    @property
+    def is_pdf(self):
+        return self.mime_type == PDF
+
+    def stream(self):
+        """
+        File-like view of the buffer. BytesIO shares an immutable bytes
+        buffer instead of copying it.
+        """
+        return io.BytesIO(self.data)
+
+
+def _too_large(max_bytes):
+    return HTTPException(status_code=413, detail=f"File too large (max {max_bytes} bytes)")
+
+
+def _spooled_size(file):
+    """
+    Bytes left in the upload, from the parser's count or by seeking the
+    spooled file; None when neither is available
+    """
+    size = getattr(file, "size", None)
+    if size is not None:
+        return size
+    try:
+        position = file.file.tell()
+        end = file.file.seek(0, io.SEEK_END)
+        file.file.seek(position)
+        return end - position
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+async def _read_chunked(file, max_bytes):
+    """
+    Fallback for uploads of unknown size: grow one buffer chunk by chunk
+    """
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            return bytes(buffer)
+        if len(buffer) + len(chunk) > max_bytes:
+            raise _too_large(max_bytes)
+        buffer += chunk
+
+
+async def ingest(file: UploadFile, max_bytes=OCR_MAX_UPLOAD_BYTES):
+    """
+    Read an upload into one buffer, enforcing max_bytes, then hash it and sniff
+    its type. Raises 400 for empty files, 413 for oversized ones and 415 for
+    types we cannot process.
+    """
+    size = _spooled_size(file)
+    if size is not None and size > max_bytes:
+        raise _too_large(max_bytes)
+
+    if size is None:
+        data = await _read_chunked(file, max_bytes)
+    else:
+        # One read of the known size allocates the buffer exactly once
+        data = await file.read(size)
+        if await file.read(1):
+            raise HTTPException(status_code=400, detail="Upload changed while being read")
+
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty file uploaded")
+
+    mime_type = sniff_mime_type(data)
+    # Some PDF writers put junk before the header; readers accept it within 1 KB
+    if mime_type is None and b"%PDF-" in data[:1024]:
+        mime_type = PDF
+    if mime_type is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Unsupported file type. Please upload JPG, PNG, or PDF."
+        )
+
+    hasher = hashlib.sha256()
+    view = memoryview(data)
+    for offset in range(0, len(view), CHUNK_SIZE):
+        hasher.update(view[offset:offset + CHUNK_SIZE])
+    return IngestedUpload(file.filename, data, hasher.hexdigest(), mime_type)
+
+
+class BodyLimitMiddleware:
+    """
+    ASGI middleware capping the request body of the paths in `limits` (path ->
+    max bytes). A declared Content-Length over the cap is refused before any
+    of the body is read; otherwise the body is counted as it streams in and
+    the request fails with 413 as soon as it crosses the cap.
+    """
+
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or ())
+        declared = headers.get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            response = JSONResponse({"detail": f"Request body too large (max {limit} bytes)"}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=f"Request body too large (max {limit} bytes)")
+            return message
+
+        await self.app(scope, limited_receive, send)
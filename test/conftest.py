@@ -0,0 +1,8 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "backend")
+sys.path.insert(0, os.path.abspath(BACKEND_DIR))
+
+# main.py refuses to import without a Gemini key; tests never reach Gemini
+os.environ.setdefault("API_KEY", "test")
@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import admission
+
+
+def controller(**kwargs):
+    settings = dict(max_active=1, rate=1, burst=100, max_queue=64, queue_timeout=5, retry_after=5, enabled=True)
+    settings.update(kwargs)
+    return admission.Admission(**settings)
+
+
+async def hold_slot(ctl):
+    await ctl.acquire("holder", "interactive")
+
+
+def test_empty_bucket_gets_429_with_retry_after():
+    async def ok(request):
+        return PlainTextResponse("ok")
+
+    ctl = controller(max_active=16, rate=0.5, burst=2)
+    app = admission.AdmissionMiddleware(
+        Starlette(routes=[Route("/recommend", ok, methods=["POST"])]), ctl, {"/recommend": "interactive"}
+    )
+    client = TestClient(app)
+
+    assert [client.post("/recommend").status_code for _ in range(2)] == [200, 200]
+    response = client.post("/recommend")
+    assert response.status_code == 429
+    # One token short at 0.5 tokens/s
+    assert response.headers["Retry-After"] == "2"
+    assert ctl.stats()["rejected"] == {"rate_limited": 1}
+
+
+def test_higher_priority_classes_are_dispatched_first():
+    async def scenario():
+        ctl = controller()
+        await hold_slot(ctl)
+        order = []
+
+        async def request(client, priority_class):
+            await ctl.acquire(client, priority_class)
+            order.append(priority_class)
+            ctl.release()
+
+        tasks = [
+            asyncio.create_task(request("a", "bulk")),
+            asyncio.create_task(request("b", "standard")),
+            asyncio.create_task(request("c", "interactive")),
+        ]
+        await asyncio.sleep(0)
+        ctl.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["interactive", "standard", "bulk"]
+
+
+def test_fair_queuing_interleaves_a_heavy_client_with_a_light_one():
+    async def scenario():
+        ctl = controller()
+        await hold_slot(ctl)
+        order = []
+
+        async def request(client):
+            await ctl.acquire(client, "standard")
+            order.append(client)
+            ctl.release()
+
+        tasks = [asyncio.create_task(request("heavy")) for _ in range(4)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(request("light")) for _ in range(2)]
+        await asyncio.sleep(0)
+        ctl.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    order = asyncio.run(scenario())
+    # The light client's first request does not wait behind all four heavy ones
+    assert order.index("light") <= 1
+    assert order.count("heavy") == 4
+
+
+def test_cancelled_waiters_leave_the_queue_and_admitted_ones_free_their_slot():
+    async def scenario():
+        ctl = controller()
+        await hold_slot(ctl)
+        waiter = asyncio.create_task(ctl.acquire("impatient", "standard"))
+        await asyncio.sleep(0)
+        assert ctl.stats()["queued"]["standard"] == 1
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert ctl.stats()["queued"]["standard"] == 0
+        # Its reserved virtual time was handed back
+        assert ctl._clients["impatient"].finish == ctl._virtual
+
+        ctl.release()
+        assert ctl.active == 0
+        await ctl.acquire("next", "standard")
+        assert ctl.active == 1
+
+    asyncio.run(scenario())
+
+
+def test_timed_out_requests_do_not_build_up_virtual_time_debt():
+    async def scenario():
+        ctl = controller(queue_timeout=0.01)
+        await hold_slot(ctl)
+        for _ in range(3):
+            with pytest.raises(admission.Rejected) as e:
+                await ctl.acquire("unlucky", "standard")
+            assert e.value.reason == "queue_timeout"
+        return ctl._clients["unlucky"].finish, ctl._virtual
+
+    finish, virtual = asyncio.run(scenario())
+    assert finish == virtual
@@ -0,0 +1,55 @@
+import io
+import csv
+import json
+
+import pytest
+
+import batch_scoring
+import loan_catalog
+import loan_scoring
+
+
+@pytest.fixture(scope="module")
+def ranker():
+    with open(loan_catalog.DATA_PATH, "rb") as f:
+        catalog = loan_catalog.load(f.read())
+    return batch_scoring.BatchRanker(catalog.records), catalog
+
+
+def run(ranker, rows):
+    lines = [json.loads(line) for chunk in batch_scoring.rank_rows(ranker, rows) for line in chunk.splitlines()]
+    return lines[:-1], lines[-1]["summary"]
+
+
+def test_batch_matches_rank_loans(ranker):
+    ranker, catalog = ranker
+    profiles = [(8.4, 900_000, 450_000), (5.5, 2_500_000, 120_000), (9.6, 300_000, 1_500_000)]
+    rows = [{"cgpa": c, "loanAmount": l, "familyIncome": i} for c, l, i in profiles]
+    results, summary = run(ranker, iter(rows))
+    assert summary["rows"] == 3
+    for (cgpa, loan, income), result in zip(profiles, results):
+        candidates = catalog.filter(amount=loan) or catalog.records
+        expected = loan_scoring.rank_loans(candidates, cgpa, loan, income)
+        assert [(r["bank"], r["score"]) for r in result["recommendations"]] == \
+            [(r["bank"], r["score"]) for r in expected]
+
+
+def test_malformed_csv_lines_become_error_rows(ranker):
+    ranker, _ = ranker
+    oversized = b"x" * (csv.field_size_limit() + 1)
+    data = b"cgpa,loanAmount,familyIncome\n8,900000,450000\n7," + oversized + b",1\n9,500000,800000\n"
+    results, summary = run(ranker, batch_scoring.read_csv(io.BytesIO(data)))
+    assert [("error" in r) for r in results] == [False, True, False]
+    assert summary == {**summary, "rows": 2, "errors": 1}
+
+
+@pytest.mark.parametrize("row", [
+    {"cgpa": 8, "loanAmount": 10 ** 30, "familyIncome": 450_000},
+    {"cgpa": 8, "loanAmount": 900_000, "familyIncome": "9" * 40},
+    {"cgpa": "nan", "loanAmount": 900_000, "familyIncome": 450_000},
+])
+def test_out_of_range_numbers_are_rejected_per_row(ranker, row):
+    ranker, _ = ranker
+    results, summary = run(ranker, iter([row]))
+    assert "error" in results[0]
+    assert summary["errors"] == 1
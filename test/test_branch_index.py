@@ -0,0 +1,59 @@
+import random
+
+import numpy as np
+import pytest
+
+import branch_index
+
+BANKS = ("State Bank of India", "Bank of India", "Union Bank of India", "HDFC Bank")
+
+
+@pytest.fixture(scope="module")
+def index_and_rows():
+    rng = random.Random(7)
+    rows = []
+    # Large partitions (ring search) and small ones (single scan), clustered
+    # like cities with empty country in between
+    for bank, count in zip(BANKS, (12_000, 6_000, 300, 40)):
+        for i in range(count):
+            city_lat, city_lng = rng.choice(((19.0, 72.9), (28.6, 77.2), (12.97, 77.59), (22.57, 88.36)))
+            rows.append((bank, f"{bank} {i}", city_lat + rng.gauss(0, 1.5), city_lng + rng.gauss(0, 1.5), ""))
+    return branch_index.BranchIndex(*branch_index.compile_rows(rows)), rows
+
+
+def brute_force(rows, bank, lat, lng, k):
+    lats = np.array([r[2] for r in rows if r[0] == bank])
+    lngs = np.array([r[3] for r in rows if r[0] == bank])
+    return np.sort(branch_index.haversine_km(lat, lng, lats, lngs))[:k]
+
+
+@pytest.mark.parametrize("lat, lng", [
+    (12.97, 77.59), (20.0, 75.0), (15.0, 80.0), (35.0, 95.0), (0.0, 0.0), (-30.0, 20.0),
+])
+@pytest.mark.parametrize("k", [1, 5, 20])
+def test_ring_search_matches_brute_force(index_and_rows, lat, lng, k):
+    index, rows = index_and_rows
+    for bank in BANKS:
+        found = index.nearest(bank, lat, lng, k=k)
+        assert [r["bank"] for r in found] == [bank] * k
+        expected = brute_force(rows, bank, lat, lng, k)
+        assert np.allclose([r["distance_km"] for r in found], expected, atol=1e-3)
+
+
+@pytest.mark.parametrize("name, bank", [
+    ("SBI", "State Bank of India"),
+    ("state bank of india", "State Bank of India"),
+    ("Bank of India", "Bank of India"),
+    ("Union Bank of India", "Union Bank of India"),
+    ("BOI", "Bank of India"),
+])
+def test_resolve_bank_matches_exact_names_and_aliases(index_and_rows, name, bank):
+    index, _ = index_and_rows
+    assert index.banks[index.resolve_bank(name)] == bank
+
+
+@pytest.mark.parametrize("name", ["India", "Union Bank", "Unknown Cooperative Bank", ""])
+def test_unknown_banks_resolve_to_nothing(index_and_rows, name):
+    index, _ = index_and_rows
+    assert index.resolve_bank(name) is None
+    assert index.nearest(name, 19.0, 72.9) == []
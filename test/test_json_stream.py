@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from json_stream import JsonArrayStream
+
+ITEMS = [
+    {"name": "Merit \"Plus\" {2025}", "amount": "₹50,000"},
+    {"name": "Path \\ Trust", "tags": ["a", "[b]"], "nested": {"depth": {"x": 1}}},
+    {"name": "}{ braces ]["},
+]
+
+
+def feed_all(chunks):
+    parser = JsonArrayStream()
+    out = []
+    for chunk in chunks:
+        out.extend(parser.feed(chunk))
+    return parser, out
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_objects_split_across_chunks(size):
+    text = json.dumps(ITEMS, ensure_ascii=False)
+    chunks = [text[i:i + size] for i in range(0, len(text), size)]
+    parser, out = feed_all(chunks)
+    assert out == ITEMS
+    assert parser.emitted == len(ITEMS)
+
+
+def test_objects_are_returned_as_soon_as_they_close():
+    parser = JsonArrayStream()
+    assert parser.feed('[{"a": 1}, {"b"') == [{"a": 1}]
+    assert parser.feed(': 2}') == [{"b": 2}]
+    assert parser.feed("]") == []
+
+
+def test_escaped_quote_split_from_its_backslash():
+    parser, out = feed_all(['[{"q": "say \\', '"}\\"', '"}]'])
+    assert out == [{"q": 'say "}"'}]
+
+
+def test_markdown_fence_is_skipped():
+    text = "Here you go:\n```json\n" + json.dumps(ITEMS) + "\n```\n"
+    _, out = feed_all([text[:10], text[10:25], text[25:]])
+    assert out == ITEMS
+
+
+def test_truncated_final_object_is_not_emitted():
+    text = json.dumps(ITEMS)
+    cut = text.rindex('{"name"') + 10
+    parser, out = feed_all([text[:cut]])
+    assert out == ITEMS[:-1]
+    assert parser.emitted == len(ITEMS) - 1
+
+
+def test_malformed_object_is_skipped():
+    _, out = feed_all(['[{"a": 1,}, {"b": 2}]'])
+    assert out == [{"b": 2}]
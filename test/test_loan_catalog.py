@@ -0,0 +1,88 @@
+import math
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import loan_catalog
+import main
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("8.30%–11.50%", (8.3, 11.5)),
+    ("8.30% - 11.50%", (8.3, 11.5)),
+    ("11.50% to 8.30%", (8.3, 11.5)),
+    ("9.50% onwards", (9.5, None)),
+    ("10 %", (10.0, None)),
+])
+def test_parse_rate(text, expected):
+    assert loan_catalog.parse_rate(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", None, "Contact branch", "Linked to EBLR"])
+def test_unparseable_rates_sort_last(text):
+    min_rate, max_rate = loan_catalog.parse_rate(text)
+    assert math.isinf(min_rate) and max_rate is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Up to ₹3 crore", 30_000_000),
+    ("Up to ₹50-150 lakh", 15_000_000),
+    ("Up to ₹50–150 lakh", 15_000_000),
+    ("₹7.5 lakh without collateral, ₹1 crore with", 10_000_000),
+    ("Need-based", None),
+])
+def test_parse_amount(text, expected):
+    assert loan_catalog.parse_amount(text) == expected
+
+
+def catalog():
+    products = [
+        {"bank": "State Bank of India", "interest_rate": "8.30%–11.50%", "loan_amount": "Up to ₹3 crore"},
+        {"bank": "HDFC Bank", "interest_rate": "9.50% onwards", "loan_amount": "Up to ₹75 lakh"},
+        {"bank": "Bank of Baroda", "interest_rate": "8.60%", "loan_amount": "Up to ₹1.5 crore"},
+        {"bank": "Tiny Bank", "interest_rate": "On request", "loan_amount": "Need-based"},
+    ]
+    return loan_catalog.LoanCatalog(products)
+
+
+@pytest.mark.parametrize("amount, banks", [
+    (None, ["State Bank of India", "HDFC Bank", "Bank of Baroda", "Tiny Bank"]),
+    (0, ["State Bank of India", "HDFC Bank", "Bank of Baroda"]),
+    (7_500_000, ["State Bank of India", "HDFC Bank", "Bank of Baroda"]),
+    (7_500_001, ["State Bank of India", "Bank of Baroda"]),
+    (30_000_000, ["State Bank of India"]),
+    (30_000_001, []),
+])
+def test_amount_filter_keeps_catalog_order(amount, banks):
+    assert [r.bank for r in catalog().filter(amount=amount)] == banks
+
+
+def test_type_and_rate_filters():
+    records = catalog().filter(bank_type="public", max_rate=8.5)
+    assert [r.bank for r in records] == ["State Bank of India"]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main.ADMISSION, "enabled", False)
+    return TestClient(main.app)
+
+
+def test_loans_rejects_unknown_bank_type(client):
+    response = client.get("/loans", params={"bank_type": "cooperative"})
+    assert response.status_code == 400
+
+
+def test_loans_etag_round_trip(client):
+    first = client.get("/loans", params={"bank_type": "public"})
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert all(loan["bank"] in loan_catalog.PUBLIC_SECTOR_BANKS for loan in json.loads(first.content)["loans"])
+
+    assert client.get("/loans", params={"bank_type": "public"}, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/loans", params={"bank_type": "public"}, headers={"If-None-Match": "W/" + etag}).status_code == 304
+    # A different result set has a different tag
+    other = client.get("/loans", params={"bank_type": "private"}, headers={"If-None-Match": etag})
+    assert other.status_code == 200
+    assert other.headers["ETag"] != etag
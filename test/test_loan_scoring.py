@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+import pytest
+
+import loan_scoring
+
+
+def record(bank, is_public, min_rate):
+    return SimpleNamespace(
+        is_public=is_public,
+        min_rate=min_rate,
+        raw={
+            "bank": bank,
+            "interest_rate": f"{min_rate}%",
+            "loan_amount": "Up to ₹20 lakh",
+            "repayment": "15 years",
+            "collateral": "None",
+        },
+    )
+
+
+@pytest.mark.parametrize("cgpa, score", [
+    (10, 100), (9, 100), (8.99, 85), (8, 85), (7, 70), (6, 50), (5, 30), (4.99, 10), (0, 10),
+])
+def test_academic_bands(cgpa, score):
+    assert loan_scoring.academic_score(cgpa) == score
+
+
+@pytest.mark.parametrize("lti, score", [
+    (0.5, 90), (1, 90), (1.01, 80), (2, 80), (3, 70), (5, 50), (10, 30), (20, 15), (20.01, 5),
+])
+def test_lti_bands(lti, score):
+    assert loan_scoring.lti_score(lti) == score
+
+
+@pytest.mark.parametrize("cgpa, loan, income, expected", [
+    (8.5, 900_000, 450_000, (8.5, 900_000, 450_000, 2.0)),
+    ("7.2", "4,50,000", "300000.0", (7.2, 450_000, 300_000, 1.5)),
+    (None, 0, -5, (0.0, loan_scoring.DEFAULT_LOAN_AMOUNT, loan_scoring.DEFAULT_FAMILY_INCOME, 1.67)),
+    ("n/a", "lots", "", (0.0, loan_scoring.DEFAULT_LOAN_AMOUNT, loan_scoring.DEFAULT_FAMILY_INCOME, 1.67)),
+    (8, float("inf"), 1, (8.0, loan_scoring.DEFAULT_LOAN_AMOUNT, 1, 500_000.0)),
+])
+def test_sanitize_falls_back_on_missing_or_invalid_numbers(cgpa, loan, income, expected):
+    assert loan_scoring.sanitize(cgpa, loan, income) == expected
+
+
+@pytest.mark.parametrize("cgpa, lti, loan, income, is_public, adjustment", [
+    (8, 2, 900_000, 450_000, True, 0),
+    (5.9, 2, 900_000, 450_000, True, -10),
+    (8, 10, 900_000, 450_000, True, 0),
+    (8, 10.01, 900_000, 450_000, True, -20),
+    (8, 20.01, 900_000, 450_000, True, -30),
+    (8, 2, 2_000_001, 1_000_000, True, -10),
+    (8, 2, 500_000, 299_999, True, 5),
+    (8, 2, 500_000, 299_999, False, -10),
+    (5, 25, 3_000_000, 100_000, False, -60),
+])
+def test_risk_adjustment(cgpa, lti, loan, income, is_public, adjustment):
+    assert loan_scoring.risk_adjustment(cgpa, lti, loan, income, is_public) == adjustment
+
+
+@pytest.mark.parametrize("cgpa, income, is_public, suitability", [
+    (6.5, 600_000, True, 80),
+    (8, 600_000, True, 60),
+    (8, 600_000, False, 70),
+    (6.5, 600_000, False, 20),
+    (7.5, 600_000, False, 45),
+])
+def test_suitability(cgpa, income, is_public, suitability):
+    assert loan_scoring.suitability_score(cgpa, income, is_public) == suitability
+
+
+def test_score_is_clamped_at_0():
+    # Raw points 0.4*10 + 0.4*5 + 0.2*20 - 60 = -50
+    breakdown = loan_scoring.score_product(record("Any", False, 9.0), 0, 5_000_000, 10_000)
+    assert breakdown["risk"] == -60
+    assert breakdown["score"] == 0
+
+
+def test_best_possible_profile_stays_below_100():
+    # 100 cannot be reached (0.4*100 + 0.4*90 + 0.2*80 + 5 = 97), so the
+    # upper clamp is only a guard; this pins the ceiling the rubric gives
+    breakdown = loan_scoring.score_product(record("Any", True, 9.0), 9.5, 100_000, 250_000)
+    assert breakdown["score"] == 97
+
+
+def test_rank_loans_breaks_ties_on_rate_then_catalog_order():
+    records = [
+        record("Public A", True, 9.5),
+        record("Public B", True, 8.5),
+        record("Public C", True, 8.5),
+        record("Private", False, 7.0),
+    ]
+    ranked = loan_scoring.rank_loans(records, 6.5, 900_000, 450_000, top_n=3)
+    assert [r["bank"] for r in ranked] == ["Public B", "Public C", "Public A"]
+    assert len({r["score"] for r in ranked}) == 1
@@ -0,0 +1,77 @@
+import pytest
+
+import loan_catalog
+import loan_simulation
+
+
+def product(rate, amount="Up to ₹1 crore", repayment="Up to 15 years"):
+    return loan_catalog.parse_product(
+        {"bank": "Test Bank", "interest_rate": rate, "loan_amount": amount, "repayment": repayment}
+    )
+
+
+def closed_form(principal, annual_percent, months):
+    i = annual_percent / 100 / 12
+    return principal * i * (1 + i) ** months / ((1 + i) ** months - 1)
+
+
+def only(scenarios, **match):
+    [scenario] = [s for s in scenarios if all(s[k] == v for k, v in match.items())]
+    return scenario
+
+
+@pytest.mark.parametrize("rate, amount, tenure", [(8.3, 500_000, 5), (11.5, 2_000_000, 10), (9.0, 4_000_000, 15)])
+def test_emi_matches_closed_form(rate, amount, tenure):
+    scenarios = loan_simulation.simulate([product(f"{rate}%")], amounts=(amount,), tenures=(tenure,), moratoriums=(0,))
+    scenario = only(scenarios, rate_bound="min")
+    expected = closed_form(amount, rate, tenure * 12)
+    assert scenario["emi"] == pytest.approx(expected, abs=0.01)
+    assert scenario["total_payment"] == pytest.approx(expected * tenure * 12, abs=0.01)
+    assert scenario["total_interest"] == pytest.approx(expected * tenure * 12 - amount, abs=0.01)
+
+
+def test_zero_rate_is_plain_division():
+    scenario = only(loan_simulation.simulate([product("0%")], amounts=(600_000,), tenures=(5,), moratoriums=(12,)))
+    assert scenario["emi"] == 10_000
+    assert scenario["total_interest"] == 0
+    assert scenario["moratorium_interest"] == 0
+    rows = list(loan_simulation.schedule(product("0%"), 600_000, 5, 0))
+    assert all(row["interest"] == 0 for row in rows)
+    assert rows[-1]["balance"] == 0
+
+
+def test_moratorium_interest_is_capitalized():
+    amount, rate, moratorium = 1_000_000, 9.0, 24
+    scenario = only(
+        loan_simulation.simulate([product("9%")], amounts=(amount,), tenures=(10,), moratoriums=(moratorium,))
+    )
+    capitalized = amount * (1 + 0.09 * moratorium / 12)
+    assert scenario["moratorium_interest"] == pytest.approx(capitalized - amount)
+    assert scenario["emi"] == pytest.approx(closed_form(capitalized, rate, 120), abs=0.01)
+
+    rows = list(loan_simulation.schedule(product("9%"), amount, 10, moratorium))
+    moratorium_rows = [row for row in rows if row["phase"] == "moratorium"]
+    assert len(moratorium_rows) == moratorium
+    assert all(row["payment"] == 0 for row in moratorium_rows)
+    # Simple interest: the same amount accrues every month, on the original principal
+    assert {row["interest"] for row in moratorium_rows} == {round(amount * 0.09 / 12, 2)}
+    assert moratorium_rows[-1]["balance"] == pytest.approx(capitalized)
+    first_repayment = rows[moratorium]
+    assert first_repayment["interest"] == pytest.approx(capitalized * 0.09 / 12, abs=0.01)
+
+
+@pytest.mark.parametrize("rate, amount, tenure, moratorium", [(8.3, 500_000, 5, 0), (11.5, 4_000_000, 15, 48), (10.15, 1_234_567, 7, 6)])
+def test_schedule_ends_at_exactly_zero(rate, amount, tenure, moratorium):
+    rows = list(loan_simulation.schedule(product(f"{rate}%"), amount, tenure, moratorium))
+    repayments = [row for row in rows if row["phase"] == "repayment"]
+    assert len(repayments) == tenure * 12
+    assert repayments[-1]["balance"] == 0.0
+    assert all(row["balance"] >= 0 for row in rows)
+    capitalized = amount * (1 + rate / 100 * moratorium / 12)
+    assert sum(row["principal"] for row in repayments) == pytest.approx(capitalized, abs=1)
+
+
+def test_grid_respects_tenure_cap_and_open_ended_rates():
+    records = [product("8.30%–11.50%", repayment="Up to 10 years"), product("9.50% onwards")]
+    scenarios = loan_simulation.simulate(records, amounts=(500_000,), tenures=(5, 15), moratoriums=(0,))
+    assert [(s["rate"], s["tenure_years"]) for s in scenarios] == [(8.3, 5), (11.5, 5), (9.5, 5), (9.5, 15)]
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+import microbatch
+
+
+def run_collecting_loop_errors(coroutine):
+    errors = []
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        return await coroutine
+
+    result = asyncio.run(main())
+    return result, errors
+
+
+def test_items_share_one_call_and_get_their_own_result():
+    calls = []
+
+    async def run_batch(items):
+        calls.append(items)
+        return {i: item * 10 for i, item in enumerate(items)}
+
+    batcher = microbatch.MicroBatcher("test-share", run_batch, max_items=8, window=0.01)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(3)))
+
+    results, errors = run_collecting_loop_errors(scenario())
+    assert results == [0, 10, 20]
+    assert calls == [[0, 1, 2]]
+    assert errors == []
+
+
+@pytest.mark.parametrize("outcome", ["result", "error"])
+def test_timed_out_callers_are_cancelled_not_left_with_a_result(outcome):
+    release = asyncio.Event()
+
+    async def run_batch(items):
+        await release.wait()
+        if outcome == "error":
+            raise RuntimeError("upstream failed")
+        return {i: item for i, item in enumerate(items)}
+
+    batcher = microbatch.MicroBatcher(f"test-timeout-{outcome}", run_batch, max_items=1, window=0.01)
+
+    async def scenario():
+        with pytest.raises(TimeoutError):
+            await asyncio.wait_for(batcher.submit("slow"), 0.05)
+        release.set()
+        await asyncio.gather(*batcher._tasks)
+
+    _, errors = run_collecting_loop_errors(scenario())
+    assert errors == []
+
+
+def test_callers_cancelled_inside_the_window_leave_the_batch():
+    seen = []
+
+    async def run_batch(items):
+        seen.extend(items)
+        return {i: item for i, item in enumerate(items)}
+
+    batcher = microbatch.MicroBatcher("test-window", run_batch, max_items=8, window=0.05)
+
+    async def scenario():
+        gone = asyncio.create_task(batcher.submit("gone"))
+        await asyncio.sleep(0)
+        gone.cancel()
+        return await batcher.submit("kept")
+
+    result, _ = run_collecting_loop_errors(scenario())
+    assert result == "kept"
+    assert seen == ["kept"]
+
+
+def test_budgeted_items_wait_only_a_share_of_their_budget():
+    flushed_after = []
+    started = []
+
+    async def run_batch(items):
+        flushed_after.append(asyncio.get_running_loop().time() - started[0])
+        return {i: item for i, item in enumerate(items)}
+
+    batcher = microbatch.MicroBatcher("test-budget", run_batch, max_items=8, window=1.0)
+
+    async def scenario():
+        started.append(asyncio.get_running_loop().time())
+        return await batcher.submit("quick", budget=0.5)
+
+    result, _ = run_collecting_loop_errors(scenario())
+    assert result == "quick"
+    assert flushed_after[0] < 0.5 * microbatch.LLM_MICROBATCH_WINDOW_SHARE + 0.05
+
+
+def test_batch_call_is_cut_off_at_the_tightest_budget():
+    async def run_batch(items):
+        await asyncio.sleep(5)
+
+    batcher = microbatch.MicroBatcher("test-cutoff", run_batch, max_items=2, window=0.01)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        begin = loop.time()
+        outcomes = await asyncio.gather(
+            batcher.submit("tight", budget=0.1), batcher.submit("loose"), return_exceptions=True
+        )
+        return outcomes, loop.time() - begin
+
+    (outcomes, elapsed), errors = run_collecting_loop_errors(scenario())
+    assert all(isinstance(o, TimeoutError) for o in outcomes)
+    assert elapsed < 1
+    assert errors == []
@@ -0,0 +1,51 @@
+import json
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(64)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    active = {"now": 0, "peak": 0}
+
+    async def fake_extract(upload):
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        await asyncio.sleep(0.01)
+        active["now"] -= 1
+        return {"name": upload.filename}
+
+    monkeypatch.setattr(main, "extract_document", fake_extract)
+    monkeypatch.setattr(main, "OCR_BATCH_PARALLELISM", 2)
+    monkeypatch.setattr(main.ADMISSION, "enabled", False)
+    return TestClient(main.app), active
+
+
+def test_batch_ingests_files_as_they_are_processed(client, monkeypatch):
+    client, active = client
+    ingested = []
+    real_ingest = main.upload_ingest.ingest
+
+    async def counting_ingest(file, **kwargs):
+        ingested.append(file.filename)
+        return await real_ingest(file, **kwargs)
+
+    monkeypatch.setattr(main.upload_ingest, "ingest", counting_ingest)
+    files = [("files", (f"scan{i}.png", PNG, "image/png")) for i in range(5)]
+    files.append(("files", ("notes.txt", b"plain text", "text/plain")))
+
+    response = client.post("/ocr/batch", files=files)
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    assert response.status_code == 200
+    by_name = {line["filename"]: line for line in lines[:-1]}
+    assert by_name["notes.txt"]["error"]["status"] == 415
+    assert by_name["scan3.png"]["extracted_data"] == {"name": "scan3.png"}
+    assert "merged_profile" in lines[-1]
+    assert len(ingested) == 6
+    assert active["peak"] <= 2
@@ -0,0 +1,76 @@
+import asyncio
+
+import ocr_cache
+
+
+def test_running_total_tracks_puts_replacements_and_eviction(tmp_path):
+    cache = ocr_cache.OcrCache(str(tmp_path / "ocr.sqlite3"), version="v1", max_bytes=100)
+
+    async def fill():
+        await cache.put("a", {"name": "x" * 20})
+        await cache.put("a", {"name": "x" * 30})
+        await cache.put("b", {"name": "y" * 30})
+        await cache.put("c", {"name": "z" * 30})
+
+    asyncio.run(fill())
+    stats = cache.stats()
+    assert stats["bytes"] <= 100
+    assert (stats["size"], stats["bytes"]) == tuple(cache._totals())
+    assert stats["evictions"] == 1
+    assert asyncio.run(cache.get("a")) is None
+    assert asyncio.run(cache.get("c")) == {"name": "z" * 30}
+
+
+def test_hits_only_refresh_stale_last_used(tmp_path, monkeypatch):
+    cache = ocr_cache.OcrCache(str(tmp_path / "ocr.sqlite3"), version="v1")
+    asyncio.run(cache.put("a", {"name": "x"}))
+    stamp = cache._conn.execute("SELECT last_used FROM ocr_entries").fetchone()[0]
+
+    asyncio.run(cache.get("a"))
+    assert cache._conn.execute("SELECT last_used FROM ocr_entries").fetchone()[0] == stamp
+
+    monkeypatch.setattr(ocr_cache, "LAST_USED_RESOLUTION", 0)
+    asyncio.run(cache.get("a"))
+    assert cache._conn.execute("SELECT last_used FROM ocr_entries").fetchone()[0] > stamp
+
+
+def test_versions_share_the_file_without_clobbering_each_other(tmp_path):
+    path = str(tmp_path / "ocr.sqlite3")
+    old = ocr_cache.OcrCache(path, version="v1")
+    asyncio.run(old.put("a", {"name": "old"}))
+
+    # A new release opens the same file mid-deploy
+    new = ocr_cache.OcrCache(path, version="v2")
+    assert asyncio.run(new.get("a")) is None
+    asyncio.run(new.put("a", {"name": "new"}))
+
+    assert asyncio.run(old.get("a")) == {"name": "old"}
+    assert asyncio.run(new.get("a")) == {"name": "new"}
+
+
+def test_retired_versions_age_out_through_eviction(tmp_path):
+    path = str(tmp_path / "ocr.sqlite3")
+    asyncio.run(ocr_cache.OcrCache(path, version="v1").put("a", {"name": "x" * 30}))
+    cache = ocr_cache.OcrCache(path, version="v2", max_bytes=100)
+    asyncio.run(cache.put("b", {"name": "y" * 30}))
+    asyncio.run(cache.put("c", {"name": "z" * 30}))
+
+    versions = [v for v, in cache._conn.execute("SELECT version FROM ocr_entries")]
+    assert versions == ["v2", "v2"]
+
+
+def test_legacy_table_is_dropped_once_idle(tmp_path, monkeypatch):
+    import sqlite3
+    import time
+    path = str(tmp_path / "ocr.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE ocr_results (digest TEXT PRIMARY KEY, version TEXT, result TEXT, size INT, last_used REAL)")
+    conn.execute("INSERT INTO ocr_results VALUES ('a', 'v0', '{}', 2, ?)", (time.time(),))
+    conn.commit()
+
+    ocr_cache.OcrCache(path, version="v1")
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'ocr_results'").fetchone()[0] == 1
+
+    monkeypatch.setattr(ocr_cache, "LEGACY_GRACE", -1)
+    ocr_cache.OcrCache(path, version="v1")
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'ocr_results'").fetchone()[0] == 0
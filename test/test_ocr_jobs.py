@@ -0,0 +1,56 @@
+import time
+import asyncio
+from types import SimpleNamespace
+
+import ocr_jobs
+
+
+def make_queue(tmp_path, process, lease_seconds=0.3):
+    store = ocr_jobs.JobStore(str(tmp_path / "jobs.sqlite3"), lease_seconds=lease_seconds)
+    queue = ocr_jobs.JobQueue(store, process, lambda e: (500, str(e)), workers=2, priority_workers=0,
+                              poll_interval=0.05)
+    return store, queue
+
+
+def upload():
+    return SimpleNamespace(filename="scan.pdf", mime_type="application/pdf", sha256="0" * 64, size=3, data=b"pdf")
+
+
+def test_long_jobs_keep_their_lease_and_run_once(tmp_path):
+    runs = []
+
+    async def process(job):
+        runs.append(job["id"])
+        await asyncio.sleep(1.0)
+        return "{}"
+
+    store, queue = make_queue(tmp_path, process)
+
+    async def scenario():
+        job_id = await queue.submit(upload())
+        deadline = time.monotonic() + 5
+        while (await store.get(job_id))["status"] != ocr_jobs.DONE and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        await queue.stop()
+        return await store.get(job_id)
+
+    job = asyncio.run(scenario())
+    assert job["status"] == ocr_jobs.DONE
+    assert job["attempts"] == 1
+    assert len(runs) == 1
+
+
+def test_every_waiter_sees_a_change(tmp_path):
+    _, queue = make_queue(tmp_path, None)
+
+    async def scenario():
+        impatient = asyncio.create_task(queue.wait_for_change("job", 0.01))
+        patient = [asyncio.create_task(queue.wait_for_change("job", 5)) for _ in range(2)]
+        await impatient
+        started = time.monotonic()
+        queue._notify("job")
+        await asyncio.gather(*patient)
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) < 1
+    assert queue._changed == {}
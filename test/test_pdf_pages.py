@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+import pdf_pages
+import profile_merge
+
+REQUIRED = ("name", "college", "course", "cgpa")
+
+
+def page(number, size=1000, text=""):
+    return pdf_pages.Page(number, "image/png", b"x" * size, text)
+
+
+def test_triage_skips_blank_pages_and_reads_promising_ones_first():
+    pages = [
+        page(1, text="Annexure"),
+        page(2, size=50),
+        page(3, text="Name: A  College: B  CGPA: 8.5"),
+        page(4),
+        page(5, text="Name: A"),
+    ]
+    selected, skipped = pdf_pages.triage(pages, limit=3)
+    assert [p.number for p in selected] == [3, 5, 1]
+    assert skipped == [2, 4]
+
+
+def test_triage_of_no_pages():
+    assert pdf_pages.triage([]) == ([], [])
+
+
+class FakeReader:
+    """
+    read_page stand-in: pages listed in `results` answer after their delay,
+    others never answer until cancelled
+    """
+
+    def __init__(self, results, delays=None, failures=()):
+        self.results = results
+        self.delays = delays or {}
+        self.failures = set(failures)
+        self.started = []
+        self.cancelled = []
+
+    async def __call__(self, page):
+        self.started.append(page.number)
+        try:
+            if page.number not in self.results and page.number not in self.failures:
+                await asyncio.Event().wait()
+            await asyncio.sleep(self.delays.get(page.number, 0))
+        except asyncio.CancelledError:
+            self.cancelled.append(page.number)
+            raise
+        if page.number in self.failures:
+            raise RuntimeError(f"page {page.number} failed")
+        return self.results[page.number]
+
+
+def test_stops_once_required_fields_are_filled():
+    reader = FakeReader({
+        1: {"name": "Asha Rao", "college": "IIT Bombay"},
+        2: {"course": "B.Tech", "cgpa": "8.5"},
+    }, delays={2: 0.01})
+    pages = [page(n) for n in range(1, 6)]
+
+    merged = asyncio.run(pdf_pages.extract(pages, reader, REQUIRED, parallelism=5))
+    assert {field: merged[field] for field in REQUIRED} == {
+        "name": "Asha Rao", "college": "IIT Bombay", "course": "B.Tech", "cgpa": "8.5",
+    }
+    assert sorted(reader.started) == [1, 2, 3, 4, 5]
+    assert sorted(reader.cancelled) == [3, 4, 5]
+
+
+def test_reads_every_page_when_fields_stay_missing():
+    reader = FakeReader({1: {"name": "Asha Rao"}, 2: {"college": "IIT Bombay"}})
+    merged = asyncio.run(pdf_pages.extract([page(1), page(2)], reader, REQUIRED))
+    assert merged["name"] == "Asha Rao" and merged["college"] == "IIT Bombay" and merged["cgpa"] == ""
+
+
+def test_failed_page_only_loses_its_own_fields():
+    reader = FakeReader({1: {"name": "Asha Rao"}}, failures=[2])
+    merged = asyncio.run(pdf_pages.extract([page(1), page(2)], reader, REQUIRED))
+    assert merged["name"] == "Asha Rao"
+
+
+def test_raises_when_no_page_could_be_read():
+    reader = FakeReader({}, failures=[1, 2])
+    with pytest.raises(RuntimeError):
+        asyncio.run(pdf_pages.extract([page(1), page(2)], reader, REQUIRED))
+
+
+def test_page_that_reads_like_the_record_outweighs_passing_mentions():
+    full = {"name": "Asha Rao", "college": "IIT Bombay", "course": "B.Tech", "cgpa": "8.5", "batch": "2024"}
+    mentions = [{"name": "A. Rao"}, {"name": "A. Rao"}]
+    reader = FakeReader({1: mentions[0], 2: mentions[1], 3: full})
+    merged = asyncio.run(pdf_pages.extract([page(1), page(2), page(3)], reader, ("loanAmount",)))
+    # Two one-field pages weigh 2/8; the full page alone weighs 5/8
+    assert merged["name"] == "Asha Rao"
+    assert pdf_pages.confidence(full) == 5 / len(profile_merge.PROFILE_FIELDS)
+
+
+def test_merge_normalizes_values_and_breaks_ties_by_order():
+    merged, sources, conflicts = profile_merge.merge_profiles([
+        {"name": "asha rao", "cgpa": "8.5"},
+        None,
+        {"name": "Asha Rao", "cgpa": "8.50"},
+        {"name": "Someone Else", "cgpa": "9"},
+    ])
+    assert merged["name"] == "asha rao"
+    assert sources["name"] == [0, 2]
+    assert merged["cgpa"] == "8.5" and sources["cgpa"] == [0, 2]
+    assert conflicts["cgpa"] == ["8.5", "9"]
+    assert merged["college"] == ""
+
+
+def test_merge_weights_override_the_count():
+    merged, sources, _ = profile_merge.merge_profiles(
+        [{"college": "A"}, {"college": "A"}, {"college": "B"}], weights=[0.1, 0.1, 0.5]
+    )
+    assert merged["college"] == "B" and sources["college"] == [2]
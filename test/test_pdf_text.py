@@ -0,0 +1,76 @@
+import pdf_text
+
+RECORD = """Name of the Student: Asha  Rao
+Date of Birth: 04/09/2003
+College: Indian Institute of Technology Bombay
+Course: B.Tech Computer Science
+Batch: 2021-2025
+CGPA: 8.72
+Loan amount required: Rs. 12,50,000
+Annual family income: 6,00,000"""
+
+FILLER = "\n".join(f"Clause {i}: terms and conditions apply to this brochure." for i in range(400))
+
+
+def test_short_documents_are_sent_whole():
+    text, stats = pdf_text.select_text([RECORD, "Page two"], budget=1000)
+    assert text == RECORD + "\nPage two"
+    assert stats["tokens_before"] == stats["tokens_after"]
+    assert stats["pages_used"] == 2
+
+
+def test_long_documents_are_cut_to_the_budget():
+    pages = [FILLER, RECORD, FILLER]
+    text, stats = pdf_text.select_text(pages, budget=200)
+    assert stats["tokens_before"] > 200
+    assert stats["tokens_after"] <= 200
+    assert stats["pages_used"] == 1
+    assert "Asha  Rao" in text and "CGPA: 8.72" in text
+    assert "Clause" not in text
+
+
+def test_snippets_that_add_nothing_new_are_skipped():
+    repeated = "\n\n".join([RECORD] * 50)
+    text, _ = pdf_text.select_text([repeated], budget=400)
+    assert text.count("CGPA: 8.72") == 1
+
+
+def test_snippets_over_the_remaining_budget_are_left_out():
+    # Each snippet is well over the budget, so nothing fits
+    wide = "\n".join(f"Name: {'x' * 400}" for _ in range(12))
+    text, stats = pdf_text.select_text([wide], budget=50)
+    assert text == ""
+    assert stats["tokens_after"] == 0 and stats["pages_used"] == 0
+
+
+def test_extract_fields_reads_labelled_values():
+    assert pdf_text.extract_fields(RECORD) == {
+        "name": "Asha Rao",
+        "dob": "04/09/2003",
+        "college": "Indian Institute of Technology Bombay",
+        "course": "B.Tech Computer Science",
+        "batch": "2021-2025",
+        "cgpa": "8.72",
+        "loanAmount": "1250000",
+        "familyIncome": "600000",
+    }
+
+
+def test_extract_fields_falls_back_to_later_patterns():
+    text = "St. Xavier's College, Mumbai\nStudent name - Rahul Mehta\nPercentage: 81.5 %"
+    fields = pdf_text.extract_fields(text)
+    assert fields["college"] == "St. Xavier's College, Mumbai"
+    assert fields["name"] == "Rahul Mehta"
+    assert fields["cgpa"] == "81.5"
+
+
+def test_extract_fields_leaves_missing_fields_empty():
+    fields = pdf_text.extract_fields("Nothing useful here")
+    assert set(fields) == set(pdf_text.FIELD_PATTERNS)
+    assert all(value == "" for value in fields.values())
+
+
+def test_is_usable_needs_length_and_keywords():
+    assert pdf_text.is_usable(RECORD + "\n" + "x" * pdf_text.MIN_TEXT_CHARS)
+    assert not pdf_text.is_usable("Name: A")
+    assert not pdf_text.is_usable(FILLER)
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+import resilience
+
+
+class ServiceUnavailable(Exception):
+    code = 503
+
+
+class InvalidArgument(Exception):
+    code = 400
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breaker = resilience.CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+    monkeypatch.setattr(resilience, "BREAKER", breaker)
+    return breaker
+
+
+def run_failing(error):
+    async def call():
+        raise error
+    with pytest.raises(type(error)):
+        asyncio.run(resilience._guarded("test", call))
+
+
+@pytest.mark.parametrize("error, upstream", [
+    (ServiceUnavailable(), True),
+    (ConnectionResetError(), True),
+    (TimeoutError(), True),
+    (type("ResourceExhausted", (Exception,), {})(), True),
+    (InvalidArgument(), False),
+    (ValueError("bad prompt"), False),
+])
+def test_is_upstream_failure(error, upstream):
+    assert resilience.is_upstream_failure(error) is upstream
+
+
+def test_client_errors_do_not_open_the_breaker(breaker):
+    for _ in range(5):
+        run_failing(InvalidArgument("corrupt upload"))
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+
+def test_upstream_errors_open_the_breaker(breaker):
+    for _ in range(2):
+        run_failing(ServiceUnavailable())
+    assert breaker.state == "open"
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+import response_cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = response_cache.ResponseCache("test-ttl", ttl=60)
+    cache.set("k", "v")
+    clock[0] += 59
+    assert cache.get("k") == "v"
+    clock[0] += 1
+    assert cache.get("k") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = response_cache.ResponseCache("test-lru", max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = response_cache.ResponseCache("test-coalesce")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def main():
+        results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+        return results, await cache.get_or_compute("k", compute)
+
+    results, again = asyncio.run(main())
+    assert results == ["value"] * 5 and again == "value"
+    assert len(calls) == 1
+    assert (cache.misses, cache.coalesced, cache.hits) == (1, 4, 1)
+
+
+def test_failures_reach_every_waiter_and_are_not_cached():
+    cache = response_cache.ResponseCache("test-failure")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream")
+
+    async def main():
+        results = await asyncio.gather(*(cache.get_or_compute("k", fail) for _ in range(3)), return_exceptions=True)
+        return results, await cache.get_or_compute("k", lambda: asyncio.sleep(0, result="ok"))
+
+    results, after = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert after == "ok"
+
+
+def test_follower_takes_over_when_leader_is_cancelled():
+    cache = response_cache.ResponseCache("test-leader-cancel")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05 if len(calls) == 1 else 0)
+        return "value"
+
+    async def main():
+        leader = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(cache.get_or_compute("k", compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return results
+
+    assert asyncio.run(main()) == ["value"] * 3
+    # One new leader recomputed; the other followers joined it
+    assert len(calls) == 2
+
+
+def test_cancelled_follower_does_not_disturb_the_leader():
+    cache = response_cache.ResponseCache("test-follower-cancel")
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def main():
+        leader = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(main()) == "value"
+    assert cache.get("k") == "value"
@@ -0,0 +1,21 @@
+import pytest
+
+import scholarship_catalog
+
+
+@pytest.mark.parametrize("course, groups", [
+    ("Computer Systems Engineering", {"engineering"}),
+    ("B.Ed", set()),
+    ("B.E. Mechanical", {"engineering"}),
+    ("BE CSE", {"engineering"}),
+    ("B.Tech CSE", {"engineering"}),
+    ("MD Paediatrics", {"medical"}),
+    ("M.S. Orthopaedics", {"medical"}),
+    ("M.Sc Physics", {"science", "postgraduate"}),
+    ("B.Pharma", {"pharmacy"}),
+    ("LL.B", {"law"}),
+    ("B.Com", set()),
+    ("", set()),
+])
+def test_course_groups_match_whole_words(course, groups):
+    assert scholarship_catalog.course_groups(course) == groups
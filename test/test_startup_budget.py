@@ -0,0 +1,19 @@
+import os
+import sys
+import subprocess
+
+STARTUP_BENCH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "backend", "bench", "startup.py")
+
+
+def test_cold_start_stays_within_budget():
+    """
+    Import time and first response of each endpoint, each in a fresh
+    interpreter; scale the budgets with STARTUP_BUDGET_SCALE on slow machines
+    """
+    result = subprocess.run(
+        [sys.executable, STARTUP_BENCH, "--runs", os.getenv("STARTUP_BENCH_RUNS", "1")],
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
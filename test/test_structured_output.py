@@ -0,0 +1,99 @@
+import json
+import asyncio
+from types import SimpleNamespace
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+import structured_output
+
+
+class Item(BaseModel):
+    name: str
+    amount: Optional[int] = None
+
+
+@pytest.fixture(autouse=True)
+def counters(monkeypatch):
+    counters = dict.fromkeys(structured_output._counters, 0)
+    monkeypatch.setattr(structured_output, "_counters", counters)
+    return counters
+
+
+@pytest.mark.parametrize("text", [
+    '```json\n{"name": "A", "amount": 5}\n```',
+    'Here is the result:\n```\n{"name": "A", "amount": 5}\n```\nHope this helps.',
+    'Sure! {"name": "A", "amount": 5} Let me know.',
+])
+def test_fenced_or_wrapped_output(text, counters):
+    assert structured_output.parse(text, Item) == {"name": "A", "amount": 5}
+    assert counters["repaired_locally"] == 1
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"name": "A"\n"amount": 5}', {"name": "A", "amount": 5}),
+    ('{"amount": 5\n  "name": "A"}', {"name": "A", "amount": 5}),
+    ('{"name": "say \\"hi\\""\n"amount": null}', {"name": 'say "hi"', "amount": None}),
+    ('[{"name": "A"}\n{"name": "B"}]', [{"name": "A", "amount": None}, {"name": "B", "amount": None}]),
+])
+def test_missing_commas(text, expected):
+    assert structured_output.parse(text, Item, many=isinstance(expected, list)) == expected
+
+
+@pytest.mark.parametrize("text", [
+    '{"name":\n"A",\n"amount":\n5\n}',
+    '{\n  "name": "A",\n  "amount": 5\n}',
+])
+def test_values_on_the_next_line_are_left_alone(text):
+    repaired = structured_output._repair(text)
+    assert json.loads(repaired) == {"name": "A", "amount": 5}
+    assert ",," not in repaired and ":," not in repaired
+
+
+def test_trailing_commas():
+    text = '{"name": "A", "amount": 5,}'
+    assert structured_output.parse(text, Item) == {"name": "A", "amount": 5}
+    many = '[{"name": "A",},\n{"name": "B"},\n]'
+    assert [item["name"] for item in structured_output.parse(many, Item, many=True)] == ["A", "B"]
+
+
+def test_unrepairable_output_raises(counters):
+    with pytest.raises(structured_output.StructuredOutputError):
+        structured_output.parse('{"name": "A", "amount": }', Item)
+    assert counters["failed"] == 1
+
+
+def fake_gemini(monkeypatch, replies):
+    calls = []
+
+    async def generate_content(model, contents, generation_config=None):
+        calls.append((model, contents))
+        return SimpleNamespace(text=replies[len(calls) - 1])
+
+    monkeypatch.setattr(structured_output.resilience, "generate_content", generate_content)
+    return calls
+
+
+def test_model_repair_is_tried_once(monkeypatch, counters):
+    calls = fake_gemini(monkeypatch, ['{"name": "A" "amount": 5}', '{"name": "A", "amount": 5}'])
+    result = asyncio.run(structured_output.generate("gemini-2.5-flash", "prompt", Item))
+    assert result == {"name": "A", "amount": 5}
+    assert len(calls) == 2
+    assert calls[1][0] == structured_output.REPAIR_MODEL
+    assert '{"name": "A" "amount": 5}' in calls[1][1]
+    assert counters["model_retries"] == 1 and counters["repaired_by_model"] == 1
+
+
+def test_failed_model_repair_is_not_retried(monkeypatch, counters):
+    calls = fake_gemini(monkeypatch, ["not json", "still not json", "unused"])
+    with pytest.raises(structured_output.StructuredOutputError):
+        asyncio.run(structured_output.generate("gemini-2.5-flash", "prompt", Item))
+    assert len(calls) == 2
+    assert counters["failed"] == 1
+
+
+def test_well_formed_output_needs_no_repair(monkeypatch, counters):
+    calls = fake_gemini(monkeypatch, ['{"name": "A"}'])
+    assert asyncio.run(structured_output.generate("gemini-2.5-flash", "prompt", Item)) == {"name": "A", "amount": None}
+    assert len(calls) == 1 and counters["parsed"] == 1
@@ -0,0 +1,76 @@
+import os
+import asyncio
+import tempfile
+import tracemalloc
+
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import UploadFile
+
+import upload_ingest
+
+PNG_HEADER = b"\x89PNG\r\n\x1a\n"
+
+
+def spooled_upload(data, filename="scan.png"):
+    """
+    An UploadFile backed by a file on disk, as Starlette leaves large uploads
+    """
+    spool = tempfile.TemporaryFile()
+    spool.write(data)
+    spool.seek(0)
+    return UploadFile(file=spool, filename=filename, size=len(data))
+
+
+def test_ingest_peak_memory_is_about_one_copy_of_the_upload():
+    data = PNG_HEADER + os.urandom(8 * 1024 * 1024)
+    upload = spooled_upload(data)
+
+    tracemalloc.start()
+    try:
+        ingested = asyncio.run(upload_ingest.ingest(upload, max_bytes=len(data)))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert ingested.data == data
+    assert ingested.mime_type == "image/png"
+    assert peak <= 1.2 * len(data), f"peak {peak} bytes for a {len(data)} byte upload"
+
+
+def test_ingest_rejects_oversized_uploads_before_reading():
+    upload = spooled_upload(PNG_HEADER + bytes(1024))
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(upload_ingest.ingest(upload, max_bytes=512))
+    assert e.value.status_code == 413
+    assert upload.file.tell() == 0
+
+
+@pytest.mark.parametrize("data, status", [(b"", 400), (b"plain text", 415)])
+def test_ingest_rejects_empty_and_unknown_files(data, status):
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(upload_ingest.ingest(spooled_upload(data)))
+    assert e.value.status_code == status
+
+
+def test_ingest_sniffs_pdf_behind_leading_junk():
+    ingested = asyncio.run(upload_ingest.ingest(spooled_upload(b"\r\n" + b"%PDF-1.7\n", "doc.bin")))
+    assert ingested.is_pdf
+
+
+def test_body_limit_refuses_declared_and_streamed_oversized_bodies():
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+    from starlette.testclient import TestClient
+
+    async def echo(request):
+        return PlainTextResponse(str(len(await request.body())))
+
+    app = upload_ingest.BodyLimitMiddleware(Starlette(routes=[Route("/ocr", echo, methods=["POST"])]), {"/ocr": 100})
+    client = TestClient(app)
+
+    assert client.post("/ocr", content=b"x" * 100).text == "100"
+    assert client.post("/ocr", content=b"x" * 101).status_code == 413
+    streamed = client.post("/ocr", content=iter([b"x" * 60, b"x" * 60]))
+    assert streamed.status_code == 413